@@ -1,11 +1,26 @@
-import pandas as pd
-import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.ensemble import IsolationForest
-from statsmodels.tsa.seasonal import seasonal_decompose
+from __future__ import annotations
+import asyncio
+import hashlib
+import time
 from typing import Dict, List, Any, Optional
 import json
-from llm.services import llm_client
+from approximate import sample_store
+from llm.batching import llm_batcher, frame_group_key
+from lazy_imports import lazy_import
+from metrics import span
+
+# NumPy/pandas load on first use; sklearn is imported inside each generator
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# What each generator's result depends on: the numeric values, or only the column types
+GENERATOR_INPUTS = {
+    'statistical': 'values',
+    'clustering': 'values',
+    'anomaly': 'values',
+    'seasonality': 'schema',
+    'correlation': 'values'
+}
 
 class AIResearchAssistant:
     def __init__(self):
@@ -17,42 +32,94 @@ class AIResearchAssistant:
             'correlation': self._generate_correlation_insights
         }
     
-    async def analyze_data(self, data: pd.DataFrame, data_type: str = 'tabular') -> List[Dict[str, Any]]:
-        """Comprehensive AI-powered data analysis"""
-        insights = []
-        
-        # Generate insights from all available methods
-        for insight_type, generator in self.insight_generators.items():
-            try:
-                if insight_type == 'statistical':
-                    insight = await generator(data)
-                else:
-                    insight = generator(data)
-                
-                if insight:
-                    insights.append({
-                        'type': insight_type,
-                        'insight': insight,
-                        'confidence': self._calculate_confidence(insight),
-                        'actionable': self._is_actionable(insight)
-                    })
-            except Exception as e:
-                print(f"Error generating {insight_type} insight: {e}")
+    async def analyze_data(
+        self,
+        data: pd.DataFrame,
+        data_type: str = 'tabular',
+        previous: Optional[List[Dict[str, Any]]] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """Comprehensive AI-powered data analysis.
+        
+        Each insight records the signature of the input its generator read.
+        Insights from `previous` (an earlier run over an older version of the
+        data) whose signature still matches are reused instead of recomputed.
+        `timings` collects the seconds each local (non-LLM) generator took.
+        """
+        signatures = await asyncio.to_thread(self.input_signatures, data)
+        reusable = {
+            insight['type']: insight for insight in previous or []
+            if insight.get('input_signature') and insight['input_signature'] == signatures.get(insight['type'])
+        }
+        
+        # Generators run concurrently: the LLM call awaits while the CPU-bound ones use threads
+        results = await asyncio.gather(*(
+            self._reuse(reusable[insight_type]) if insight_type in reusable
+            else self._run_generator(insight_type, generator, data, timings)
+            for insight_type, generator in self.insight_generators.items()
+        ))
+        insights = [insight for insight in results if insight]
+        for insight in insights:
+            insight['input_signature'] = signatures[insight['type']]
         
         # Sort by confidence and actionable score
         insights.sort(key=lambda x: (x['confidence'], x['actionable']), reverse=True)
         
         return insights
     
-    async def generate_narrative(self, insights: List[Dict[str, Any]], data_context: Dict[str, Any]) -> str:
-        """Generate cohesive narrative from insights"""
-        prompt = f"""
-        You are an expert data storyteller. Create a compelling narrative based on these data insights:
-        
-        Data Context: {json.dumps(data_context, indent=2)}
+    def input_signatures(self, data: pd.DataFrame) -> Dict[str, str]:
+        """Hash of what each generator reads: numeric values, or only the column types"""
+        # describe() falls back to every column when none is numeric, and so does this
+        numeric = data.select_dtypes(include=[np.number])
+        if not len(numeric.columns):
+            numeric = data.astype(str)
+        values = hashlib.sha1(json.dumps([str(column) for column in numeric.columns]).encode('utf-8'))
+        if len(numeric.columns):
+            values.update(pd.util.hash_pandas_object(numeric, index=False).to_numpy().tobytes())
+        schema = hashlib.sha1(json.dumps(data.dtypes.astype(str).to_dict(), sort_keys=True, default=str).encode('utf-8'))
+        digests = {'values': values.hexdigest(), 'schema': schema.hexdigest()}
+        return {insight_type: digests[GENERATOR_INPUTS[insight_type]] for insight_type in self.insight_generators}
+    
+    async def analyze_sample(self, sample) -> List[Dict[str, Any]]:
+        """Insights from a weighted sample standing in for the full data, each with confidence intervals"""
+        timings: Dict[str, float] = {}
+        insights = await self.analyze_data(sample.frame, timings=timings)
+        # Threads share the GIL, so the local generators' times add up to their cost per sample
+        sample_store.observe(len(sample.frame), sum(timings.values()))
+        return [sample.annotate(insight) for insight in insights]
+    
+    async def _reuse(self, insight: Dict[str, Any]) -> Dict[str, Any]:
+        return {**insight, 'reused': True}
+    
+    async def _run_generator(self, insight_type: str, generator, data: pd.DataFrame, timings: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+        try:
+            with span(f'insight.{insight_type}'):
+                if asyncio.iscoroutinefunction(generator):
+                    insight = await generator(data)
+                else:
+                    started = time.perf_counter()
+                    insight = await asyncio.to_thread(generator, data)
+                    if timings is not None:
+                        timings[insight_type] = time.perf_counter() - started
+            
+            if insight:
+                return {
+                    'type': insight_type,
+                    'insight': insight,
+                    'confidence': self._calculate_confidence(insight),
+                    'actionable': self._is_actionable(insight)
+                }
+        except Exception as e:
+            print(f"Error generating {insight_type} insight: {e}")
+        return None
+    
+    async def generate_narrative(self, insights: List[Dict[str, Any]], data_context: Dict[str, Any], scope: str = '') -> str:
+        """Generate cohesive narrative from insights.
         
-        Insights:
-        {json.dumps(insights, indent=2)}
+        Only narratives with the same `scope` (e.g. one project) may share a batched prompt.
+        """
+        instructions = """
+        You are an expert data storyteller. Create a compelling narrative based on the data insights below.
         
         Create a professional narrative that:
         1. Starts with an executive summary
@@ -63,27 +130,34 @@ class AIResearchAssistant:
         
         Write in clear, business-friendly language.
         """
+        context = f"Data Context: {json.dumps(data_context, indent=2)}\n\nInsights:\n{json.dumps(insights, indent=2, default=str)}"
         
-        result = await llm_client.analyze_data('deepseek', prompt)
+        group_key = f"narrative:{scope}" if scope else f"narrative:{hashlib.sha1(context.encode('utf-8')).hexdigest()}"
+        result = await llm_batcher.submit(group_key, instructions, context)
         return result.get('analysis', 'Narrative generation failed')
     
-    async def answer_question(self, question: str, data: pd.DataFrame, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Answer natural language questions about the data"""
+    async def answer_question(self, question: str, data: pd.DataFrame, context: Dict[str, Any], sample=None) -> Dict[str, Any]:
+        """Answer natural language questions about the data (a weighted `sample` of it in approximate mode)"""
         # First, try to answer with statistical analysis
-        statistical_answer = self._answer_with_statistics(question, data)
+        statistical_answer = self._answer_with_statistics(question, data, sample)
         if statistical_answer:
             return statistical_answer
         
-        # Fall back to LLM for complex questions
-        data_sample = data.head(50).to_string()
-        prompt = f"""
+        # Fall back to LLM for complex questions; callers may pass a cached schema
+        # description and the bounded conversation history in the context
+        data_description = context.get('schema') or data.head(50).to_string()
+        history = context.get('history')
+        extra_context = {k: v for k, v in context.items() if k not in ('schema', 'history')}
+        if sample is not None:
+            extra_context['sample'] = sample.info()
+        instructions = f"""
         Answer this question about the dataset:
         Question: {question}
         
-        Data sample:
-        {data_sample}
+        Conversation so far:
+        {history or '(this is the first question)'}
         
-        Context: {json.dumps(context)}
+        Context: {json.dumps(extra_context)}
         
         Provide a comprehensive answer with:
         1. Direct answer to the question
@@ -92,14 +166,15 @@ class AIResearchAssistant:
         4. Suggested next steps for deeper analysis
         """
         
-        result = await llm_client.analyze_data('deepseek', prompt)
+        # Concurrent questions about the same data share one round-trip and one copy of the description
+        result = await llm_batcher.submit(frame_group_key(data), instructions, data_description)
         return {
             'answer': result.get('analysis', 'Unable to answer question'),
             'source': 'ai_analysis',
             'confidence': 0.7
         }
     
-    def _answer_with_statistics(self, question: str, data: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    def _answer_with_statistics(self, question: str, data: pd.DataFrame, sample=None) -> Optional[Dict[str, Any]]:
         """Try to answer simple statistical questions directly"""
         question_lower = question.lower()
         
@@ -108,7 +183,20 @@ class AIResearchAssistant:
             parts = question_lower.split('of')
             if len(parts) > 1:
                 column = parts[1].strip().split()[0]
-                if column in data.columns:
+                if column in data.columns and sample is not None:
+                    interval = sample.mean(column)
+                    if interval['estimate'] is not None:
+                        return {
+                            'answer': (
+                                f"The average {column} is about {interval['estimate']:.2f} "
+                                f"({sample.confidence:.0%} CI {interval['low']:.2f} to {interval['high']:.2f}, "
+                                f"estimated from {len(data):,} of {sample.population_rows:,} rows)"
+                            ),
+                            'source': 'statistical_estimate',
+                            'confidence': 0.9,
+                            'metadata': {'approximation': {**sample.info(), 'interval': interval}}
+                        }
+                elif column in data.columns:
                     avg = data[column].mean()
                     return {
                         'answer': f"The average {column} is {avg:.2f}",
@@ -118,7 +206,8 @@ class AIResearchAssistant:
         
         elif 'count' in question_lower:
             if 'rows' in question_lower or 'records' in question_lower:
-                count = len(data)
+                # A sample knows the exact row count of the data it stands in for
+                count = sample.population_rows if sample is not None else len(data)
                 return {
                     'answer': f"There are {count} records in the dataset",
                     'source': 'statistical_calculation',
@@ -130,10 +219,8 @@ class AIResearchAssistant:
     async def _generate_statistical_insights(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Generate statistical insights using LLM"""
         stats_summary = data.describe().to_string()
-        prompt = f"""
-        Analyze this statistical summary and provide key insights:
-        
-        {stats_summary}
+        instructions = """
+        Analyze this statistical summary and provide key insights.
         
         Focus on:
         1. Data distribution characteristics
@@ -144,7 +231,7 @@ class AIResearchAssistant:
         Return as JSON with keys: distribution_insights, patterns, data_quality_issues, statistical_properties.
         """
         
-        result = await llm_client.analyze_data('deepseek', prompt)
+        result = await llm_batcher.submit(frame_group_key(data), instructions, stats_summary)
         try:
             return json.loads(result.get('analysis', '{}'))
         except:
@@ -156,6 +243,8 @@ class AIResearchAssistant:
         if len(numeric_data.columns) < 2:
             return {}
         
+        from sklearn.cluster import KMeans
+        
         # Simple clustering analysis
         kmeans = KMeans(n_clusters=min(3, len(numeric_data)), random_state=42)
         clusters = kmeans.fit_predict(numeric_data.dropna())
@@ -172,6 +261,8 @@ class AIResearchAssistant:
         if len(numeric_data.columns) == 0:
             return {}
         
+        from sklearn.ensemble import IsolationForest
+        
         # Anomaly detection
         clf = IsolationForest(contamination=0.1, random_state=42)
         anomalies = clf.fit_predict(numeric_data.dropna())
@@ -179,7 +270,7 @@ class AIResearchAssistant:
         
         if anomaly_count > 0:
             return {
-                'anomaly_count': anomaly_count,
+                'anomaly_count': int(anomaly_count),
                 'anomaly_percentage': (anomaly_count / len(anomalies)) * 100,
                 'message': f"Detected {anomaly_count} potential anomalies ({anomaly_count/len(anomalies)*100:.1f}% of data)"
             }
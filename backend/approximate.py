@@ -0,0 +1,348 @@
+from __future__ import annotations
+import asyncio
+import json
+import math
+import os
+from datetime import datetime
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Tuple
+import models
+from dataset_store import dataset_store
+from lazy_imports import lazy_import
+from metrics import span
+from worker_pool import worker_pool
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Nested sample sizes kept per large dataset; sizes over half the row count are skipped
+SAMPLE_SIZES = sorted(int(size) for size in os.getenv("APPROX_SAMPLE_SIZES", "5000,50000,500000").split(','))
+# Datasets smaller than this are always analyzed exactly
+APPROX_MIN_ROWS = int(os.getenv("APPROX_MIN_ROWS", 100_000))
+# Stratify by the categorical column with the most values, up to this many
+MAX_STRATA = int(os.getenv("APPROX_MAX_STRATA", 50))
+# Rows every stratum gets regardless of its share, so small groups are represented
+MIN_STRATUM_ROWS = 30
+# Starting estimate of generator cost per row, refined from observed runs
+SECONDS_PER_ROW = float(os.getenv("APPROX_SECONDS_PER_ROW", 0.00002))
+SAMPLE_BATCH_ROWS = 100_000
+DEFAULT_MAX_ERROR = 0.02
+DEFAULT_CONFIDENCE = 0.95
+WEIGHT_COLUMN = '__weight'
+MANIFEST_NAME = 'manifest.json'
+
+def approximate_settings(parameters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Settings from `parameters['approximate']`: true, or {max_error, max_latency_ms, confidence, refine}.
+
+    `max_error` bounds the confidence interval half-width of means (as a
+    fraction of the column's standard deviation) and of shares. Without any
+    target, DEFAULT_MAX_ERROR applies. Returns None for exact analysis.
+    """
+    value = (parameters or {}).get('approximate')
+    if not value:
+        return None
+    options = value if isinstance(value, dict) else {}
+    settings = {
+        'max_error': options.get('max_error'),
+        'max_latency_ms': options.get('max_latency_ms'),
+        'confidence': options.get('confidence', DEFAULT_CONFIDENCE),
+        'refine': bool(options.get('refine', True)),
+    }
+    for key in ('max_error', 'max_latency_ms', 'confidence'):
+        if settings[key] is not None and (not isinstance(settings[key], (int, float)) or settings[key] <= 0):
+            raise ValueError(f"approximate.{key} must be a positive number")
+    if settings['confidence'] >= 1:
+        raise ValueError("approximate.confidence must be below 1")
+    if settings['max_error'] is None and settings['max_latency_ms'] is None:
+        settings['max_error'] = DEFAULT_MAX_ERROR
+    return settings
+
+class Sample:
+    """A weighted sample standing in for a dataset, with interval estimates for what is computed on it"""
+
+    def __init__(self, frame: pd.DataFrame, weights: np.ndarray, population_rows: int, stratified_by: Optional[str], confidence: float):
+        self.frame = frame
+        self.weights = weights
+        self.population_rows = population_rows
+        self.stratified_by = stratified_by
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.effective_rows = _effective_rows(weights)
+        self.fraction = len(frame) / population_rows if population_rows else 1.0
+
+    def expected_error(self) -> float:
+        return _expected_error(self.z, self.fraction, self.effective_rows)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'sample_rows': len(self.frame),
+            'population_rows': self.population_rows,
+            'effective_rows': round(self.effective_rows, 1),
+            'stratified_by': self.stratified_by,
+            'confidence': self.confidence,
+            'expected_error': round(self.expected_error(), 6),
+        }
+
+    def mean(self, column) -> Dict[str, float]:
+        """Weighted mean of a column with its confidence interval"""
+        values = pd.to_numeric(self.frame[column], errors='coerce').to_numpy(dtype='float64')
+        present = np.isfinite(values)
+        values, weights = values[present], self.weights[present]
+        if not len(values):
+            return {'estimate': None, 'low': None, 'high': None}
+        estimate = float(np.average(values, weights=weights))
+        variance = float(np.average((values - estimate) ** 2, weights=weights))
+        effective = _effective_rows(weights)
+        half = self.z * math.sqrt(variance * max(1 - self.fraction, 0) / effective) if effective > 1 else float('inf')
+        return {'estimate': estimate, 'low': estimate - half, 'high': estimate + half}
+
+    def proportion(self, share: float) -> Dict[str, float]:
+        """Wilson interval of a share measured on the sample"""
+        n, z = self.effective_rows, self.z
+        denominator = 1 + z * z / n
+        center = (share + z * z / (2 * n)) / denominator
+        half = z * math.sqrt(share * (1 - share) / n + z * z / (4 * n * n)) / denominator
+        return {'estimate': float(share), 'low': max(center - half, 0.0), 'high': min(center + half, 1.0)}
+
+    def correlation(self, r: float) -> Dict[str, float]:
+        """Fisher z interval of a correlation measured on the sample"""
+        if self.effective_rows <= 3 or abs(r) >= 1:
+            return {'estimate': float(r), 'low': float(r), 'high': float(r)}
+        center, half = math.atanh(r), self.z / math.sqrt(self.effective_rows - 3)
+        return {'estimate': float(r), 'low': math.tanh(center - half), 'high': math.tanh(center + half)}
+
+    def annotate(self, insight: Dict[str, Any]) -> Dict[str, Any]:
+        """Insight computed on the sample, with its intervals for the full data"""
+        approximation = self.info()
+        body = insight.get('insight') or {}
+        intervals: Dict[str, Any] = {}
+        if insight['type'] == 'statistical':
+            numeric = self.frame.select_dtypes(include=[np.number]).columns
+            intervals['means'] = {str(column): self.mean(column) for column in numeric}
+        elif insight['type'] == 'anomaly' and 'anomaly_percentage' in body:
+            share = self.proportion(body['anomaly_percentage'] / 100)
+            intervals['anomaly_share'] = share
+            intervals['anomaly_count'] = {key: value * self.population_rows for key, value in share.items()}
+        elif insight['type'] == 'clustering' and body.get('cluster_sizes'):
+            total = sum(body['cluster_sizes'])
+            intervals['cluster_shares'] = [self.proportion(size / total) for size in body['cluster_sizes']]
+        elif insight['type'] == 'correlation' and body.get('strong_correlations'):
+            intervals['correlations'] = [
+                {'variables': item['variables'], **self.correlation(item['correlation'])}
+                for item in body['strong_correlations']
+            ]
+        if intervals:
+            approximation['intervals'] = intervals
+        return {**insight, 'approximation': approximation}
+
+class SampleStore:
+    """Persistent nested samples of large datasets for approximate analysis.
+
+    Built once per dataset in a worker process, right after ingestion: one
+    pass counts the strata, a second keeps a random-key reservoir per
+    stratum. Because every size takes the lowest keys of the same reservoir,
+    the smaller samples are subsets of the larger ones. Each size is a
+    Parquet file under DATASET_STORE_DIR/samples/<fingerprint>/ with a
+    `__weight` column (stratum rows over sampled rows); manifest.json lists
+    the sizes once they are all written.
+    """
+
+    def __init__(self, store=dataset_store, pool=worker_pool):
+        self.store = store
+        self.pool = pool
+        self.seconds_per_row = SECONDS_PER_ROW
+        self._building: Dict[str, asyncio.Task] = {}
+
+    def sample_dir(self, dataset: models.Dataset) -> str:
+        return os.path.join(self.store.root, 'samples', dataset.fingerprint)
+
+    def wants_samples(self, dataset: Optional[models.Dataset]) -> bool:
+        return bool(dataset is not None and dataset.fingerprint and dataset.storage_path and (dataset.row_count or 0) >= APPROX_MIN_ROWS)
+
+    def manifest(self, dataset: models.Dataset) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.sample_dir(dataset), MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def schedule(self, dataset: Optional[models.Dataset]):
+        """Build the dataset's samples in the background unless they exist or are being built"""
+        if not self.wants_samples(dataset) or dataset.fingerprint in self._building or self.manifest(dataset):
+            return
+        fingerprint = dataset.fingerprint
+        task = asyncio.get_running_loop().create_task(self._build(dataset.storage_path, self.sample_dir(dataset)))
+        self._building[fingerprint] = task
+        task.add_done_callback(lambda _: self._building.pop(fingerprint, None))
+
+    async def _build(self, storage_path: str, out_dir: str):
+        try:
+            with span('samples.build'):
+                return await self.pool.run(build_samples, storage_path, out_dir, SAMPLE_SIZES)
+        except Exception as e:
+            print(f"Error building samples for {storage_path}: {e}")
+            return None
+
+    def choose(self, manifest: Dict[str, Any], settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Smallest sample meeting the error target within the latency target; None for the full data"""
+        z = NormalDist().inv_cdf((1 + settings['confidence']) / 2)
+        row_count = manifest['row_count']
+        options = manifest['sizes']
+        max_error, max_ms = settings['max_error'], settings['max_latency_ms']
+
+        def error(option):
+            return _expected_error(z, option['rows'] / row_count, option['effective_rows'])
+
+        def latency_ms(rows):
+            return rows * self.seconds_per_row * 1000
+
+        exact_fits = max_ms is not None and latency_ms(row_count) <= max_ms
+        if max_error is not None:
+            meets = next((option for option in options if error(option) <= max_error), None)
+            if meets and (max_ms is None or latency_ms(meets['rows']) <= max_ms):
+                return meets
+            if meets is None and (max_ms is None or exact_fits):
+                return None
+            # The error target is out of reach within the latency target: most accurate affordable sample
+        elif exact_fits:
+            return None
+        affordable = [option for option in options if latency_ms(option['rows']) <= max_ms]
+        return affordable[-1] if affordable else options[0]
+
+    def load(self, dataset: models.Dataset, manifest: Dict[str, Any], option: Dict[str, Any], confidence: float) -> Sample:
+        frame = pd.read_parquet(os.path.join(self.sample_dir(dataset), option['file']))
+        weights = frame.pop(WEIGHT_COLUMN).to_numpy(dtype='float64')
+        return Sample(frame, weights, manifest['row_count'], manifest['stratified_by'], confidence)
+
+    async def sample_for(self, dataset: Optional[models.Dataset], settings: Dict[str, Any]) -> Optional[Sample]:
+        """Sample to analyze instead of the dataset, or None when the full data should be used.
+
+        Samples still missing are scheduled and the full data used meanwhile.
+        """
+        if not self.wants_samples(dataset):
+            return None
+        manifest = self.manifest(dataset)
+        if manifest is None:
+            self.schedule(dataset)
+            return None
+        option = self.choose(manifest, settings)
+        if option is None:
+            return None
+        with span('samples.load', rows=option['rows']):
+            return await asyncio.to_thread(self.load, dataset, manifest, option, settings['confidence'])
+
+    def observe(self, rows: int, seconds: float):
+        """Fold an observed generator run into the per-row latency estimate"""
+        if rows:
+            self.seconds_per_row = 0.8 * self.seconds_per_row + 0.2 * seconds / rows
+
+def build_samples(storage_path: str, out_dir: str, sizes: List[int]) -> Optional[Dict[str, Any]]:
+    """Worker: write the nested stratified samples of a stored dataset and their manifest"""
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(storage_path)
+    row_count = parquet.metadata.num_rows
+    sizes = [size for size in sizes if size * 2 <= row_count]
+    if not sizes:
+        return None
+
+    stratified_by, counts = _strata_counts(parquet)
+    allocations = {size: _allocate(size, counts) for size in sizes}
+    largest = allocations[sizes[-1]]
+
+    # Bottom-k by random key per stratum; rows keyed above a full stratum's current maximum can never enter
+    rng = np.random.default_rng()
+    reservoir = None
+    for batch in parquet.iter_batches(batch_size=SAMPLE_BATCH_ROWS):
+        frame = batch.to_pandas()
+        frame['__key'] = rng.random(len(frame))
+        frame['__stratum'] = _labels(frame[stratified_by]) if stratified_by else ''
+        if reservoir is not None:
+            kept = reservoir.groupby('__stratum', sort=False)['__key'].agg(['size', 'max'])
+            full = kept[kept['size'].to_numpy() >= kept.index.map(largest).to_numpy()]['max']
+            threshold = frame['__stratum'].map(full).fillna(2.0).to_numpy()
+            frame = pd.concat([reservoir, frame[frame['__key'].to_numpy() < threshold]], ignore_index=True)
+        reservoir = _lowest_keys(frame, largest)
+
+    schema = parquet.schema_arrow
+    categorical = [name for name in schema.names if str(schema.field(name).type).startswith('dictionary')]
+    os.makedirs(out_dir, exist_ok=True)
+    options = []
+    for size in sizes:
+        sample = _lowest_keys(reservoir, allocations[size])
+        weights = sample['__stratum'].map({stratum: counts[stratum] / rows for stratum, rows in allocations[size].items() if rows})
+        sample = sample.drop(columns=['__key', '__stratum'])
+        # Batches decode dictionary columns separately, and concatenating them loses the category dtype
+        sample = sample.astype({column: 'category' for column in categorical if column in sample.columns})
+        sample[WEIGHT_COLUMN] = weights.to_numpy(dtype='float64')
+        file = f"{size}.parquet"
+        dataset_store.write_parquet(os.path.join(out_dir, file), sample.reset_index(drop=True))
+        options.append({
+            'size': size,
+            'rows': len(sample),
+            'effective_rows': _effective_rows(sample[WEIGHT_COLUMN].to_numpy()),
+            'file': file,
+        })
+
+    manifest = {
+        'row_count': row_count,
+        'stratified_by': stratified_by,
+        'strata': len(counts),
+        'sizes': options,
+        'built_at': datetime.utcnow().isoformat(),
+    }
+    temp_path = os.path.join(out_dir, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest
+
+def _strata_counts(parquet) -> Tuple[Optional[str], Dict[str, int]]:
+    """Categorical or boolean column with the most distinct values (at most MAX_STRATA) and its value counts"""
+    import pyarrow as pa
+    schema = parquet.schema_arrow
+    candidates = [
+        field.name for field in schema
+        if pa.types.is_dictionary(field.type) or pa.types.is_boolean(field.type)
+    ]
+    counts: Dict[str, Dict[str, int]] = {column: {} for column in candidates}
+    if candidates:
+        for batch in parquet.iter_batches(batch_size=SAMPLE_BATCH_ROWS, columns=candidates):
+            frame = batch.to_pandas()
+            for column in list(counts):
+                for value, count in _labels(frame[column]).value_counts().items():
+                    counts[column][value] = counts[column].get(value, 0) + int(count)
+                if len(counts[column]) > MAX_STRATA:
+                    del counts[column]
+    usable = {column: values for column, values in counts.items() if len(values) >= 2}
+    if not usable:
+        return None, {'': parquet.metadata.num_rows}
+    column = max(usable, key=lambda name: len(usable[name]))
+    return column, usable[column]
+
+def _labels(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.notna(), None).astype(str)
+
+def _allocate(size: int, counts: Dict[str, int]) -> Dict[str, int]:
+    """Rows per stratum: proportional to its share, with a floor so small strata are represented"""
+    total = sum(counts.values())
+    floor = min(MIN_STRATUM_ROWS, size // len(counts))
+    return {stratum: min(count, max(round(size * count / total), floor)) for stratum, count in counts.items()}
+
+def _lowest_keys(frame: pd.DataFrame, allocation: Dict[str, int]) -> pd.DataFrame:
+    frame = frame.sort_values('__key', kind='stable')
+    rank = frame.groupby('__stratum', sort=False).cumcount().to_numpy()
+    return frame[rank < frame['__stratum'].map(allocation).fillna(0).to_numpy()]
+
+def _effective_rows(weights) -> float:
+    """Kish effective sample size of weighted rows"""
+    total = float(np.sum(weights))
+    squares = float(np.sum(np.square(weights)))
+    return total * total / squares if squares else 0.0
+
+def _expected_error(z: float, fraction: float, effective_rows: float) -> float:
+    """Interval half-width of a mean, in standard deviations, with the finite population correction"""
+    if effective_rows <= 0:
+        return float('inf')
+    return z * math.sqrt(max(1 - fraction, 0) / effective_rows)
+
+sample_store = SampleStore()
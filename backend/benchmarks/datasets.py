@@ -0,0 +1,143 @@
+"""
+Deterministic synthetic datasets for the benchmark suite.
+
+Every (format, shape, rows, seed) combination always produces the same file,
+written once under the data directory and reused by later runs. Large files
+are written in chunks so generation itself stays within a bounded amount of
+memory.
+
+Usage: python benchmarks/datasets.py --formats csv,json --shapes narrow --scales 1e3,1e5
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+FORMATS = ('csv', 'json', 'excel', 'pdf')
+EXTENSIONS = {'csv': 'csv', 'json': 'json', 'excel': 'xlsx', 'pdf': 'pdf'}
+# Column blocks per shape; each block is one id/float/skewed/int/category/date/bool/text group
+SHAPES = {'narrow': 1, 'wide': 8}
+# Excel caps a sheet at 1,048,576 rows; PDF text extraction is only meaningful for small tables
+MAX_ROWS = {'excel': 1_048_575, 'pdf': 5_000}
+CHUNK_ROWS = 250_000
+PDF_LINES_PER_PAGE = 60
+CATEGORIES = np.array(['north', 'south', 'east', 'west', 'central', 'online', 'partner', 'other'])
+WORDS = np.array(['late', 'delivery', 'refund', 'great', 'broken', 'price', 'support', 'quality', 'fast', 'missing'])
+
+def parse_scales(text: str):
+    return [int(float(value)) for value in text.split(',') if value]
+
+def supported(fmt: str, rows: int) -> bool:
+    return rows <= MAX_ROWS.get(fmt, rows)
+
+def frame_chunk(shape: str, start: int, rows: int, seed: int) -> pd.DataFrame:
+    """Rows [start, start + rows) of the synthetic table; independent of chunking"""
+    rng = np.random.default_rng([seed, start])
+    columns = {'id': np.arange(start, start + rows, dtype=np.int64)}
+    for block in range(SHAPES[shape]):
+        suffix = '' if block == 0 else f'_{block}'
+        columns[f'amount{suffix}'] = rng.normal(100, 25, rows).round(2)
+        columns[f'duration{suffix}'] = rng.lognormal(3, 1, rows).round(3)
+        columns[f'quantity{suffix}'] = rng.integers(0, 50, rows)
+        columns[f'region{suffix}'] = CATEGORIES[rng.integers(0, len(CATEGORIES), rows)]
+        columns[f'created{suffix}'] = (
+            np.datetime64('2023-01-01') + rng.integers(0, 730 * 24 * 3600, rows).astype('timedelta64[s]')
+        )
+        columns[f'active{suffix}'] = rng.random(rows) < 0.7
+        columns[f'comment{suffix}'] = np.char.add(
+            np.char.add(WORDS[rng.integers(0, len(WORDS), rows)], ' '),
+            WORDS[rng.integers(0, len(WORDS), rows)]
+        )
+    frame = pd.DataFrame(columns)
+    # ~2% missing values in the numeric and text columns
+    for name in [c for c in frame.columns if c.startswith(('amount', 'comment'))]:
+        frame.loc[rng.random(rows) < 0.02, name] = None
+    return frame
+
+def chunks(shape: str, rows: int, seed: int):
+    for start in range(0, rows, CHUNK_ROWS):
+        yield frame_chunk(shape, start, min(CHUNK_ROWS, rows - start), seed)
+
+def dataset_path(fmt: str, shape: str, rows: int, seed: int = 0, data_dir: str = DEFAULT_DATA_DIR) -> str:
+    return os.path.join(data_dir, f"{shape}_{rows}_s{seed}.{EXTENSIONS[fmt]}")
+
+def generate(fmt: str, shape: str, rows: int, seed: int = 0, data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Path of the dataset, writing it first if it does not exist yet"""
+    if not supported(fmt, rows):
+        raise ValueError(f"{fmt} datasets are limited to {MAX_ROWS[fmt]} rows")
+    path = dataset_path(fmt, shape, rows, seed, data_dir)
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    # Same extension, so writers that pick an engine by extension still work
+    partial = os.path.join(data_dir, f".partial-{os.path.basename(path)}")
+    WRITERS[fmt](partial, shape, rows, seed)
+    os.replace(partial, path)
+    return path
+
+def _write_csv(path, shape, rows, seed):
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(chunks(shape, rows, seed)):
+            chunk.to_csv(f, index=False, header=i == 0)
+
+def _write_json(path, shape, rows, seed):
+    # One JSON array of records, streamed chunk by chunk
+    with open(path, 'w') as f:
+        f.write('[')
+        for i, chunk in enumerate(chunks(shape, rows, seed)):
+            body = chunk.to_json(orient='records', date_format='iso')[1:-1]
+            if body:
+                f.write((',' if i else '') + body)
+        f.write(']')
+
+def _write_excel(path, shape, rows, seed):
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        offset = 0
+        for i, chunk in enumerate(chunks(shape, rows, seed)):
+            chunk.to_excel(writer, index=False, header=i == 0, startrow=offset + (1 if i else 0))
+            offset += len(chunk)
+
+def _write_pdf(path, shape, rows, seed):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
+    frame = pd.concat(chunks(shape, rows, seed), ignore_index=True)
+    lines = [' | '.join(map(str, frame.columns))] + [
+        ' | '.join(map(str, values)) for values in frame.itertuples(index=False)
+    ]
+    with PdfPages(path) as pdf:
+        for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+            figure = Figure(figsize=(8.27, 11.69))
+            for i, line in enumerate(lines[start:start + PDF_LINES_PER_PAGE]):
+                figure.text(0.03, 0.97 - i * 0.0158, line[:160], fontsize=5, family='monospace')
+            pdf.savefig(figure)
+
+WRITERS = {'csv': _write_csv, 'json': _write_json, 'excel': _write_excel, 'pdf': _write_pdf}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--shapes', default=','.join(SHAPES))
+    parser.add_argument('--scales', default='1e3,1e4,1e5')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    args = parser.parse_args()
+
+    written = []
+    for fmt in args.formats.split(','):
+        for shape in args.shapes.split(','):
+            for rows in parse_scales(args.scales):
+                if supported(fmt, rows):
+                    path = generate(fmt, shape, rows, args.seed, args.data_dir)
+                    written.append({'format': fmt, 'shape': shape, 'rows': rows, 'path': path, 'bytes': os.path.getsize(path)})
+    json.dump(written, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
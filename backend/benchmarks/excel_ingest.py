@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Time and peak memory of parsing a multi-sheet workbook.
+
+Writes a workbook with --sheets sheets of --rows synthetic rows each (the
+benchmark suite's table) and parses every sheet with:
+
+  pandas     pd.read_excel(sheet_name=None), the previous ingestion path
+  readonly   openpyxl read-only streaming, sheets one after another
+  parallel   readonly, one worker process per sheet with Parquet handoff
+
+Each method runs in a fresh subprocess so peak RSS (including worker
+processes) is its own. Prints one JSON document.
+
+Usage: python benchmarks/excel_ingest.py [--sheets 4] [--rows 20000] [--shape narrow] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+METHODS = ('pandas', 'readonly', 'parallel')
+
+def workbook_path(args) -> str:
+    import pandas as pd
+    from benchmarks.datasets import frame_chunk
+
+    path = os.path.join(args.data_dir, f"sheets{args.sheets}_{args.shape}_{args.rows}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(args.data_dir, exist_ok=True)
+        partial = os.path.join(args.data_dir, f".partial-{os.path.basename(path)}")
+        with pd.ExcelWriter(partial, engine='openpyxl') as writer:
+            for sheet in range(args.sheets):
+                frame_chunk(args.shape, 0, args.rows, seed=sheet).to_excel(writer, sheet_name=f"sheet{sheet}", index=False)
+        os.replace(partial, path)
+    return path
+
+def peak_rss_mb():
+    """(this process, largest worker) peak RSS in MB"""
+    # ru_maxrss survives exec on Linux, so the child would report the parent's
+    # peak from writing the workbook; VmHWM starts over with the new image
+    unit = 1024 if sys.platform != 'darwin' else 1024 ** 2
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            own = next((int(line.split()[1]) for line in f if line.startswith('VmHWM:')), own)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / unit, 1), round(children / unit, 1)
+
+def run_method(method: str, path: str, repeat: int):
+    """Runs inside the subprocess"""
+    import asyncio
+    import pandas as pd
+    import excel_reader
+    from worker_pool import worker_pool
+
+    sheets = excel_reader.sheet_names(path)
+    loop = asyncio.new_event_loop()
+
+    def parse():
+        if method == 'pandas':
+            return pd.read_excel(path, sheet_name=None)
+        if method == 'readonly':
+            return {sheet: excel_reader.read_sheet(path, sheet) for sheet in sheets}
+        return loop.run_until_complete(excel_reader.excel_reader.read_sheets(path, sheets))
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        frames = parse()
+        samples.append(time.perf_counter() - started)
+    if method == 'parallel':
+        # Wait for the workers to exit so their peak shows up under RUSAGE_CHILDREN
+        worker_pool.executor.shutdown(wait=True)
+    samples.sort()
+    own, children = peak_rss_mb()
+    return {
+        'engine': excel_reader.engine() if method != 'pandas' else 'pandas',
+        'sheets': len(frames),
+        'rows': sum(len(frame) for frame in frames.values()),
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+        'min_ms': round(samples[0] * 1000, 1),
+        'cpus': os.cpu_count(),
+        'peak_rss_mb': own,
+        'peak_worker_rss_mb': children,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sheets', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--shape', default='narrow')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--methods', default=','.join(METHODS))
+    parser.add_argument('--data-dir', default=os.path.join(BACKEND_DIR, 'benchmarks', 'data'))
+    parser.add_argument('--method', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.method:
+        print(json.dumps(run_method(args.method, args.path, args.repeat)))
+        return
+
+    path = workbook_path(args)
+    report = {'workbook': {'path': path, 'bytes': os.path.getsize(path), 'sheets': args.sheets, 'rows_per_sheet': args.rows, 'shape': args.shape}}
+    for method in args.methods.split(','):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--method', method, '--path', path, '--repeat', str(args.repeat)],
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            report[method] = {'error': completed.stderr.strip().splitlines()[-1:]}
+        else:
+            report[method] = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
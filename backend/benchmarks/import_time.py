@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Startup budget check for the API worker.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and fails
+(exit code 1) when the cumulative import time of `main` exceeds the budget or
+when a heavy dependency that should load lazily is imported at startup.
+
+Usage: python benchmarks/import_time.py [--budget-ms 1500] [--runs 3] [--top 15]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must never be imported just to serve `/`
+LAZY_MODULES = [
+    'pandas', 'numpy', 'pyarrow', 'sklearn', 'statsmodels', 'scipy',
+    'boto3', 'botocore', 'pdfplumber', 'mysql', 'psycopg2', 'openpyxl', 'matplotlib',
+]
+
+def measure_once():
+    """Return {module: cumulative_us} for one cold start"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        cumulative[name] = int(cumulative_us)
+    return cumulative
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', 1500)))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    # Best of N filters out disk-cache and scheduler noise
+    best = min(runs, key=lambda run: run.get('main', 0))
+    main_ms = best.get('main', 0) / 1000
+    eager_heavy = sorted({name.split('.')[0] for run in runs for name in run} & set(LAZY_MODULES))
+    top = sorted(best.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    report = {
+        'main_import_ms': round(main_ms, 1),
+        'budget_ms': args.budget_ms,
+        'eager_heavy_modules': eager_heavy,
+        'top_cumulative_ms': {name: round(us / 1000, 1) for name, us in top},
+        'passed': main_ms <= args.budget_ms and not eager_heavy
+    }
+    print(json.dumps(report, indent=2))
+
+    if eager_heavy:
+        print(f"FAIL: imported at startup: {', '.join(eager_heavy)}", file=sys.stderr)
+    if main_ms > args.budget_ms:
+        print(f"FAIL: import main took {main_ms:.0f} ms (budget {args.budget_ms:.0f} ms)", file=sys.stderr)
+    sys.exit(0 if report['passed'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Harness for the multi-provider LLM router.
+
+Starts two local mock providers ("fast" and "slow") with configurable latency,
+jitter and error rate, drives the router with concurrent requests in phases,
+and prints per-phase client latency percentiles plus the router's
+per-provider statistics as JSON:
+
+  1. warmup      both providers healthy; the router learns their latencies
+  2. steady      traffic should go to the faster provider
+  3. degraded    the fast provider starts failing; its breaker should open
+                 and traffic should fail over to the slow one
+  4. recovered   the fast provider is healthy again; after the cooldown the
+                 half-open probe closes the breaker
+
+Usage: python benchmarks/llm_router.py [--fast-ms 50] [--slow-ms 250] [--jitter-ms 20]
+       [--requests 200] [--concurrency 16] [--no-hedging]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from benchmarks.mock_llm import create_mock_provider, serve
+from llm.router import LLMRouter, Provider
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+async def run_phase(router: LLMRouter, name: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, providers, errors = [], {}, 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            result = await router.complete([{"role": "user", "content": f"{name} request {i}"}])
+            latencies.append(time.perf_counter() - started)
+            if 'error' in result:
+                errors += 1
+            else:
+                providers[result['provider']] = providers.get(result['provider'], 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return {
+        'phase': name,
+        'requests': requests,
+        'errors': errors,
+        'served_by': providers,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'router': router.snapshot(),
+    }
+
+async def main_async(args):
+    fast = create_mock_provider('fast', args.fast_ms, args.jitter_ms, args.fast_error_rate)
+    slow = create_mock_provider('slow', args.slow_ms, args.jitter_ms, args.slow_error_rate)
+    servers = [await serve(fast, args.port), await serve(slow, args.port + 1)]
+
+    router = LLMRouter([
+        Provider('fast', f"http://127.0.0.1:{args.port}/v1/chat/completions", 'mock', 'mock-fast', args.max_concurrency),
+        Provider('slow', f"http://127.0.0.1:{args.port + 1}/v1/chat/completions", 'mock', 'mock-slow', args.max_concurrency),
+    ], hedging=not args.no_hedging)
+    for state in router.states.values():
+        state.breaker.cooldown = args.cooldown
+
+    phases = []
+    try:
+        phases.append(await run_phase(router, 'warmup', args.concurrency * 2, args.concurrency))
+        phases.append(await run_phase(router, 'steady', args.requests, args.concurrency))
+
+        async with httpx.AsyncClient() as control:
+            await control.post(f"http://127.0.0.1:{args.port}/control", json={'error_rate': 1.0})
+            phases.append(await run_phase(router, 'degraded', args.requests, args.concurrency))
+            await control.post(f"http://127.0.0.1:{args.port}/control", json={'error_rate': args.fast_error_rate})
+        await asyncio.sleep(args.cooldown)
+        phases.append(await run_phase(router, 'recovered', args.requests, args.concurrency))
+    finally:
+        await router.close()
+        for server, task in servers:
+            server.should_exit = True
+            await task
+
+    print(json.dumps({'hedging': not args.no_hedging, 'phases': phases}, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fast-ms', type=float, default=50)
+    parser.add_argument('--slow-ms', type=float, default=250)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--fast-error-rate', type=float, default=0.0)
+    parser.add_argument('--slow-error-rate', type=float, default=0.0)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--max-concurrency', type=int, default=8, help='per-provider cap')
+    parser.add_argument('--cooldown', type=float, default=1.0, help='circuit breaker cooldown in seconds')
+    parser.add_argument('--port', type=int, default=9101)
+    parser.add_argument('--no-hedging', action='store_true')
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
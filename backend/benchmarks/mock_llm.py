@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible chat completions server for benchmarks and the LLM
+router harness. Latency, jitter and error rate are configurable, and can be
+changed at runtime with POST /control {"latency_ms", "jitter_ms", "error_rate"}.
+
+Usage: python benchmarks/mock_llm.py [--port 9101] [--latency-ms 200] [--jitter-ms 50] [--error-rate 0]
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, Any
+from fastapi import FastAPI, HTTPException
+
+def create_mock_provider(name: str, latency_ms: float = 200, jitter_ms: float = 0, error_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title=f"mock-llm-{name}")
+    settings = {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'error_rate': error_rate}
+    app.state.settings = settings
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: Dict[str, Any]):
+        app.state.requests += 1
+        delay = max(0.0, settings['latency_ms'] + random.uniform(-1, 1) * settings['jitter_ms']) / 1000
+        await asyncio.sleep(delay)
+        if random.random() < settings['error_rate']:
+            raise HTTPException(status_code=503, detail=f"{name} unavailable")
+
+        prompt = ' '.join(str(message.get('content', '')) for message in body.get('messages', []))
+        content = _mock_content(name, prompt, body.get('response_format'))
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"mock-{name}-{app.state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", name),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            },
+        }
+
+    @app.post("/control")
+    async def control(update: Dict[str, float]):
+        settings.update({k: float(v) for k, v in update.items() if k in settings})
+        return settings
+
+    @app.get("/stats")
+    async def stats():
+        return {'requests': app.state.requests, **settings}
+
+    return app
+
+def _mock_content(name: str, prompt: str, response_format) -> str:
+    if response_format and response_format.get('type') == 'json_object':
+        return '{"result": "mock", "provider": "%s"}' % name
+    return f"Mock analysis from {name}. The prompt had {len(prompt)} characters."
+
+async def serve(app: FastAPI, port: int):
+    """Run `app` on 127.0.0.1:port until cancelled"""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--name', default='mock')
+    parser.add_argument('--port', type=int, default=9101)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_mock_provider(args.name, args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Bytes and milliseconds per response for heavy project payloads.
+
+Builds a synthetic project (data sources with preview/profile blobs, analyses
+with insights holding NumPy scalars) and compares:
+
+  encoders     FastAPI's default path (Pydantic validation, jsonable_encoder,
+               stdlib json) vs orjson vs orjson with pre-serialized analyses
+  compression  identity vs gzip vs brotli (when installed): size and time
+  endpoint     GET /projects/{id} through the app, per Accept-Encoding
+
+Prints one JSON document.
+
+Usage: python benchmarks/serialization.py [--sources 10] [--analyses 20] [--insights 15] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+
+def timed(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return result, round(samples[len(samples) // 2] * 1000, 3)
+
+def make_payload(args):
+    rng = np.random.default_rng(0)
+    columns = [f"col_{i}" for i in range(20)]
+    now = datetime(2024, 1, 1)
+    sources = [
+        {
+            'id': s, 'project_id': 1, 'dataset_id': s, 'name': f"source {s}", 'type': 'csv',
+            'connection_config': {'name': f"source {s}"},
+            'data_preview': {
+                'row_count': 100_000, 'column_count': len(columns), 'columns': columns,
+                'dtypes': {c: 'float64' for c in columns},
+                'sample_data': [{c: float(rng.normal()) for c in columns} for _ in range(100)],
+            },
+            'data_profile': {'structure_assessment': 'x' * 2000, 'quality_issues': ['y' * 200] * 10},
+            'data_quality_issues': None,
+            'created_at': now,
+        }
+        for s in range(args.sources)
+    ]
+    analyses = [
+        {
+            'id': a, 'project_id': 1, 'name': f"analysis {a}", 'type': 'eda', 'config': {'name': f"analysis {a}"},
+            'results': {'insights': insights}, 'insights': insights, 'created_at': now,
+        }
+        for a in range(args.analyses)
+        for insights in [[
+            {
+                'type': 'anomaly',
+                'insight': {
+                    'anomaly_count': np.int64(rng.integers(0, 1000)),
+                    'anomaly_percentage': np.float64(rng.random() * 10),
+                    'cluster_sizes': rng.integers(0, 500, 5),
+                    'message': 'Detected anomalies ' * 10,
+                },
+                'confidence': 0.8, 'actionable': True,
+            }
+            for _ in range(args.insights)
+        ]]
+    ]
+    project = {'id': 1, 'name': 'bench', 'description': 'benchmark', 'owner_id': 1, 'created_at': now, 'updated_at': now}
+    return project, sources, analyses
+
+def plain(value):
+    """NumPy values converted to Python ones, so the stdlib path can run at all"""
+    from serialization import dumps
+    return json.loads(dumps(value))
+
+def bench_encoders(project, sources, analyses, repeat):
+    from fastapi.encoders import jsonable_encoder
+    import schemas
+    from serialization import dumps, splice, raw_array
+
+    full = {**project, 'data_sources': sources, 'analyses': analyses, 'stories': []}
+    try:
+        json.dumps(jsonable_encoder(schemas.ProjectWithDetails(**full)))
+        numpy_error = None
+    except Exception as e:
+        numpy_error = f"{type(e).__name__}: {str(e)[:120]}"
+
+    converted = {**project, 'data_sources': sources, 'analyses': plain(analyses), 'stories': []}
+
+    def stdlib():
+        content = jsonable_encoder(schemas.ProjectWithDetails(**converted))
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+
+    blobs = [dumps(analysis) for analysis in analyses]
+
+    def with_blobs():
+        return splice(project, {'data_sources': dumps(sources), 'analyses': raw_array(blobs), 'stories': b'[]'})
+
+    body, stdlib_ms = timed(stdlib, repeat)
+    _, orjson_ms = timed(lambda: dumps(full), repeat)
+    spliced, blob_ms = timed(with_blobs, repeat)
+    assert json.loads(spliced)['analyses'][0]['insights'][0]['insight']['anomaly_count'] == int(analyses[0]['insights'][0]['insight']['anomaly_count'])
+    return {
+        'bytes': len(body),
+        'stdlib_with_numpy': numpy_error or 'ok',
+        'fastapi_default_ms': stdlib_ms,
+        'orjson_ms': orjson_ms,
+        'orjson_precomputed_analyses_ms': blob_ms,
+    }, spliced
+
+def bench_compression(body, repeat):
+    import serialization
+    results = {'identity': {'bytes': len(body), 'ms': 0.0}}
+    for encoding in ('gzip', 'br'):
+        if encoding == 'br' and serialization.brotli is None:
+            results['br'] = 'brotli not installed'
+            continue
+        compressed, ms = timed(lambda: serialization.compress(body, encoding), repeat)
+        results[encoding] = {'bytes': len(compressed), 'ratio': round(len(body) / len(compressed), 2), 'ms': ms}
+    return results
+
+def bench_endpoint(project, sources, analyses, repeat):
+    os.chdir(tempfile.mkdtemp(prefix='phoenix-bench-'))
+    from fastapi.testclient import TestClient
+    import main, models
+    from database import SessionLocal
+
+    with TestClient(main.app) as client:
+        client.post('/register', json={'email': 'bench@example.com', 'password': 'bench', 'full_name': 'Bench'})
+        token = client.post('/token', data={'username': 'bench@example.com', 'password': 'bench'}).json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        project_id = client.post('/projects', json={'name': 'bench', 'description': 'benchmark'}, headers=headers).json()['id']
+
+        db = SessionLocal()
+        for source in sources:
+            db.add(models.DataSource(**{k: v for k, v in source.items() if k not in ('id', 'project_id', 'dataset_id')}, project_id=project_id))
+        for analysis in analyses:
+            db.add(models.Analysis(**{k: v for k, v in analysis.items() if k not in ('id', 'project_id')}, project_id=project_id))
+        db.commit()
+        db.close()
+
+        results = {}
+        for encoding in ('identity', 'gzip', 'br'):
+            def fetch():
+                with client.stream('GET', f"/projects/{project_id}", headers={**headers, 'Accept-Encoding': encoding}) as response:
+                    response.raise_for_status()
+                    return response.headers.get('content-encoding', 'identity'), sum(len(chunk) for chunk in response.iter_raw())
+            (content_encoding, wire_bytes), ms = timed(fetch, repeat)
+            results[encoding] = {'content_encoding': content_encoding, 'wire_bytes': wire_bytes, 'ms': ms}
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, default=10)
+    parser.add_argument('--analyses', type=int, default=20)
+    parser.add_argument('--insights', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--no-endpoint', action='store_true')
+    args = parser.parse_args()
+
+    project, sources, analyses = make_payload(args)
+    encoders, body = bench_encoders(project, sources, analyses, args.repeat)
+    report = {'encoders': encoders, 'compression': bench_compression(body, args.repeat)}
+    if not args.no_endpoint:
+        report['endpoint'] = bench_endpoint(project, sources, analyses, args.repeat)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Reproducible performance suite for the backend.
+
+Cases:
+  ingest:<format>:<shape>:<rows>       DataConnector.connect on a synthetic file
+  generator:<name>:<shape>:<rows>      one AIResearchAssistant insight generator
+  endpoint:<analyze|ask|stories>       the API end to end (TestClient, temp database)
+
+Datasets come from benchmarks/datasets.py (deterministic, cached under
+benchmarks/data). Every case runs in its own interpreter, next to a local mock
+LLM server (benchmarks/mock_llm.py) with the configured latency, so peak RSS
+is per case and no real provider is called. Each case does one warm-up run and
+then --repeat measured runs, and reports p50/p99/mean latency, throughput
+(rows/s or requests/s), peak RSS, and the median of each instrumented stage.
+
+Results are written as JSON. With --baseline, cases whose p50 or peak RSS
+regressed beyond the tolerance are listed and the exit code is 1;
+--save-baseline writes the current results for later comparison.
+
+Usage: python benchmarks/suite.py [--scales 1e3,1e4,1e5] [--formats csv,json,excel,pdf]
+       [--shapes narrow,wide] [--only ingest:csv] [--repeat 5] [--llm-latency-ms 200]
+       [--output results.json] [--baseline baseline.json] [--save-baseline baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import datasets
+
+GENERATORS = ('statistical', 'clustering', 'anomaly', 'seasonality', 'correlation')
+ENDPOINTS = ('analyze', 'ask', 'stories')
+# Below this absolute change a p50 difference is noise, whatever the ratio
+MIN_REGRESSION_MS = 5.0
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+def plan(args):
+    """Case specs in run order; unsupported format/size pairs are reported as skipped"""
+    cases, skipped = [], []
+    scales = datasets.parse_scales(args.scales)
+    for fmt in args.formats.split(','):
+        for shape in args.shapes.split(','):
+            for rows in scales:
+                case = {'id': f"ingest:{fmt}:{shape}:{rows}", 'kind': 'ingest', 'format': fmt, 'shape': shape, 'rows': rows}
+                (cases if datasets.supported(fmt, rows) else skipped).append(case)
+    for name in GENERATORS:
+        for shape in args.shapes.split(','):
+            for rows in scales:
+                cases.append({'id': f"generator:{name}:{shape}:{rows}", 'kind': 'generator', 'name': name, 'shape': shape, 'rows': rows})
+    for name in ENDPOINTS:
+        cases.append({'id': f"endpoint:{name}", 'kind': 'endpoint', 'name': name, 'shape': 'narrow', 'rows': args.endpoint_rows})
+    if args.only:
+        filters = args.only.split(',')
+        cases = [case for case in cases if any(case['id'].startswith(f) for f in filters)]
+        skipped = [case for case in skipped if any(case['id'].startswith(f) for f in filters)]
+    return cases, skipped
+
+# --- Inside the per-case interpreter -------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _start_mock_llm(latency_ms: float, jitter_ms: float):
+    """Serve the mock provider in a thread and point the router at it (before backend imports)"""
+    import uvicorn
+    from benchmarks.mock_llm import create_mock_provider
+
+    port = _free_port()
+    os.environ['LLM_PROVIDERS'] = json.dumps([{
+        'name': 'mock', 'url': f"http://127.0.0.1:{port}/v1/chat/completions",
+        'api_key': 'mock', 'model': 'mock', 'json_mode': True,
+    }])
+    server = uvicorn.Server(uvicorn.Config(create_mock_provider('mock', latency_ms, jitter_ms), host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+_loop = None
+
+def _run_async(coro):
+    """Run on one loop for the whole case: the pooled LLM client is bound to the loop that opened it"""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+def _measure(run, repeat: int):
+    """(latencies, per-run stage spans) over `repeat` runs after one warm-up"""
+    from metrics import start_trace
+
+    run()
+    latencies, traces = [], []
+    for _ in range(repeat):
+        spans = start_trace()
+        started = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - started)
+        traces.append(list(spans))
+    return latencies, traces
+
+def _ingest_case(case, args):
+    from data_connectors import data_connector
+    from json_reader import SpooledFrame
+
+    path = datasets.generate(case['format'], case['shape'], case['rows'], args.seed, args.data_dir)
+
+    def run():
+        result = _run_async(data_connector.connect(case['format'], {'file_path': path}))
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        # Streamed JSON ingestion leaves a Parquet spool file for the dataset store
+        if isinstance(result['data'], SpooledFrame):
+            result['data'].discard()
+    return run, case['rows'], 'rows/s'
+
+def _generator_case(case, args):
+    import pandas as pd
+    from ai_assistant import ai_assistant
+    from dtype_optimizer import optimize_dtypes
+
+    path = datasets.generate('csv', case['shape'], case['rows'], args.seed, args.data_dir)
+    data, _ = optimize_dtypes(pd.read_csv(path, parse_dates=[c for c in pd.read_csv(path, nrows=0).columns if c.startswith('created')]))
+    generator = ai_assistant.insight_generators[case['name']]
+
+    def run():
+        if _run_async(ai_assistant._run_generator(case['name'], generator, data)) is None and case['name'] == 'statistical':
+            raise RuntimeError("statistical generator failed")
+    return run, case['rows'], 'rows/s'
+
+def _endpoint_case(case, args):
+    os.chdir(tempfile.mkdtemp(prefix='phoenix-bench-'))
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    client.__enter__()
+    client.headers['X-Timings'] = '1'
+    client.post('/register', json={'email': 'bench@example.com', 'password': 'bench', 'full_name': 'Bench'})
+    token = client.post('/token', data={'username': 'bench@example.com', 'password': 'bench'}).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    project = client.post('/projects', json={'name': 'bench', 'description': 'benchmark'}, headers=headers).json()
+    base = f"/projects/{project['id']}"
+
+    path = datasets.generate('csv', case['shape'], case['rows'], args.seed, args.data_dir)
+    with open(path, 'rb') as f:
+        response = client.post(f"{base}/data-sources", data={'source_type': 'csv', 'config': json.dumps({'name': 'bench'})},
+                               files={'file': ('bench.csv', f)}, headers=headers)
+    response.raise_for_status()
+    analysis = {'name': 'bench', 'analysis_type': 'comprehensive', 'parameters': {}}
+    if case['name'] == 'stories':
+        client.post(f"{base}/analyze", json=analysis, headers=headers).raise_for_status()
+
+    counter = iter(range(1_000_000))
+
+    def run():
+        if case['name'] == 'analyze':
+            # Distinct parameters each run so the request coalescer never hands back an earlier result
+            response = client.post(f"{base}/analyze", json={**analysis, 'parameters': {'run': next(counter)}}, headers=headers)
+        elif case['name'] == 'ask':
+            # A new question each run so neither coalescing nor memory short-circuits it
+            response = client.post(f"{base}/ask", json={'question': f"What explains the spread of duration? ({next(counter)})"}, headers=headers)
+        else:
+            # No export formats, so only the narrative and the story write are timed
+            response = client.post(f"{base}/stories", json={'title': 'bench', 'components': [], 'export_formats': []}, headers=headers)
+        response.raise_for_status()
+        _record_server_timing(response.headers.get('server-timing', ''))
+    return run, 1, 'requests/s'
+
+def _record_server_timing(header: str):
+    """Copy the server's stage breakdown into this process's trace"""
+    from metrics import current_trace
+
+    spans = current_trace()
+    for entry in filter(None, (part.strip() for part in header.split(','))):
+        stage, _, duration = entry.partition(';dur=')
+        if spans is not None and duration and stage != 'total':
+            spans.append({'stage': stage, 'ms': float(duration)})
+
+CASE_RUNNERS = {'ingest': _ingest_case, 'generator': _generator_case, 'endpoint': _endpoint_case}
+
+def run_case(case, args):
+    _start_mock_llm(args.llm_latency_ms, args.llm_jitter_ms)
+    run, units, unit_name = CASE_RUNNERS[case['kind']](case, args)
+    latencies, traces = _measure(run, args.repeat)
+
+    stages = {}
+    for spans in traces:
+        totals = {}
+        for entry in spans:
+            totals[entry['stage']] = totals.get(entry['stage'], 0.0) + entry['ms']
+        for stage, ms in totals.items():
+            stages.setdefault(stage, []).append(ms)
+
+    p50 = percentile(latencies, 0.5)
+    return {
+        **case,
+        'runs': len(latencies),
+        'p50_ms': round(p50 * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'throughput': round(units / p50, 2) if p50 else None,
+        'throughput_unit': unit_name,
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin' else 1024 ** 2), 1),
+        'stages_p50_ms': {stage: round(percentile(values, 0.5), 2) for stage, values in sorted(stages.items())},
+    }
+
+# --- Orchestration -------------------------------------------------------------------
+
+def spawn_case(case, args):
+    """Run one case in a fresh interpreter so peak RSS and caches are its own"""
+    command = [sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)] + _passthrough(args)
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, timeout=args.timeout)
+    if completed.returncode != 0:
+        return {**case, 'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def _passthrough(args):
+    return [
+        '--repeat', str(args.repeat), '--seed', str(args.seed), '--data-dir', args.data_dir,
+        '--llm-latency-ms', str(args.llm_latency_ms), '--llm-jitter-ms', str(args.llm_jitter_ms),
+    ]
+
+def compare(results, baseline, tolerance: float, rss_tolerance: float):
+    """Per-case deltas against a baseline; a case regresses when p50 or peak RSS grew beyond tolerance"""
+    previous = {entry['id']: entry for entry in baseline.get('results', []) if 'error' not in entry}
+    comparison, regressions = [], []
+    for entry in results:
+        before = previous.get(entry['id'])
+        if before is None or 'error' in entry:
+            continue
+        p50_ratio = entry['p50_ms'] / before['p50_ms'] if before['p50_ms'] else None
+        rss_ratio = entry['peak_rss_mb'] / before['peak_rss_mb'] if before['peak_rss_mb'] else None
+        slower = p50_ratio is not None and p50_ratio > 1 + tolerance and entry['p50_ms'] - before['p50_ms'] > MIN_REGRESSION_MS
+        bigger = rss_ratio is not None and rss_ratio > 1 + rss_tolerance
+        row = {
+            'id': entry['id'],
+            'p50_ms': [before['p50_ms'], entry['p50_ms']],
+            'p50_ratio': round(p50_ratio, 3) if p50_ratio else None,
+            'peak_rss_mb': [before['peak_rss_mb'], entry['peak_rss_mb']],
+            'rss_ratio': round(rss_ratio, 3) if rss_ratio else None,
+            'regressed': slower or bigger,
+        }
+        comparison.append(row)
+        if row['regressed']:
+            regressions.append(entry['id'])
+    return comparison, regressions
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1e3,1e4,1e5', help='row counts, up to 1e7')
+    parser.add_argument('--formats', default=','.join(datasets.FORMATS))
+    parser.add_argument('--shapes', default=','.join(datasets.SHAPES))
+    parser.add_argument('--only', help='comma-separated case id prefixes, e.g. ingest:csv,endpoint')
+    parser.add_argument('--endpoint-rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=datasets.DEFAULT_DATA_DIR)
+    parser.add_argument('--llm-latency-ms', type=float, default=200)
+    parser.add_argument('--llm-jitter-ms', type=float, default=20)
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds per case')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed p50 slowdown ratio')
+    parser.add_argument('--rss-tolerance', type=float, default=0.2, help='allowed peak RSS growth ratio')
+    parser.add_argument('--save-baseline', help='also write the results here as the new baseline')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.data_dir = os.path.abspath(args.data_dir)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case), args)))
+        return
+
+    cases, skipped = plan(args)
+    results = []
+    for case in cases:
+        result = spawn_case(case, args)
+        status = result.get('error') or f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, {result['peak_rss_mb']} MB"
+        print(f"{case['id']}: {status}", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'llm_latency_ms': args.llm_latency_ms,
+            'llm_jitter_ms': args.llm_jitter_ms,
+        },
+        'results': results,
+        'skipped': [{'id': case['id'], 'reason': f"{case['format']} is limited to {datasets.MAX_ROWS[case['format']]} rows"} for case in skipped],
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'], regressions = compare(results, json.load(f), args.tolerance, args.rss_tolerance)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(output)
+
+    failed = [result['id'] for result in results if 'error' in result]
+    if regressions or failed:
+        print(f"Regressions: {regressions or 'none'}; failed cases: {failed or 'none'}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
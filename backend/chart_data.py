@@ -0,0 +1,282 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import models
+from dataset_store import dataset_store
+from lazy_imports import lazy_import
+from pipeline import filter_mask, validate_conditions
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+CHART_KINDS = {'histogram', 'heatmap', 'aggregate', 'timeseries'}
+AGGREGATIONS = {'count', 'sum', 'mean', 'median', 'min', 'max'}
+DEFAULT_BINS = 30
+MAX_BINS = 500
+DEFAULT_MAX_POINTS = 1000
+MAX_POINTS = 20_000
+DEFAULT_TOP_GROUPS = 50
+MEMORY_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", 256))
+
+class ChartDataService:
+    """Pre-aggregated chart series computed over the stored columnar dataset.
+
+    Only the columns a spec references are read from Parquet, and every chart
+    kind reduces to vectorized NumPy/pandas operations. Datasets are immutable,
+    so results are cached per (dataset fingerprint, normalized spec) in memory
+    and as JSON on disk next to the dataset store.
+    """
+
+    def __init__(self, store=dataset_store):
+        self.store = store
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> str:
+        return os.path.join(self.store.root, 'chart_cache')
+
+    def normalize(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a spec and fill in defaults so equivalent specs share a cache entry"""
+        kind = spec.get('kind')
+        if kind not in CHART_KINDS:
+            raise ValueError(f"Unsupported chart kind: {kind}")
+        if not spec.get('x'):
+            raise ValueError(f"{kind} requires x")
+        agg = spec.get('agg') or ('mean' if spec.get('y') else 'count')
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation: {agg}")
+        if agg != 'count' and not spec.get('y'):
+            raise ValueError(f"{agg} requires y")
+        if kind == 'heatmap' and not spec.get('y'):
+            raise ValueError("heatmap requires y")
+        if kind == 'timeseries' and not spec.get('y'):
+            raise ValueError("timeseries requires y")
+
+        normalized = {
+            'kind': kind,
+            'x': spec['x'],
+            'y': spec.get('y'),
+            'filters': validate_conditions(spec.get('filters') or []),
+        }
+        if kind == 'histogram':
+            normalized['bins'] = _clamp(spec.get('bins'), DEFAULT_BINS, MAX_BINS)
+        elif kind == 'heatmap':
+            normalized['bins'] = _clamp(spec.get('bins'), DEFAULT_BINS, MAX_BINS)
+            normalized['y_bins'] = _clamp(spec.get('y_bins'), normalized['bins'], MAX_BINS)
+        elif kind == 'aggregate':
+            normalized['agg'] = agg
+            normalized['group_by'] = spec.get('group_by')
+            normalized['limit'] = _clamp(spec.get('limit'), DEFAULT_TOP_GROUPS, MAX_POINTS)
+        else:
+            normalized['max_points'] = _clamp(spec.get('max_points'), DEFAULT_MAX_POINTS, MAX_POINTS)
+        return normalized
+
+    def cache_key(self, dataset: models.Dataset, spec: Dict[str, Any]) -> str:
+        material = json.dumps({'dataset': dataset.fingerprint, 'spec': spec}, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def chart(self, dataset: models.Dataset, spec: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """(chart payload, served from cache)"""
+        if dataset is None or not dataset.storage_path:
+            raise ValueError("Data source has no stored tabular dataset")
+        spec = self.normalize(spec)
+        key = self.cache_key(dataset, spec)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key], True
+        path = os.path.join(self.cache_dir, dataset.fingerprint, f"{key}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                result = json.load(f)
+            self._remember(key, result)
+            return result, True
+
+        result = self.compute(dataset, spec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(temp_path, path)
+        self._remember(key, result)
+        return result, False
+
+    def _remember(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = result
+            while len(self._memory) > MEMORY_CACHE_SIZE:
+                self._memory.popitem(last=False)
+
+    def compute(self, dataset: models.Dataset, spec: Dict[str, Any]) -> Dict[str, Any]:
+        import pyarrow.parquet as pq
+
+        referenced = [spec['x']] + _as_list(spec.get('y')) + _as_list(spec.get('group_by'))
+        referenced += [condition['column'] for condition in spec['filters']]
+        available = pq.read_schema(dataset.storage_path).names
+        unknown = [column for column in referenced if column not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns: {unknown}")
+
+        frame = self.store.load_frame(dataset, columns=list(dict.fromkeys(referenced)))
+        if spec['filters']:
+            frame = frame[filter_mask(frame, spec['filters'])]
+
+        builder = getattr(self, f"_{spec['kind']}")
+        result = builder(frame, spec)
+        result.update({'kind': spec['kind'], 'spec': spec, 'source_rows': int(len(frame))})
+        return result
+
+    def _histogram(self, frame: pd.DataFrame, spec: Dict[str, Any]) -> Dict[str, Any]:
+        codes, labels, edges = _bin_axis(frame[spec['x']], spec['bins'])
+        counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        result = {'x': labels, 'counts': counts.tolist()}
+        if edges is not None:
+            result['edges'] = edges
+        return result
+
+    def _heatmap(self, frame: pd.DataFrame, spec: Dict[str, Any]) -> Dict[str, Any]:
+        x_codes, x_labels, x_edges = _bin_axis(frame[spec['x']], spec['bins'])
+        y_codes, y_labels, y_edges = _bin_axis(frame[spec['y']], spec['y_bins'])
+        valid = (x_codes >= 0) & (y_codes >= 0)
+        flat = np.bincount(
+            y_codes[valid] * len(x_labels) + x_codes[valid],
+            minlength=len(x_labels) * len(y_labels)
+        )
+        result = {'x': x_labels, 'y': y_labels, 'z': flat.reshape(len(y_labels), len(x_labels)).tolist()}
+        if x_edges is not None:
+            result['x_edges'] = x_edges
+        if y_edges is not None:
+            result['y_edges'] = y_edges
+        return result
+
+    def _aggregate(self, frame: pd.DataFrame, spec: Dict[str, Any]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys([spec['x']] + _as_list(spec.get('group_by'))))
+        grouped = frame.groupby(keys, dropna=False, observed=True, sort=False)
+        if spec['agg'] == 'count':
+            values = grouped.size()
+        else:
+            values = grouped[spec['y']].agg(spec['agg'])
+        truncated = len(values) > spec['limit']
+        values = values.sort_values(ascending=False).head(spec['limit'])
+
+        index = values.index.to_frame(index=False)
+        result = {
+            'x': _json_values(index[spec['x']]),
+            'values': _json_values(values.reset_index(drop=True)),
+            'truncated': truncated,
+        }
+        if spec.get('group_by'):
+            result['groups'] = {str(column): _json_values(index[column]) for column in keys[1:]}
+        return result
+
+    def _timeseries(self, frame: pd.DataFrame, spec: Dict[str, Any]) -> Dict[str, Any]:
+        x, y = frame[spec['x']], frame[spec['y']]
+        if not pd.api.types.is_numeric_dtype(y):
+            raise ValueError(f"timeseries y column '{spec['y']}' must be numeric")
+        is_time = not pd.api.types.is_numeric_dtype(x)
+        if is_time:
+            x = _as_nanoseconds(pd.to_datetime(x, errors='coerce'))
+        valid = (x.notna() & y.notna()).to_numpy()
+        x_values = x.to_numpy(dtype='float64', na_value=np.nan)[valid]
+        y_values = y.to_numpy(dtype='float64')[valid]
+
+        order = np.argsort(x_values, kind='stable')
+        x_values, y_values = x_values[order], y_values[order]
+        selected = lttb_indices(x_values, y_values, spec['max_points'])
+        x_out = x_values[selected]
+        return {
+            'x': pd.to_datetime(x_out.astype('int64')).strftime('%Y-%m-%dT%H:%M:%S').tolist() if is_time else x_out.tolist(),
+            'y': y_values[selected].tolist(),
+            'downsampled': len(selected) < len(x_values),
+            'points': int(len(x_values)),
+        }
+
+def lttb_indices(x, y, threshold: int):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the series' shape.
+
+    The outer loop is over output buckets; each bucket's triangle areas are
+    computed in one vectorized step.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        if end >= n - 1 or next_end <= end:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        areas = np.abs(
+            (x[anchor] - next_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (next_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
+
+def _bin_axis(series: pd.Series, bins: int):
+    """(bin code per row, -1 for nulls; bin labels; numeric edges or None)
+
+    Numeric and datetime columns are cut into equal-width bins; anything else
+    keeps its `bins - 1` most frequent values and folds the rest into "Other".
+    """
+    is_time = pd.api.types.is_datetime64_any_dtype(series)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) or is_time:
+        values = (_as_nanoseconds(series) if is_time else series).to_numpy(dtype='float64', na_value=np.nan)
+        finite = values[np.isfinite(values)]
+        if len(finite) == 0:
+            return np.full(len(values), -1), [], []
+        low, high = float(finite.min()), float(finite.max())
+        if low == high:
+            high = low + 1
+        edges = np.linspace(low, high, bins + 1)
+        codes = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+        codes[~np.isfinite(values)] = -1
+        if is_time:
+            stamps = pd.to_datetime(edges.astype('int64'))
+            labels = stamps[:-1].strftime('%Y-%m-%dT%H:%M:%S').tolist()
+            return codes, labels, stamps.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+        centers = (edges[:-1] + edges[1:]) / 2
+        return codes, centers.tolist(), edges.tolist()
+
+    text = series.astype('string')
+    counts = text.value_counts()
+    top = counts.index[:bins - 1 if len(counts) > bins else bins].tolist()
+    labels = [str(value) for value in top]
+    codes = pd.Categorical(text, categories=top).codes.astype('int64')
+    if len(counts) > len(top):
+        codes[(codes < 0) & text.notna().to_numpy()] = len(labels)
+        labels.append('Other')
+    return codes, labels, None
+
+def _as_nanoseconds(series: pd.Series) -> pd.Series:
+    """Epoch nanoseconds as nullable floats, whatever the stored datetime resolution"""
+    nanoseconds = series.dt.as_unit('ns').astype('int64').astype('float64')
+    return nanoseconds.mask(series.isna())
+
+def _json_values(series: pd.Series) -> List[Any]:
+    return json.loads(series.to_json(orient='values', date_format='iso'))
+
+def _as_list(value) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def _clamp(value: Optional[int], default: int, maximum: int) -> int:
+    return max(1, min(int(value or default), maximum))
+
+chart_data_service = ChartDataService()
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Awaitable
+from sqlalchemy.exc import IntegrityError
+import models
+from database import SessionLocal
+
+# A pending row older than this is assumed abandoned by a crashed worker
+LOCK_TIMEOUT_SECONDS = int(os.getenv("COALESCE_LOCK_TIMEOUT_SECONDS", 300))
+# Finished rows stay readable this long for followers polling from other workers
+RESULT_RETENTION_SECONDS = 30
+# Opt-in result reuse for requests arriving after the computation finished; 0 coalesces in-flight requests only
+RESULT_TTL_SECONDS = int(os.getenv("COALESCE_RESULT_TTL_SECONDS", 0))
+POLL_INTERVAL_SECONDS = 0.2
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def data_fingerprint(data_sources: List[models.DataSource]) -> str:
+    """Identity of the data behind a request; changes whenever any source's dataset does"""
+    parts = [
+        source.dataset.fingerprint if source.dataset and source.dataset.fingerprint else f"source:{source.id}"
+        for source in data_sources
+    ]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+def normalize_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question).strip().rstrip('?.!').strip().lower()
+
+def make_key(kind: str, fingerprint: str, config: Dict[str, Any]) -> str:
+    material = json.dumps({'kind': kind, 'data': fingerprint, 'config': config}, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class RequestCoalescer:
+    """Single-flight execution of identical concurrent requests.
+
+    Within a worker, followers await the leader's future. Across workers, the
+    `coalesced_requests` table acts as a lock and short-lived results table:
+    the first worker to insert a pending row computes, the others poll until
+    it is done. Only requests that arrived while the computation was running
+    share its result, unless RESULT_TTL_SECONDS is set. Results must be
+    JSON-serializable.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'leader': 0, 'coalesced_local': 0, 'coalesced_remote': 0, 'failed': 0}
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self._inflight:
+            self.stats['coalesced_local'] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        # Followers may all be gone by the time it fails; don't warn about unretrieved errors
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await self._run_across_workers(key, compute)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _run_across_workers(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        joined = False
+        while True:
+            state, result = await asyncio.to_thread(self._claim, key, joined)
+            if state == 'done':
+                self.stats['coalesced_remote'] += 1
+                return result
+            if state == 'leader':
+                break
+            joined = True
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+        self.stats['leader'] += 1
+        try:
+            result = await compute()
+        except BaseException:
+            self.stats['failed'] += 1
+            await asyncio.to_thread(self._finish, key, 'failed', None)
+            raise
+        try:
+            await asyncio.to_thread(self._finish, key, 'done', result)
+        except Exception as e:
+            # The row was released, so followers recompute; this request still has its result
+            print(f"Error publishing coalesced result: {e}")
+        return result
+
+    def _claim(self, key: str, joined: bool):
+        """Returns ('leader', None), ('done', result) or ('wait', None).
+
+        A finished result is only returned to a caller that `joined` while it was
+        pending, or within RESULT_TTL_SECONDS when result reuse is enabled.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.add(models.CoalescedRequest(key=key, status='pending', owner=WORKER_ID, hits=0, updated_at=now))
+            try:
+                db.commit()
+                return 'leader', None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.query(models.CoalescedRequest).filter(models.CoalescedRequest.key == key).first()
+            if row is None:
+                return 'wait', None
+            if row.status == 'done' and (joined or (RESULT_TTL_SECONDS and row.updated_at >= now - timedelta(seconds=RESULT_TTL_SECONDS))):
+                row.hits = (row.hits or 0) + 1
+                db.commit()
+                return 'done', row.result
+            if row.status == 'pending' and row.updated_at >= now - timedelta(seconds=LOCK_TIMEOUT_SECONDS):
+                return 'wait', None
+
+            # Failed, finished before this request, or abandoned: take over, guarded so only one worker wins
+            taken = db.query(models.CoalescedRequest).filter(
+                models.CoalescedRequest.key == key,
+                models.CoalescedRequest.updated_at == row.updated_at
+            ).update({'status': 'pending', 'owner': WORKER_ID, 'result': None, 'updated_at': now}, synchronize_session=False)
+            db.commit()
+            return ('leader', None) if taken else ('wait', None)
+        finally:
+            db.close()
+
+    def _finish(self, key: str, status: str, result: Any):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            try:
+                db.query(models.CoalescedRequest).filter(
+                    models.CoalescedRequest.key == key,
+                    models.CoalescedRequest.owner == WORKER_ID
+                ).update({'status': status, 'result': result, 'updated_at': now}, synchronize_session=False)
+                db.commit()
+            except BaseException:
+                # Never leave the row pending, or followers wait out LOCK_TIMEOUT_SECONDS
+                db.rollback()
+                db.query(models.CoalescedRequest).filter(
+                    models.CoalescedRequest.key == key,
+                    models.CoalescedRequest.owner == WORKER_ID
+                ).delete(synchronize_session=False)
+                db.commit()
+                raise
+            # Finished rows are only kept long enough for pollers to read them
+            db.query(models.CoalescedRequest).filter(
+                models.CoalescedRequest.status != 'pending',
+                models.CoalescedRequest.updated_at < now - timedelta(seconds=max(RESULT_RETENTION_SECONDS, RESULT_TTL_SECONDS))
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            rows = db.query(models.CoalescedRequest).all()
+            remote_hits = sum(row.hits or 0 for row in rows)
+            pending = sum(1 for row in rows if row.status == 'pending')
+        finally:
+            db.close()
+        return {
+            'worker': WORKER_ID,
+            'worker_stats': dict(self.stats),
+            'in_flight_local': len(self._inflight),
+            'in_flight_all_workers': pending,
+            'recent_cross_worker_hits': remote_hits
+        }
+
+request_coalescer = RequestCoalescer()
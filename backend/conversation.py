@@ -0,0 +1,191 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal
+from lazy_imports import lazy_import
+from llm.services import llm_client
+
+pd = lazy_import('pandas')
+
+# Most recent user/assistant messages sent verbatim; older ones are folded into the summary
+RECENT_MESSAGES = int(os.getenv("CONVERSATION_RECENT_MESSAGES", 6))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", 1500))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", 400))
+SCHEMA_CACHE_SIZE = 128
+SCHEMA_SAMPLE_ROWS = 5
+CHARS_PER_TOKEN = 4
+TURN_TYPES = ('user_query', 'ai_response')
+ROLES = {'user_query': 'User', 'ai_response': 'Assistant'}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting prompts"""
+    return (len(text or '') + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class ConversationMemory:
+    """Bounded per-project history for `/ask`.
+
+    Exchanges are stored as `AIConversation` rows. A prompt gets the latest
+    rolling summary plus the most recent messages after it, trimmed to the
+    token budget, so its size stays flat however long the session runs.
+    After each answer, `compact` folds messages that fell out of the recent
+    window into a new summary row (`message_type='summary'`) off the request
+    path.
+    """
+
+    def __init__(self, recent_messages: int = RECENT_MESSAGES, token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _latest_summary(self, db: Session, project_id: int) -> Optional[models.AIConversation]:
+        return db.query(models.AIConversation).filter(
+            models.AIConversation.project_id == project_id,
+            models.AIConversation.message_type == 'summary'
+        ).order_by(models.AIConversation.created_at.desc(), models.AIConversation.id.desc()).first()
+
+    def _turns_query(self, db: Session, project_id: int, after_id: int):
+        return db.query(models.AIConversation).filter(
+            models.AIConversation.project_id == project_id,
+            models.AIConversation.message_type.in_(TURN_TYPES),
+            models.AIConversation.id > after_id
+        )
+
+    def load(self, db: Session, project_id: int) -> Dict[str, Any]:
+        """{'summary', 'turns': [{'role', 'content'}], 'tokens'} within the token budget"""
+        summary_row = self._latest_summary(db, project_id)
+        summary = summary_row.content if summary_row else ''
+        covered = (summary_row.conversation_metadata or {}).get('covers_through_id', 0) if summary_row else 0
+
+        rows = self._turns_query(db, project_id, covered).order_by(
+            models.AIConversation.created_at.desc(), models.AIConversation.id.desc()
+        ).limit(self.recent_messages).all()
+
+        budget = self.token_budget - estimate_tokens(summary)
+        turns = []
+        for row in rows:
+            tokens = estimate_tokens(row.content)
+            if tokens > budget:
+                break
+            budget -= tokens
+            turns.append({'role': ROLES[row.message_type], 'content': row.content})
+        turns.reverse()
+        return {'summary': summary, 'turns': turns, 'tokens': self.token_budget - budget}
+
+    def format(self, memory: Dict[str, Any]) -> str:
+        parts = []
+        if memory['summary']:
+            parts.append(f"Summary of earlier conversation: {memory['summary']}")
+        parts.extend(f"{turn['role']}: {turn['content']}" for turn in memory['turns'])
+        return '\n'.join(parts)
+
+    def digest(self, memory: Dict[str, Any]) -> str:
+        """Identity of the history a prompt is built from (part of the coalescing key)"""
+        return hashlib.sha256(self.format(memory).encode('utf-8')).hexdigest()
+
+    def record(self, db: Session, project_id: int, question: str, answer: Dict[str, Any]):
+        db.add_all([
+            models.AIConversation(project_id=project_id, message_type='user_query', content=question),
+            models.AIConversation(
+                project_id=project_id,
+                message_type='ai_response',
+                content=str(answer.get('answer', '')),
+                conversation_metadata=answer
+            ),
+        ])
+        db.commit()
+
+    async def compact(self, project_id: int):
+        """Fold messages older than the recent window into the rolling summary"""
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            db = SessionLocal()
+            try:
+                summary_row = self._latest_summary(db, project_id)
+                covered = (summary_row.conversation_metadata or {}).get('covers_through_id', 0) if summary_row else 0
+                unsummarized = self._turns_query(db, project_id, covered).count()
+                overflow = unsummarized - self.recent_messages
+                if overflow <= 0:
+                    return
+
+                old_rows = self._turns_query(db, project_id, covered).order_by(
+                    models.AIConversation.created_at, models.AIConversation.id
+                ).limit(overflow).all()
+                summary = await self._summarize(summary_row.content if summary_row else '', old_rows)
+                db.add(models.AIConversation(
+                    project_id=project_id,
+                    message_type='summary',
+                    content=summary,
+                    conversation_metadata={'covers_through_id': old_rows[-1].id, 'tokens': estimate_tokens(summary)}
+                ))
+                # Only the newest summary is ever read
+                if summary_row:
+                    db.delete(summary_row)
+                db.commit()
+            finally:
+                db.close()
+
+    async def _summarize(self, previous: str, rows: List[models.AIConversation]) -> str:
+        transcript = '\n'.join(f"{ROLES[row.message_type]}: {row.content}" for row in rows)
+        prompt = f"""
+        Update the running summary of a data analysis conversation.
+        Keep the questions asked, the answers and numbers found, and any columns or filters the user focused on.
+        Answer with the summary only, in at most {SUMMARY_TOKEN_BUDGET * 3 // 4} words.
+
+        Current summary:
+        {previous or '(none)'}
+
+        New messages:
+        {transcript}
+        """
+        # Sent as-is: the analyze_data wrapper would ask for themes, entities and sentiment instead
+        result = await llm_client.complete(prompt)
+        summary = result.get('content') if 'error' not in result else None
+        if not summary:
+            # Extractive fallback: keep each exchange's opening sentence
+            lines = [f"{ROLES[row.message_type]}: {row.content.strip().split('. ')[0][:200]}" for row in rows]
+            summary = ' '.join(filter(None, [previous] + lines))
+        # Keep the newest part when over budget
+        return summary.strip()[-SUMMARY_TOKEN_BUDGET * CHARS_PER_TOKEN:]
+
+_schema_cache: OrderedDict = OrderedDict()
+_schema_lock = threading.Lock()
+
+def schema_context(key: str, data: pd.DataFrame) -> str:
+    """Compact column/statistics description of `data`, computed once per dataset key.
+
+    Stored datasets are immutable, so follow-up questions reuse this instead of
+    sending a fresh data dump with every prompt.
+    """
+    with _schema_lock:
+        if key in _schema_cache:
+            _schema_cache.move_to_end(key)
+            return _schema_cache[key]
+
+    columns = []
+    for name in data.columns:
+        series = data[name]
+        entry = {'name': str(name), 'dtype': str(series.dtype), 'nulls': int(series.isna().sum())}
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            described = series.describe()
+            entry.update({stat: round(float(described[stat]), 4) for stat in ('min', 'mean', 'max') if stat in described})
+        else:
+            entry['distinct'] = int(series.nunique())
+            entry['top'] = [str(value) for value in series.value_counts().head(3).index]
+        columns.append(entry)
+
+    sample = data.head(SCHEMA_SAMPLE_ROWS).to_string(max_colwidth=40)
+    context = f"Rows: {len(data)}\nColumns: {json.dumps(columns, default=str)}\nSample rows:\n{sample}"
+    with _schema_lock:
+        _schema_cache[key] = context
+        while len(_schema_cache) > SCHEMA_CACHE_SIZE:
+            _schema_cache.popitem(last=False)
+    return context
+
+conversation_memory = ConversationMemory()
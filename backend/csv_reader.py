@@ -0,0 +1,110 @@
+from __future__ import annotations
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Set, Union
+from lazy_imports import lazy_import
+from dataset_store import DATASET_STORE_DIR
+from json_reader import HEAD_ROWS, SpooledFrame
+
+pd = lazy_import('pandas')
+
+# Rows parsed at a time; bounds memory independently of file size
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", 100_000))
+
+class CsvReader:
+    """Parses CSV files chunk by chunk into a Parquet spool file.
+
+    pandas infers each chunk's dtypes on its own, so chunks are first written
+    as separate Parquet parts and then combined under one schema. A column
+    whose non-empty chunks disagree is widened: integers next to floats become
+    float64, and anything next to text is parsed again as text in a second
+    pass. At most one chunk is in memory at a time.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None, chunk_rows: int = CSV_CHUNK_ROWS):
+        self.spool_dir = spool_dir or os.path.join(DATASET_STORE_DIR, 'spool')
+        self.chunk_rows = chunk_rows
+
+    def read(self, path: str, compression: str = 'infer') -> Union[pd.DataFrame, SpooledFrame]:
+        """A spooled dataset, or an empty frame for a CSV without rows"""
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        parts_dir = tempfile.mkdtemp(dir=self.spool_dir)
+        try:
+            parts, types = self._write_parts(path, compression, parts_dir, set())
+            if not parts:
+                return pd.read_csv(path, compression=compression)
+            text_columns = {column for column, seen in types.items() if len(seen) > 1 and not _all_numeric(seen)}
+            if text_columns:
+                for part in parts:
+                    os.remove(part)
+                parts, types = self._write_parts(path, compression, parts_dir, text_columns)
+
+            schema = self._schema(parts, types)
+            fd, parquet_path = tempfile.mkstemp(dir=self.spool_dir, suffix='.parquet')
+            os.close(fd)
+            try:
+                row_count, sample, missing = 0, None, {name: 0 for name in schema.names}
+                with pq.ParquetWriter(parquet_path, schema) as writer:
+                    for part in parts:
+                        table = pq.read_table(part).cast(schema)
+                        if sample is None:
+                            sample = table.slice(0, HEAD_ROWS).to_pandas()
+                        for name, column in zip(schema.names, table.columns):
+                            missing[name] += column.null_count
+                        row_count += table.num_rows
+                        writer.write_table(table)
+                        os.remove(part)
+            except BaseException:
+                os.remove(parquet_path)
+                raise
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+        report = {'format': 'csv', 'rows': row_count, 'chunks': len(parts), 'text_columns': sorted(text_columns)}
+        return SpooledFrame(parquet_path, row_count, sample, missing, report)
+
+    def _write_parts(self, path: str, compression: str, parts_dir: str, text_columns: Set[str]):
+        """One Parquet part per chunk, and the Arrow types each column took in chunks where it had values"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parts: List[str] = []
+        types: Dict[str, Dict[str, Any]] = {}
+        dtype = {column: str for column in text_columns} or None
+        for chunk in pd.read_csv(path, chunksize=self.chunk_rows, compression=compression, dtype=dtype):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            for name, column in zip(table.column_names, table.columns):
+                seen = types.setdefault(name, {})
+                # A chunk where the column is empty parses as float64 but fits any type
+                if column.null_count < len(column):
+                    seen.setdefault(str(column.type), column.type)
+            part = os.path.join(parts_dir, f"{len(parts):06d}.parquet")
+            pq.write_table(table, part)
+            parts.append(part)
+        return parts, types
+
+    def _schema(self, parts: List[str], types: Dict[str, Dict[str, Any]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        fields = []
+        for field in pq.read_schema(parts[0]):
+            seen = types[field.name]
+            if not seen:
+                arrow_type = field.type
+            elif len(seen) == 1:
+                arrow_type = next(iter(seen.values()))
+            else:
+                # Only numeric types are still mixed after the text pass
+                arrow_type = pa.float64()
+            fields.append(pa.field(field.name, arrow_type))
+        return pa.schema(fields)
+
+def _all_numeric(seen: Dict[str, Any]) -> bool:
+    import pyarrow as pa
+    return all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in seen.values())
+
+csv_reader = CsvReader()
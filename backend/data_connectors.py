@@ -1,16 +1,30 @@
-import pandas as pd
+from __future__ import annotations
+import asyncio
+import hashlib
 import io
 import json
-from typing import Dict, Any, Optional
-import httpx
-import boto3
+import re
+from typing import Dict, Any, List, Optional
 # from google.cloud import bigquery  # Removed due to Python 3.13 compatibility
-import pdfplumber
-import mysql.connector
-import psycopg2
-from sqlalchemy import create_engine
-import openpyxl
-from llm.services import llm_client
+from llm.batching import llm_batcher, frame_group_key
+from lazy_imports import lazy_import
+from s3_reader import s3_reader
+from rest_reader import rest_reader
+from excel_reader import excel_reader, read_sheet
+from csv_reader import csv_reader
+from json_reader import json_reader, SpooledFrame
+from dtype_optimizer import optimize_dtypes
+from dataset_store import hash_file, make_fingerprint
+from data_quality import quality_engine, digest
+from metrics import span
+
+# Drivers (pdfplumber, mysql.connector, psycopg2, openpyxl) are imported by the
+# connector that needs them, so workers only pay for the sources they serve
+pd = lazy_import('pandas')
+
+# Column names interpolated into incremental queries
+SQL_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+TABULAR_EXTENSIONS = ('.csv', '.csv.gz', '.json', '.jsonl', '.ndjson', '.xlsx', '.xls')
 
 class DataConnector:
     def __init__(self):
@@ -30,31 +44,123 @@ class DataConnector:
     async def connect(self, source_type: str, config: Dict[str, Any]) -> Dict[str, Any]:
         """Connect to data source and return data preview and profile"""
         try:
-            if source_type not in self.connectors:
-                raise ValueError(f"Unsupported data source type: {source_type}")
-            
-            # Get data
-            data = await self.connectors[source_type](config)
+            data = await self.fetch(source_type, config)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        return await self._finish(data, source_type)
+    
+    async def fetch(self, source_type: str, config: Dict[str, Any]):
+        """The source's data alone, without preview or profile"""
+        if source_type not in self.connectors:
+            raise ValueError(f"Unsupported data source type: {source_type}")
+        with span('connect', source_type=source_type):
+            return await self.connectors[source_type](config)
+    
+    async def fetch_since(self, source_type: str, config: Dict[str, Any], column: str, watermark) -> pd.DataFrame:
+        """Rows of a SQL source whose `column` is past `watermark`, i.e. appended since the last read"""
+        if not SQL_IDENTIFIER.match(column):
+            raise ValueError(f"Invalid incremental column: {column}")
+        if 'query' not in config:
+            # A table source is stored as its first 1000 rows; rows past their maximum are not "appended"
+            raise ValueError("Incremental refresh requires a query")
+        base = config['query']
+        
+        def query(placeholder: str) -> str:
+            return f"SELECT * FROM ({base}) AS appended WHERE {column} > {placeholder} ORDER BY {column}"
+        
+        def read():
+            if source_type == 'postgres':
+                from sqlalchemy import text
+                return pd.read_sql(text(query(':watermark')), self._postgres_engine(config), params={'watermark': watermark})
+            if source_type == 'mysql':
+                return pd.read_sql(query('%s'), self._mysql_connection(config), params=(watermark,))
+            raise ValueError(f"Incremental refresh is not supported for {source_type} sources")
+        
+        with span('connect', source_type=source_type, incremental=True):
+            return await asyncio.to_thread(read)
+    
+    async def connect_sheets(self, config: Dict[str, Any], sheets: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Several sheets of one workbook, parsed in parallel; one connect() result per sheet name"""
+        try:
+            with span('connect', source_type='excel', sheets=len(sheets)):
+                frames = await excel_reader.read_sheets(config['file_path'], sheets)
+        except Exception as e:
+            return {sheet: {'success': False, 'error': str(e)} for sheet in sheets}
+        results = await asyncio.gather(*(self._finish(frames[sheet], 'excel') for sheet in sheets))
+        return dict(zip(sheets, results))
+    
+    async def _finish(self, data, source_type: str) -> Dict[str, Any]:
+        """Dtype optimization, preview and first-contact profile of fetched data"""
+        try:
+            # Shrink dtypes before anything else touches the frame
+            memory_report = None
+            if isinstance(data, pd.DataFrame):
+                with span('optimize_dtypes'):
+                    data, memory_report = await asyncio.to_thread(optimize_dtypes, data)
             
             # Generate preview
-            preview = self._generate_preview(data)
+            with span('preview'):
+                preview = self._generate_preview(data)
+            
+            # Rule-based quality scan of every row; the LLM only summarizes its findings
+            with span('quality.scan'):
+                try:
+                    quality = await asyncio.to_thread(quality_engine.scan, data)
+                except Exception as e:
+                    # The data is usable without its report, which the quality endpoint can rebuild
+                    print(f"Error scanning data quality: {e}")
+                    quality = None
             
             # AI-powered first contact analysis
-            profile = await self._analyze_first_contact(data, source_type)
+            with span('profile'):
+                profile = await self._analyze_first_contact(data, source_type, quality)
+            if quality:
+                profile['quality'] = quality
+            if memory_report:
+                profile['memory_usage'] = memory_report
+            if isinstance(data, SpooledFrame):
+                profile['ingestion'] = data.report
             
             return {
                 'success': True,
+                'data': data,
                 'data_preview': preview,
                 'data_profile': profile,
-                'raw_data_sample': data.head(100).to_dict('records') if hasattr(data, 'head') else data[:100]
+                'raw_data_sample': self._to_records(data.head(100)) if hasattr(data, 'head') else data[:100]
             }
             
         except Exception as e:
+            if isinstance(data, SpooledFrame):
+                data.discard()
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    async def fingerprint(self, source_type: str, config: Dict[str, Any], content_digest: Optional[str] = None) -> Optional[str]:
+        """Content fingerprint for uploads and fetched objects, or None for live sources (SQL, API)"""
+        if content_digest:
+            digest = content_digest
+        elif source_type in ('csv', 'excel', 'json', 'pdf') and 'file_path' in config:
+            digest = await asyncio.to_thread(hash_file, config['file_path'])
+        elif source_type == 's3' and config.get('key'):
+            path = await asyncio.to_thread(s3_reader.fetch, config, config['bucket'], config['key'])
+            digest = await asyncio.to_thread(s3_reader.cache.content_hash, config['bucket'], config['key'], path, hash_file)
+        else:
+            return None
+        return make_fingerprint(source_type, config, digest)
+    
+    def frame_fingerprint(self, source_type: str, config: Dict[str, Any], data) -> Optional[str]:
+        """Fingerprint of already-fetched rows, so identical live results share storage"""
+        if not isinstance(data, pd.DataFrame):
+            return None
+        digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+        digest.update(json.dumps([str(column) for column in data.columns]).encode('utf-8'))
+        return make_fingerprint(source_type, config, digest.hexdigest())
+    
     def _generate_preview(self, data):
         """Generate data preview for UI"""
         if isinstance(data, pd.DataFrame):
@@ -62,10 +168,19 @@ class DataConnector:
                 'row_count': len(data),
                 'column_count': len(data.columns),
                 'columns': list(data.columns),
-                'sample_data': data.head(10).to_dict('records'),
+                'sample_data': self._to_records(data.head(10)),
                 'dtypes': data.dtypes.astype(str).to_dict(),
                 'missing_values': data.isnull().sum().to_dict()
             }
+        elif isinstance(data, SpooledFrame):
+            return {
+                'row_count': len(data),
+                'column_count': len(data.columns),
+                'columns': list(data.columns),
+                'sample_data': self._to_records(data.head(10)),
+                'dtypes': data.dtypes.astype(str).to_dict(),
+                'missing_values': data.missing_values
+            }
         elif isinstance(data, list):
             return {
                 'row_count': len(data),
@@ -75,23 +190,26 @@ class DataConnector:
         else:
             return {'type': 'unknown', 'data': str(data)[:500]}
     
-    async def _analyze_first_contact(self, data, source_type: str) -> Dict[str, Any]:
+    def _to_records(self, data: pd.DataFrame):
+        """JSON-safe records (datetimes, categoricals and NumPy scalars included)"""
+        return json.loads(data.to_json(orient='records', date_format='iso'))
+    
+    async def _analyze_first_contact(self, data, source_type: str, quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """AI-powered analysis of initial data contact"""
-        if isinstance(data, pd.DataFrame):
-            data_str = data.head(50).to_string()
+        if isinstance(data, (pd.DataFrame, SpooledFrame)):
+            # The quality scan already covered every row; a few rows show the structure
+            data_str = data.head(10).to_string()
         elif isinstance(data, list):
             data_str = str(data[:50])
         else:
             data_str = str(data)
         
-        prompt = f"""
-        You are an expert data analyst performing "first contact" analysis. Analyze this data sample from a {source_type} source:
-        
-        {data_str[:2000]}
+        instructions = f"""
+        You are an expert data analyst performing "first contact" analysis of a data sample from a {source_type} source.
         
         Provide a comprehensive analysis including:
         1. Data structure and schema assessment
-        2. Data quality issues (missing values, inconsistencies, formatting problems)
+        2. A summary of the data quality findings listed below, which come from rule checks over every row (do not look for other quality issues)
         3. Potential data cleansing recommendations
         4. Initial insights about the data content
         5. Suggestions for further analysis
@@ -99,12 +217,22 @@ class DataConnector:
         Return your analysis as JSON with keys: structure_assessment, quality_issues, cleansing_recommendations, initial_insights, analysis_suggestions.
         """
         
-        result = await llm_client.analyze_data('deepseek', prompt)
+        # Prompts about the same data arriving together share one LLM round-trip
+        group_key = frame_group_key(data) if isinstance(data, (pd.DataFrame, SpooledFrame)) else hashlib.sha1(data_str.encode('utf-8')).hexdigest()
+        if quality:
+            instructions += f"""
+        Data quality findings:
+        {digest(quality)}
+        """
+        result = await llm_batcher.submit(group_key, instructions, data_str[:2000])
         
         try:
-            return json.loads(result.get('analysis', '{}'))
+            profile = json.loads(result.get('analysis', '{}'))
         except:
-            return {'analysis': result.get('analysis', 'Analysis failed')}
+            profile = None
+        if not isinstance(profile, dict):
+            profile = {'analysis': result.get('analysis', 'Analysis failed')}
+        return profile
     
     # Individual connector methods
     async def _connect_csv(self, config):
@@ -116,37 +244,48 @@ class DataConnector:
             raise ValueError("CSV config requires file_content or file_path")
     
     async def _connect_excel(self, config):
-        if 'file_content' in config:
-            return pd.read_excel(io.BytesIO(config['file_content']))
-        elif 'file_path' in config:
-            return pd.read_excel(config['file_path'])
+        if 'file_path' in config:
+            return await excel_reader.read(config['file_path'], config.get('sheet'))
+        elif 'file_content' in config:
+            return pd.read_excel(io.BytesIO(config['file_content']), sheet_name=config.get('sheet') or 0)
         else:
             raise ValueError("Excel config requires file_content or file_path")
     
     async def _connect_json(self, config):
-        if 'file_content' in config:
-            return pd.read_json(io.StringIO(config['file_content']))
-        elif 'file_path' in config:
-            return pd.read_json(config['file_path'])
+        if 'file_path' in config:
+            # Large files go straight to a Parquet spool file in bounded batches
+            return await asyncio.to_thread(json_reader.read, config['file_path'], config)
+        elif 'file_content' in config:
+            content = config['file_content']
+            source = io.BytesIO(content if isinstance(content, bytes) else content.encode('utf-8'))
+            return await asyncio.to_thread(json_reader.read_frame, source, config)
         elif 'data' in config:
             return pd.DataFrame(config['data'])
         else:
             raise ValueError("JSON config requires file_content, file_path, or data")
     
     async def _connect_postgres(self, config):
-        engine = create_engine(f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config.get('port', 5432)}/{config['database']}")
         query = config.get('query', f"SELECT * FROM {config.get('table', 'information_schema.tables')} LIMIT 1000")
-        return pd.read_sql(query, engine)
+        return pd.read_sql(query, self._postgres_engine(config))
     
     async def _connect_mysql(self, config):
-        conn = mysql.connector.connect(
+        query = config.get('query', f"SELECT * FROM {config.get('table', 'information_schema.tables')} LIMIT 1000")
+        return pd.read_sql(query, self._mysql_connection(config))
+    
+    def _postgres_engine(self, config):
+        from sqlalchemy import create_engine
+        
+        return create_engine(f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config.get('port', 5432)}/{config['database']}")
+    
+    def _mysql_connection(self, config):
+        import mysql.connector
+        
+        return mysql.connector.connect(
             host=config['host'],
             user=config['user'],
             password=config['password'],
             database=config['database']
         )
-        query = config.get('query', f"SELECT * FROM {config.get('table', 'information_schema.tables')} LIMIT 1000")
-        return pd.read_sql(query, conn)
     
     # async def _connect_bigquery(self, config):
     #     client = bigquery.Client.from_service_account_json(config['service_account_key'])
@@ -154,31 +293,53 @@ class DataConnector:
     #     return client.query(query).to_dataframe()
     
     async def _connect_s3(self, config):
-        s3 = boto3.client('s3', 
-                         aws_access_key_id=config['access_key'],
-                         aws_secret_access_key=config['secret_key'])
-        
-        obj = s3.get_object(Bucket=config['bucket'], Key=config['key'])
-        file_content = obj['Body'].read()
-        
-        if config['key'].endswith('.csv'):
-            return pd.read_csv(io.BytesIO(file_content))
-        elif config['key'].endswith('.json'):
-            return pd.read_json(io.BytesIO(file_content))
-        elif config['key'].endswith(('.xlsx', '.xls')):
-            return pd.read_excel(io.BytesIO(file_content))
+        bucket = config['bucket']
+        
+        if config.get('key'):
+            path = await asyncio.to_thread(s3_reader.fetch, config, bucket, config['key'])
+            # A single object is parsed in bounded chunks straight into a Parquet spool file
+            return await asyncio.to_thread(self._read_object_file, path, config['key'], True)
+        
+        if 'prefix' not in config:
+            raise ValueError("S3 config requires key or prefix")
+        
+        keys = await asyncio.to_thread(s3_reader.list_keys, config, bucket, config['prefix'])
+        keys = [key for key in keys if key.lower().endswith(TABULAR_EXTENSIONS)]
+        if not keys:
+            raise ValueError(f"No CSV, JSON or Excel objects found under s3://{bucket}/{config['prefix']}")
+        
+        def load(path, key):
+            return self._read_object_file(path, key).assign(_s3_key=key)
+        
+        frames = await s3_reader.fetch_many(config, bucket, keys, load)
+        return pd.concat(frames, ignore_index=True)
+    
+    def _read_object_file(self, path: str, key: str, spool: bool = False):
+        """Parse a locally cached object according to its key's extension.
+        
+        With `spool`, CSV and JSON records go to a Parquet spool file chunk by
+        chunk; otherwise (objects under a prefix, which are combined) they are
+        read into a frame.
+        """
+        key = key.lower()
+        # Cached objects lose their extension on disk, so compression is taken from the key
+        if key.endswith(('.csv.gz', '.csv')):
+            compression = 'gzip' if key.endswith('.gz') else None
+            return csv_reader.read(path, compression) if spool else pd.read_csv(path, compression=compression)
+        elif key.endswith(('.jsonl', '.ndjson', '.json')):
+            options = {'lines': not key.endswith('.json')}
+            if spool:
+                return json_reader.read(path, options)
+            with open(path, 'rb') as f:
+                return json_reader.read_frame(f, options)
+        elif key.endswith(('.xlsx', '.xls')):
+            return read_sheet(path)
         else:
-            return file_content.decode('utf-8')
+            with open(path, 'rb') as f:
+                return f.read().decode('utf-8')
     
     async def _connect_api(self, config):
-        async with httpx.AsyncClient() as client:
-            response = await client.get(config['url'], headers=config.get('headers', {}))
-            response.raise_for_status()
-            
-            if config.get('format') == 'json':
-                return pd.DataFrame(response.json())
-            else:
-                return response.text
+        return await rest_reader.read(config)
     
     async def _connect_salesforce(self, config):
         # Placeholder for Salesforce connection
@@ -186,6 +347,8 @@ class DataConnector:
         raise NotImplementedError("Salesforce connector not implemented yet")
     
     async def _connect_pdf(self, config):
+        import pdfplumber
+        
         if 'file_content' in config:
             with pdfplumber.open(io.BytesIO(config['file_content'])) as pdf:
                 text = "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
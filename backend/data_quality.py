@@ -0,0 +1,314 @@
+from __future__ import annotations
+import asyncio
+import os
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session
+import models
+from dataset_store import dataset_store
+from dtype_optimizer import DATETIME_PATTERN
+from lazy_imports import lazy_import
+from metrics import span
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Row positions kept per finding; they are offsets into the stored rows, as used by the /rows endpoint
+ROW_SAMPLE_SIZE = int(os.getenv("QUALITY_ROW_SAMPLE_SIZE", 20))
+NULL_WARNING_RATIO = 0.2
+# Share of a text column's values that must parse as numbers or dates before the rest count as bad values
+TYPE_MAJORITY_RATIO = 0.9
+EMAIL_MAJORITY_RATIO = 0.5
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+DATE_NAME_PATTERN = re.compile(r'date|time|_at$|_on$', re.IGNORECASE)
+ZSCORE_THRESHOLD = 3.0
+IQR_MULTIPLIER = 1.5
+OUTLIER_WARNING_RATIO = 0.05
+# Dates outside this window are usually placeholders such as 1900-01-01 or 9999-12-31
+MIN_PLAUSIBLE_YEAR = 1900
+MAX_FUTURE_YEARS = 100
+# Foreign-key candidates are checked against a same-named column this unique in another source
+KEY_SUFFIXES = ('_id', '_key', '_code')
+MIN_PARENT_UNIQUENESS = 0.99
+HASH_MULTIPLIER = 1_000_003
+SEVERITIES = ('error', 'warning', 'info')
+
+class QualityEngine:
+    """Deterministic data-quality rules over every row of a dataset.
+
+    `scan` reads each column once and runs vectorized checks on it: nulls,
+    constant columns, values that break a text column's majority type,
+    IQR/z-score outliers, invalid emails and dates. Column hashes are folded
+    into one hash per row as the columns go by, which finds duplicate rows
+    without a second pass. Findings are stored per column with the positions
+    of up to ROW_SAMPLE_SIZE offending rows.
+
+    The scan of a dataset lives in its profile (`data_profile['quality']`),
+    shared by every source using it; `assess` adds referential checks
+    against the project's other sources and stores the result on
+    `DataSource.data_quality_issues`. The first-contact LLM call only
+    summarizes these findings.
+    """
+
+    def scan(self, data) -> Optional[Dict[str, Any]]:
+        """Findings for a frame, a Parquet path, or streamed data with a `parquet_path`"""
+        reader = _column_reader(data)
+        if reader is None:
+            return None
+        columns, row_count, read_column = reader
+
+        report_columns = {}
+        row_hash = np.zeros(row_count, dtype=np.uint64)
+        for column in columns:
+            series = read_column(column)
+            report_columns[str(column)] = self._check_column(series, row_count)
+            row_hash = row_hash * np.uint64(HASH_MULTIPLIER) ^ _hash_values(series)
+
+        findings = []
+        if row_count > 1:
+            duplicates = self._duplicates(row_hash)
+            if duplicates:
+                findings.append(duplicates)
+
+        report = {
+            'engine': 'rules',
+            'checked_at': datetime.utcnow().isoformat(),
+            'row_count': row_count,
+            'column_count': len(columns),
+            'dataset': findings,
+            'columns': report_columns,
+        }
+        report['summary'] = _summary(report)
+        return report
+
+    def _check_column(self, series: pd.Series, row_count: int) -> Dict[str, Any]:
+        null_mask = series.isna().to_numpy()
+        nulls = int(null_mask.sum())
+        result: Dict[str, Any] = {
+            'dtype': str(series.dtype),
+            'nulls': nulls,
+            'null_ratio': round(nulls / row_count, 6) if row_count else 0.0,
+            'issues': [],
+        }
+        issues = result['issues']
+        if nulls:
+            severity = 'error' if nulls == row_count else ('warning' if nulls / row_count >= NULL_WARNING_RATIO else 'info')
+            issues.append(_finding('nulls', severity, np.flatnonzero(null_mask), row_count))
+
+        positions = np.flatnonzero(~null_mask)
+        values = series[~null_mask]
+        if not len(values):
+            return result
+        try:
+            distinct = int(values.nunique())
+            nested = False
+        except TypeError:
+            # Nested values (lists, dicts from JSON) are compared by their text and get no text rules
+            values = values.astype(str)
+            distinct = int(values.nunique())
+            nested = True
+        result['distinct'] = distinct
+        if distinct == 1 and row_count > 1:
+            issues.append({'rule': 'constant', 'severity': 'info', 'count': row_count, 'ratio': 1.0, 'rows': [], 'value': str(values.iloc[0])})
+
+        if pd.api.types.is_bool_dtype(values):
+            pass
+        elif pd.api.types.is_numeric_dtype(values):
+            issues.extend(self._numeric_rules(values, positions, row_count))
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            issues.extend(self._datetime_rules(values, positions, row_count))
+        elif not nested:
+            issues.extend(self._text_rules(series.name, values, positions, row_count))
+        return result
+
+    def _numeric_rules(self, values: pd.Series, positions: np.ndarray, row_count: int) -> List[Dict[str, Any]]:
+        numbers = values.to_numpy(dtype='float64')
+        finite = np.isfinite(numbers)
+        numbers, positions = numbers[finite], positions[finite]
+        if len(numbers) < 4:
+            return []
+        q1, q3 = np.quantile(numbers, [0.25, 0.75])
+        low, high = q1 - IQR_MULTIPLIER * (q3 - q1), q3 + IQR_MULTIPLIER * (q3 - q1)
+        iqr_mask = (numbers < low) | (numbers > high) if q3 > q1 else np.zeros(len(numbers), dtype=bool)
+        mean, std = numbers.mean(), numbers.std()
+        z_mask = np.abs(numbers - mean) > ZSCORE_THRESHOLD * std if std > 0 else np.zeros(len(numbers), dtype=bool)
+        flagged = iqr_mask | z_mask
+        if not flagged.any():
+            return []
+        severity = 'warning' if flagged.sum() / row_count > OUTLIER_WARNING_RATIO else 'info'
+        return [_finding(
+            'outliers', severity, positions[flagged], row_count,
+            iqr={'count': int(iqr_mask.sum()), 'low': float(low), 'high': float(high)},
+            zscore={'count': int(z_mask.sum()), 'threshold': ZSCORE_THRESHOLD, 'mean': float(mean), 'std': float(std)}
+        )]
+
+    def _datetime_rules(self, values: pd.Series, positions: np.ndarray, row_count: int) -> List[Dict[str, Any]]:
+        if values.dt.tz is not None:
+            values = values.dt.tz_convert(None)
+        earliest = pd.Timestamp(year=MIN_PLAUSIBLE_YEAR, month=1, day=1)
+        latest = pd.Timestamp.now() + pd.DateOffset(years=MAX_FUTURE_YEARS)
+        implausible = ((values < earliest) | (values > latest)).to_numpy()
+        if not implausible.any():
+            return []
+        return [_finding(
+            'invalid_date', 'warning', positions[implausible], row_count,
+            reason='implausible', earliest=earliest.isoformat(), latest=latest.date().isoformat()
+        )]
+
+    def _text_rules(self, name, values: pd.Series, positions: np.ndarray, row_count: int) -> List[Dict[str, Any]]:
+        text = values.astype(str)
+
+        numbers = pd.to_numeric(text, errors='coerce').notna().to_numpy()
+        ratio = numbers.mean()
+        if TYPE_MAJORITY_RATIO <= ratio < 1:
+            return [_finding('type_mismatch', 'warning', positions[~numbers], row_count, expected='numeric', majority_ratio=round(float(ratio), 6))]
+
+        if DATE_NAME_PATTERN.search(str(name)) or text.head(500).str.strip().str.fullmatch(DATETIME_PATTERN).mean() >= TYPE_MAJORITY_RATIO:
+            # Each value is parsed on its own, so a column mixing date formats is still valid
+            dates = pd.to_datetime(text, errors='coerce', format='mixed').notna().to_numpy()
+            ratio = dates.mean()
+            if TYPE_MAJORITY_RATIO <= ratio < 1:
+                return [_finding('invalid_date', 'warning', positions[~dates], row_count, reason='unparseable', majority_ratio=round(float(ratio), 6))]
+
+        if 'email' in str(name).lower() or text.str.contains('@', regex=False).mean() >= EMAIL_MAJORITY_RATIO:
+            valid = text.str.match(EMAIL_PATTERN).fillna(False).to_numpy(dtype=bool)
+            if not valid.all():
+                return [_finding('invalid_email', 'warning', positions[~valid], row_count)]
+        return []
+
+    def _duplicates(self, row_hash: np.ndarray) -> Optional[Dict[str, Any]]:
+        codes, _ = pd.factorize(row_hash)
+        # np.unique over 0..k-1 codes gives each code's first position
+        _, first_positions = np.unique(codes, return_index=True)
+        duplicate = np.flatnonzero(first_positions[codes] != np.arange(len(codes)))
+        if not len(duplicate):
+            return None
+        finding = _finding('duplicate_rows', 'warning', duplicate, len(row_hash))
+        finding['duplicate_of'] = first_positions[codes[duplicate[:ROW_SAMPLE_SIZE]]].tolist()
+        return finding
+
+    async def references(self, db: Session, data_source: models.DataSource) -> Dict[str, List[Dict[str, Any]]]:
+        """Per column, values of key-like columns missing from a unique same-named column of another project source"""
+        dataset = data_source.dataset
+        columns = [str(column) for column in (data_source.data_preview or {}).get('columns', [])]
+        keys = [column for column in columns if column.lower().endswith(KEY_SUFFIXES)]
+        if not keys or dataset is None or not dataset.storage_path:
+            return {}
+        others = db.query(models.DataSource).filter(
+            models.DataSource.project_id == data_source.project_id,
+            models.DataSource.id != data_source.id
+        ).all()
+
+        findings: Dict[str, List[Dict[str, Any]]] = {}
+        for other in others:
+            if other.dataset is None or not other.dataset.storage_path or other.dataset_id == data_source.dataset_id:
+                continue
+            shared = [key for key in keys if key in {str(column) for column in (other.data_preview or {}).get('columns', [])}]
+            if not shared:
+                continue
+            frames = await asyncio.gather(
+                asyncio.to_thread(dataset_store.load_frame, dataset, shared),
+                asyncio.to_thread(dataset_store.load_frame, other.dataset, shared)
+            )
+            for column in shared:
+                finding = _orphans(frames[0][column], frames[1][column])
+                if finding:
+                    finding['references'] = {'data_source_id': other.id, 'data_source': other.name, 'column': column}
+                    findings.setdefault(column, []).append(finding)
+        return findings
+
+    async def assess(self, db: Session, data_source: models.DataSource, recheck: bool = False) -> Optional[Dict[str, Any]]:
+        """Store the source's quality report: its dataset's scan plus referential checks (committed here)"""
+        dataset = data_source.dataset
+        if dataset is None:
+            return None
+        profile = dataset.data_profile or {}
+        scan = None if recheck else profile.get('quality')
+        if scan is None:
+            if not dataset.storage_path or not os.path.exists(dataset.storage_path):
+                return None
+            with span('quality.scan'):
+                scan = await asyncio.to_thread(self.scan, dataset.storage_path)
+            # Reassigned, not mutated, so the JSON column is written
+            dataset.data_profile = {**profile, 'quality': scan}
+
+        with span('quality.references'):
+            references = await self.references(db, data_source)
+        report = {**scan, 'columns': {column: dict(result) for column, result in scan['columns'].items()}}
+        for column, findings in references.items():
+            report['columns'][column]['issues'] = report['columns'][column]['issues'] + findings
+        report['summary'] = _summary(report)
+        data_source.data_quality_issues = report
+        db.commit()
+        return report
+
+def digest(report: Optional[Dict[str, Any]], limit: int = 40) -> str:
+    """Compact text of the findings, without row pointers, for the LLM to summarize"""
+    if not report:
+        return "No quality scan available."
+    lines = [f"{report['row_count']} rows, {report['column_count']} columns; findings by severity: {report['summary']}"]
+    for finding in report['dataset']:
+        lines.append(f"dataset: {finding['rule']} {finding['count']} rows ({finding['ratio']:.2%}, {finding['severity']})")
+    for column, result in report['columns'].items():
+        for finding in result['issues']:
+            lines.append(f"{column} ({result['dtype']}): {finding['rule']} {finding['count']} rows ({finding['ratio']:.2%}, {finding['severity']})")
+    if len(lines) > limit + 1:
+        lines = lines[:limit + 1] + [f"... {len(lines) - limit - 1} more findings"]
+    return "\n".join(lines)
+
+def _column_reader(data) -> Optional[Tuple[List[Any], int, Any]]:
+    """(columns, row count, column -> Series) for a frame or a Parquet file"""
+    if isinstance(data, pd.DataFrame):
+        return list(data.columns), len(data), lambda column: data[column]
+    path = data if isinstance(data, str) else getattr(data, 'parquet_path', None)
+    if not path:
+        return None
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+
+    def read_column(column):
+        return parquet.read(columns=[column]).column(0).to_pandas().rename(column)
+
+    return parquet.schema_arrow.names, parquet.metadata.num_rows, read_column
+
+def _hash_values(series: pd.Series) -> np.ndarray:
+    try:
+        return pd.util.hash_pandas_object(series, index=False).to_numpy()
+    except TypeError:
+        # Nested values (lists, dicts from JSON) are hashed by their text
+        return pd.util.hash_pandas_object(series.astype(str), index=False).to_numpy()
+
+def _finding(rule: str, severity: str, positions: np.ndarray, row_count: int, **details) -> Dict[str, Any]:
+    return {
+        'rule': rule,
+        'severity': severity,
+        'count': int(len(positions)),
+        'ratio': round(len(positions) / row_count, 6) if row_count else 0.0,
+        'rows': positions[:ROW_SAMPLE_SIZE].tolist(),
+        **details,
+    }
+
+def _orphans(child: pd.Series, parent: pd.Series) -> Optional[Dict[str, Any]]:
+    parent = parent.dropna()
+    if not len(parent) or parent.nunique() / len(parent) < MIN_PARENT_UNIQUENESS:
+        return None
+    present = child.notna().to_numpy()
+    if pd.api.types.is_numeric_dtype(child) != pd.api.types.is_numeric_dtype(parent):
+        child, parent = child.astype(str), parent.astype(str)
+    missing = present & ~child.isin(parent.unique()).to_numpy()
+    if not missing.any():
+        return None
+    ratio = missing.sum() / max(present.sum(), 1)
+    return _finding('orphan_reference', 'error' if ratio > 0.5 else 'warning', np.flatnonzero(missing), len(child))
+
+def _summary(report: Dict[str, Any]) -> Dict[str, int]:
+    counts = {severity: 0 for severity in SEVERITIES}
+    for finding in report['dataset']:
+        counts[finding['severity']] += 1
+    for result in report['columns'].values():
+        for finding in result['issues']:
+            counts[finding['severity']] += 1
+    return counts
+
+quality_engine = QualityEngine()
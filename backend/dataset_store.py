@@ -0,0 +1,204 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+from dtype_optimizer import arrow_compatible, optimize_dtypes
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+DATASET_STORE_DIR = os.getenv("DATASET_STORE_DIR", "./dataset_store")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Config keys that identify where content came from rather than how it is parsed
+LOCATION_KEYS = {
+    'name', 'type', 'file_path', 'file_content',
+    'bucket', 'key', 'access_key', 'secret_key', 'region', 'endpoint_url',
+}
+
+def hash_file(path: str) -> str:
+    """Streaming sha256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_fingerprint(source_type: str, config: Dict[str, Any], content_digest: str) -> str:
+    """Identity of a parsed dataset: same bytes parsed the same way share one fingerprint"""
+    options = {k: v for k, v in config.items() if k not in LOCATION_KEYS}
+    material = f"{source_type}\n{json.dumps(options, sort_keys=True, default=str)}\n{content_digest}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class DatasetStore:
+    """Content-addressed storage of parsed datasets shared across DataSource rows.
+
+    Frames are written once as Parquet under DATASET_STORE_DIR; the `datasets`
+    table holds the preview/profile and a reference count so a dataset is only
+    deleted when the last DataSource using it goes away.
+    """
+
+    def __init__(self, root: str = DATASET_STORE_DIR):
+        self.root = root
+
+    def _frame_path(self, fingerprint: str) -> str:
+        return os.path.join(self.root, fingerprint[:2], f"{fingerprint}.parquet")
+
+    async def spool_upload(self, upload, chunk_size: int = HASH_CHUNK_SIZE) -> Tuple[str, str]:
+        """Stream an UploadFile to a temp file, hashing as it goes.
+
+        Returns (temp_path, sha256). The caller removes the temp file.
+        """
+        spool_dir = os.path.join(self.root, 'spool')
+        os.makedirs(spool_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        suffix = os.path.splitext(upload.filename or '')[1]
+        fd, path = tempfile.mkstemp(dir=spool_dir, suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        return path, digest.hexdigest()
+
+    def find(self, db: Session, fingerprint: Optional[str]) -> Optional[models.Dataset]:
+        if not fingerprint:
+            return None
+        return db.query(models.Dataset).filter(models.Dataset.fingerprint == fingerprint).first()
+
+    def create(self, db: Session, fingerprint: Optional[str], result: Dict[str, Any]) -> models.Dataset:
+        """Persist a connector result; returns the existing row if another request won the race"""
+        data = result.get('data')
+        storage_path = None
+        if fingerprint and isinstance(data, pd.DataFrame):
+            storage_path = self.save_frame(fingerprint, data)
+        elif fingerprint and hasattr(data, 'parquet_path'):
+            # Streamed ingestion already wrote the Parquet file
+            storage_path = self.adopt_file(fingerprint, data.parquet_path)
+
+        dataset = models.Dataset(
+            fingerprint=fingerprint,
+            storage_path=storage_path,
+            row_count=len(data) if hasattr(data, '__len__') else None,
+            raw_data=json.dumps(result['raw_data_sample']) if result.get('raw_data_sample') else None,
+            data_preview=result['data_preview'],
+            data_profile=result['data_profile'],
+            ref_count=0
+        )
+        db.add(dataset)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return self.find(db, fingerprint)
+        db.refresh(dataset)
+        return dataset
+
+    def acquire(self, db: Session, dataset: models.Dataset):
+        """Count one more DataSource reference (committed by the caller)"""
+        db.query(models.Dataset).filter(models.Dataset.id == dataset.id).update(
+            {models.Dataset.ref_count: models.Dataset.ref_count + 1}, synchronize_session=False
+        )
+
+    def release(self, db: Session, dataset: models.Dataset):
+        """Drop one reference; deletes the row and its file once nothing uses it"""
+        db.query(models.Dataset).filter(models.Dataset.id == dataset.id).update(
+            {models.Dataset.ref_count: models.Dataset.ref_count - 1}, synchronize_session=False
+        )
+        db.flush()
+        db.refresh(dataset)
+        if dataset.ref_count <= 0:
+            storage_path = dataset.storage_path
+            db.delete(dataset)
+            db.commit()
+            if storage_path and os.path.exists(storage_path):
+                os.remove(storage_path)
+            # Sort indexes, chart caches, chart images and samples derived from the dataset go with it
+            for derived in ('sort_indexes', 'chart_cache', 'chart_images', 'samples'):
+                if dataset.fingerprint:
+                    shutil.rmtree(os.path.join(self.root, derived, dataset.fingerprint), ignore_errors=True)
+        else:
+            db.commit()
+
+    def save_frame(self, fingerprint: str, data: pd.DataFrame) -> str:
+        path = self._frame_path(fingerprint)
+        if not os.path.exists(path):
+            self.write_parquet(path, data)
+        return path
+
+    def adopt_file(self, fingerprint: str, parquet_path: str) -> str:
+        """Move a Parquet file written elsewhere in the store into place"""
+        path = self._frame_path(fingerprint)
+        if os.path.exists(path):
+            os.remove(parquet_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(parquet_path, path)
+        return path
+
+    def append_frame(self, dataset: models.Dataset, delta: pd.DataFrame) -> str:
+        """New Parquet file (in the spool directory) holding the dataset's rows followed by `delta`.
+
+        Existing row groups are copied batch by batch and the delta is cast to
+        the stored schema. When it does not fit (new columns, values outside
+        a downcast type) both are combined in pandas and the dtypes optimized
+        again.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        spool_dir = os.path.join(self.root, 'spool')
+        os.makedirs(spool_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=spool_dir, suffix='.parquet')
+        os.close(fd)
+        source = pq.ParquetFile(dataset.storage_path)
+        schema = source.schema_arrow
+        try:
+            table = None
+            if set(map(str, delta.columns)) == set(schema.names):
+                try:
+                    table = pa.Table.from_pandas(delta, preserve_index=False).select(schema.names).cast(schema)
+                except (ValueError, TypeError, pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    pass
+            if table is not None:
+                with pq.ParquetWriter(path, schema) as writer:
+                    for index in range(source.num_row_groups):
+                        writer.write_table(source.read_row_group(index))
+                    writer.write_table(table)
+            else:
+                combined = pd.concat([source.read().to_pandas(), delta], ignore_index=True)
+                combined, _ = optimize_dtypes(combined)
+                os.remove(path)
+                self.write_parquet(path, combined)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return path
+
+    def write_parquet(self, path: str, data: pd.DataFrame):
+        """Atomic Parquet write; readers never see a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            data.to_parquet(temp_path, index=False)
+        except (TypeError, ValueError):
+            # Mixed-type object columns are not representable in Arrow; store them as text
+            arrow_compatible(data).to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+
+    def load_frame(self, dataset: models.Dataset, columns=None) -> Optional[pd.DataFrame]:
+        if not dataset.storage_path or not os.path.exists(dataset.storage_path):
+            return None
+        return pd.read_parquet(dataset.storage_path, columns=columns)
+
+dataset_store = DatasetStore()
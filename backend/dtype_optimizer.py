@@ -0,0 +1,170 @@
+from __future__ import annotations
+import importlib.util
+import re
+import warnings
+from typing import Dict, Any, Optional, Tuple
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# find_spec avoids paying for the pyarrow import at startup
+ARROW_STRING_DTYPE = "string[pyarrow]" if importlib.util.find_spec('pyarrow') else "string"
+
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+CATEGORY_MAX_UNIQUE = 10_000
+DATETIME_SAMPLE_SIZE = 500
+DATETIME_MIN_PARSE_RATIO = 0.95
+# Whole-value date/time shapes: a date needs a 4-digit year, otherwise an hh:mm time.
+# Decimals ("3.14") and version strings ("5.29.192") must not look like dates.
+_DATE = r"\d{4}(?P<ymd>[-/.])\d{1,2}(?P=ymd)\d{1,2}|\d{4}[-/]\d{1,2}|\d{1,2}(?P<dmy>[-/.])\d{1,2}(?P=dmy)\d{4}"
+_TIME = r"\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:\s*[AaPp][Mm])?(?:\s*(?:Z|UTC|[+-]\d{2}:?\d{2}))?"
+DATETIME_PATTERN = re.compile(rf"(?:{_DATE})(?:[T ]{_TIME})?|{_TIME}")
+# Only values with a date become datetime64; a bare time has no day to put it on
+DATE_PATTERN = re.compile(rf"(?:{_DATE})(?:[T ]{_TIME})?")
+_YEAR_FIRST = re.compile(r"\d{4}[-/.]")
+# Leading sample values whose month-first and day-first readings are tried as formats
+DATETIME_GUESS_VALUES = 20
+
+def optimize_dtypes(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Shrink a freshly ingested DataFrame and report memory before and after.
+
+    - integers are downcast to the smallest (unsigned) type that fits
+    - floats are downcast to float32 only when that is lossless
+    - text columns of dates in one unambiguous format are parsed to datetime64
+    - low-cardinality text becomes categorical, the rest Arrow-backed strings
+    """
+    memory_before = int(df.memory_usage(deep=True).sum())
+    converted = {}
+    columns = {}
+
+    for column in df.columns:
+        series = df[column]
+        optimized = _optimize_series(series)
+        if optimized.dtype != series.dtype:
+            converted[str(column)] = f"{series.dtype} -> {optimized.dtype}"
+        columns[column] = optimized
+
+    optimized_df = pd.DataFrame(columns, index=df.index)
+    memory_after = int(optimized_df.memory_usage(deep=True).sum())
+
+    report = {
+        'memory_before_bytes': memory_before,
+        'memory_after_bytes': memory_after,
+        'reduction_percent': round((1 - memory_after / memory_before) * 100, 1) if memory_before else 0.0,
+        'converted_columns': converted
+    }
+    return optimized_df, report
+
+def arrow_compatible(df: pd.DataFrame) -> pd.DataFrame:
+    """The frame with object columns that Arrow rejects (text next to numbers) turned into text.
+
+    Other object columns, e.g. booleans with blanks or times, keep their values;
+    missing values stay missing.
+    """
+    import pyarrow as pa
+    rejected = []
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            rejected.append(column)
+    if not rejected:
+        return df
+    df = df.copy(deep=False)
+    for column in rejected:
+        df[column] = df[column].map(_as_text)
+    return df
+
+def _as_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return str(value)
+
+def _optimize_series(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        downcast = 'unsigned' if len(series) and series.min() >= 0 else 'integer'
+        return pd.to_numeric(series, downcast=downcast)
+    if pd.api.types.is_float_dtype(series):
+        return _downcast_float(series)
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        return _optimize_text(series)
+    return series
+
+def _downcast_float(series: pd.Series) -> pd.Series:
+    values = series.to_numpy(dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    if finite.size and np.abs(finite).max() > np.finfo(np.float32).max:
+        return series
+    as_float32 = values.astype(np.float32)
+    if np.array_equal(as_float32.astype(np.float64), values, equal_nan=True):
+        return pd.Series(as_float32, index=series.index, name=series.name)
+    return series
+
+def _optimize_text(series: pd.Series) -> pd.Series:
+    non_null = series.dropna()
+    if non_null.empty or pd.api.types.infer_dtype(non_null, skipna=True) != 'string':
+        return series
+
+    parsed = _try_parse_datetime(series, non_null)
+    if parsed is not None:
+        return parsed
+
+    unique_count = non_null.nunique()
+    if unique_count <= CATEGORY_MAX_UNIQUE and unique_count <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+        return series.astype('category')
+    return series.astype(ARROW_STRING_DTYPE)
+
+def _try_parse_datetime(series: pd.Series, non_null: pd.Series):
+    sample = non_null.head(DATETIME_SAMPLE_SIZE).astype(str).str.strip()
+    if not sample.str.fullmatch(DATE_PATTERN).all():
+        return None
+    datetime_format = infer_datetime_format(sample)
+    if datetime_format is None:
+        return None
+    parsed = pd.to_datetime(series.str.strip(), errors='coerce', format=datetime_format)
+    if parsed.notna().sum() < len(non_null) * DATETIME_MIN_PARSE_RATIO:
+        return None
+    return parsed
+
+def infer_datetime_format(sample: pd.Series) -> Optional[str]:
+    """The one format that reads a sample of date strings, or None.
+
+    Year-first values are read as ISO 8601. Other values are tried both
+    month-first and day-first; the reading that parses the most values wins,
+    and when both parse equally well but disagree ("05/01/2024") the order is
+    ambiguous and the column stays text.
+    """
+    if sample.str.match(_YEAR_FIRST).all():
+        candidates = ['ISO8601']
+    else:
+        with warnings.catch_warnings():
+            # Day-first guesses without dayfirst=True warn
+            warnings.simplefilter('ignore')
+            candidates = list(dict.fromkeys(
+                guessed
+                for value in sample.head(DATETIME_GUESS_VALUES)
+                for dayfirst in (False, True)
+                if (guessed := pd.tseries.api.guess_datetime_format(value, dayfirst=dayfirst)) is not None
+            ))
+
+    readings = {}
+    for candidate in candidates:
+        try:
+            parsed = pd.to_datetime(sample, errors='coerce', format=candidate)
+        except (ValueError, TypeError):
+            # e.g. values with different UTC offsets
+            continue
+        if parsed.notna().mean() >= DATETIME_MIN_PARSE_RATIO:
+            readings[candidate] = parsed
+    if not readings:
+        return None
+    best = max(parsed.notna().sum() for parsed in readings.values())
+    top = [(candidate, parsed) for candidate, parsed in readings.items() if parsed.notna().sum() == best]
+    if any(not parsed.equals(top[0][1]) for _, parsed in top[1:]):
+        return None
+    return top[0][0]
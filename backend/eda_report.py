@@ -0,0 +1,303 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import html
+import importlib.util
+import io
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from lazy_imports import lazy_import
+from worker_pool import worker_pool
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+REPORT_CACHE_DIR = os.getenv("EDA_REPORT_CACHE_DIR", "./report_cache")
+# Bump when the report layout changes so cached reports are rebuilt
+REPORT_VERSION = 1
+
+BUILTIN_TOOLS = {'standard', 'minimal'}
+THIRD_PARTY_TOOLS = {'ydata-profiling': 'ydata_profiling', 'sweetviz': 'sweetviz'}
+REPORT_TOOLS = BUILTIN_TOOLS | set(THIRD_PARTY_TOOLS)
+MAX_CORRELATION_COLUMNS = 40
+TOP_VALUES = 10
+
+class ReportEngine:
+    """Conventional EDA reports rendered across the shared process pool.
+
+    The upload is parsed once into a Parquet file; every report section
+    (overview, one per column, correlations) is then a separate task that
+    reads only the columns it needs and draws its figures with matplotlib's
+    Agg backend in a worker process. Sections are streamed as they finish and
+    placed with CSS `order`, and the finished document is cached on disk by
+    file hash and tool.
+    """
+
+    def __init__(self, cache_dir: str = REPORT_CACHE_DIR, pool=worker_pool):
+        self.cache_dir = cache_dir
+        self.pool = pool
+
+    def validate_tool(self, tool: str):
+        if tool not in REPORT_TOOLS:
+            raise ValueError(f"Unsupported tool: {tool}. Choose one of {sorted(REPORT_TOOLS)}")
+        module = THIRD_PARTY_TOOLS.get(tool)
+        if module and importlib.util.find_spec(module) is None:
+            raise ValueError(f"{tool} is not installed on this server")
+
+    def cache_path(self, file_hash: str, tool: str) -> str:
+        key = hashlib.sha256(f"{file_hash}:{tool}:{REPORT_VERSION}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.html")
+
+    def cached(self, file_hash: str, tool: str) -> Optional[str]:
+        path = self.cache_path(file_hash, tool)
+        return path if os.path.exists(path) else None
+
+    async def prepare(self, source_path: str, filename: str, file_hash: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """Parse the upload into Parquet in a worker; returns (parquet path, column descriptions)"""
+        os.makedirs(os.path.join(self.cache_dir, 'work'), exist_ok=True)
+        parquet_path = os.path.join(self.cache_dir, 'work', f"{file_hash}.{os.getpid()}.{threading.get_ident()}.parquet")
+        return parquet_path, await self.pool.run(_prepare_dataset, source_path, filename, parquet_path)
+
+    async def render(
+        self,
+        parquet_path: str,
+        columns: List[Dict[str, Any]],
+        file_hash: str,
+        tool: str,
+        title: str
+    ) -> AsyncIterator[str]:
+        """Yield the report HTML, writing it to the cache once every section succeeded"""
+        path = self.cache_path(file_hash, tool)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        futures, complete, failed = [], False, False
+        cache_file = open(temp_path, 'w', encoding='utf-8')
+
+        try:
+            if tool in THIRD_PARTY_TOOLS:
+                document = await self.pool.run(_third_party_report, parquet_path, tool, title)
+                cache_file.write(document)
+                yield document
+            else:
+                header = _document_header(title, tool)
+                cache_file.write(header)
+                yield header
+
+                figures = tool != 'minimal'
+                tasks = [(_overview_section, (parquet_path, columns, figures))]
+                tasks += [(_column_section, (parquet_path, column, figures)) for column in columns]
+                numeric = [c['name'] for c in columns if c['kind'] == 'numeric'][:MAX_CORRELATION_COLUMNS]
+                if len(numeric) > 1:
+                    tasks.append((_correlation_section, (parquet_path, numeric, figures)))
+
+                futures = [
+                    self.pool.submit(_render_section, order, function, args)
+                    for order, (function, args) in enumerate(tasks)
+                ]
+                for next_done in asyncio.as_completed(futures):
+                    order, section, ok = await next_done
+                    failed = failed or not ok
+                    chunk = f'<section class="card" style="order:{order}">{section}</section>\n'
+                    cache_file.write(chunk)
+                    yield chunk
+
+                footer = _document_footer()
+                cache_file.write(footer)
+                yield footer
+            complete = True
+        finally:
+            for future in futures:
+                future.cancel()
+            cache_file.close()
+            if complete and not failed:
+                os.replace(temp_path, path)
+            elif os.path.exists(temp_path):
+                os.remove(temp_path)
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
+
+def _prepare_dataset(source_path: str, filename: str, parquet_path: str) -> List[Dict[str, Any]]:
+    from dataset_store import dataset_store
+    from dtype_optimizer import optimize_dtypes
+
+    name = (filename or '').lower()
+    try:
+        if name.endswith(('.xlsx', '.xls')):
+            df = pd.read_excel(source_path)
+        elif name.endswith('.json'):
+            try:
+                df = pd.read_json(source_path)
+            except ValueError:
+                df = pd.read_json(source_path, lines=True)
+        elif name.endswith('.parquet'):
+            df = pd.read_parquet(source_path)
+        else:
+            df = pd.read_csv(source_path, compression='infer' if name.endswith('.gz') else None)
+    except Exception as e:
+        raise ValueError(f"Could not parse {filename}: {e}")
+    if df.empty:
+        raise ValueError(f"{filename} contains no rows")
+
+    df, _ = optimize_dtypes(df)
+    df.columns = [str(column) for column in df.columns]
+    dataset_store.write_parquet(parquet_path, df)
+    return [{'name': column, 'kind': _column_kind(df[column]), 'dtype': str(df[column].dtype)} for column in df.columns]
+
+def _column_kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'categorical'
+    return 'text'
+
+def _render_section(order: int, function, args) -> Tuple[int, str, bool]:
+    """Run one section in a worker; a failing section renders as an error card"""
+    try:
+        return order, function(*args), True
+    except Exception as e:
+        return order, f'<h2>Section failed</h2><p class="error">{html.escape(str(e))}</p>', False
+
+def _overview_section(parquet_path: str, columns: List[Dict[str, Any]], figures: bool) -> str:
+    df = pd.read_parquet(parquet_path)
+    missing = df.isna().sum()
+    kinds = pd.Series([c['kind'] for c in columns]).value_counts()
+    stats = {
+        'Rows': f"{len(df):,}",
+        'Columns': f"{df.shape[1]:,}",
+        'Missing cells': f"{int(missing.sum()):,} ({missing.sum() / max(df.size, 1):.1%})",
+        'Duplicate rows': f"{int(df.duplicated().sum()):,}",
+        'Memory': f"{df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB",
+    }
+    stats.update({f"{kind.title()} columns": str(count) for kind, count in kinds.items()})
+    body = '<h2>Overview</h2>' + _table(stats)
+
+    if figures and missing.any():
+        missing = missing[missing > 0].sort_values(ascending=False).head(30)
+        figure, axes = _figure(width=7, height=max(2, 0.3 * len(missing)))
+        axes.barh(missing.index[::-1], missing.values[::-1], color='#f59e0b')
+        axes.set_xlabel('Missing values')
+        body += _image(figure)
+    return body
+
+def _column_section(parquet_path: str, column: Dict[str, Any], figures: bool) -> str:
+    series = pd.read_parquet(parquet_path, columns=[column['name']])[column['name']]
+    non_null = series.dropna()
+    stats = {
+        'Type': f"{column['kind']} ({column['dtype']})",
+        'Missing': f"{int(series.isna().sum()):,} ({series.isna().mean():.1%})",
+        'Distinct': f"{int(non_null.nunique()):,}",
+    }
+    figure = None
+
+    if column['kind'] == 'numeric' and len(non_null):
+        values = non_null.astype('float64')
+        quantiles = values.quantile([0.25, 0.5, 0.75])
+        stats.update({
+            'Mean': f"{values.mean():.4g}",
+            'Std': f"{values.std():.4g}",
+            'Min': f"{values.min():.4g}",
+            '25%': f"{quantiles[0.25]:.4g}",
+            'Median': f"{quantiles[0.5]:.4g}",
+            '75%': f"{quantiles[0.75]:.4g}",
+            'Max': f"{values.max():.4g}",
+            'Skewness': f"{values.skew():.3f}",
+            'Zeros': f"{int((values == 0).sum()):,}",
+        })
+        if figures:
+            figure, axes = _figure()
+            axes.hist(values.to_numpy(), bins=min(50, max(10, int(np.sqrt(len(values))))), color='#2563eb')
+            axes.set_ylabel('Count')
+    elif column['kind'] == 'datetime' and len(non_null):
+        stats.update({'Earliest': str(non_null.min()), 'Latest': str(non_null.max())})
+        if figures:
+            figure, axes = _figure()
+            axes.hist(non_null.to_numpy(), bins=40, color='#2563eb')
+            axes.set_ylabel('Count')
+            figure.autofmt_xdate()
+    elif len(non_null):
+        top = non_null.astype(str).value_counts().head(TOP_VALUES)
+        stats['Most frequent'] = f"{html.escape(str(top.index[0]))} ({int(top.iloc[0]):,})"
+        if column['kind'] == 'text':
+            lengths = non_null.astype(str).str.len()
+            stats['Length (min / mean / max)'] = f"{lengths.min()} / {lengths.mean():.1f} / {lengths.max()}"
+        if figures:
+            figure, axes = _figure(height=max(2, 0.3 * len(top)))
+            labels = [label if len(label) <= 30 else label[:27] + '...' for label in top.index.astype(str)]
+            axes.barh(labels[::-1], top.values[::-1], color='#2563eb')
+            axes.set_xlabel('Count')
+
+    body = f"<h2>{html.escape(column['name'])}</h2>" + _table(stats)
+    return body + (_image(figure) if figure is not None else '')
+
+def _correlation_section(parquet_path: str, columns: List[str], figures: bool) -> str:
+    corr = pd.read_parquet(parquet_path, columns=columns).astype('float64').corr()
+    pairs = corr.where(np.triu(np.ones(corr.shape, dtype=bool), k=1)).stack()
+    strongest = pairs.reindex(pairs.abs().sort_values(ascending=False).index).head(TOP_VALUES)
+    body = '<h2>Correlations</h2>' + _table({f"{a} / {b}": f"{value:.3f}" for (a, b), value in strongest.items()})
+
+    if figures:
+        size = min(12, 2 + 0.35 * len(columns))
+        figure, axes = _figure(width=size, height=size)
+        image = axes.imshow(corr.to_numpy(), cmap='RdBu_r', vmin=-1, vmax=1)
+        axes.set_xticks(range(len(columns)), labels=columns, rotation=90, fontsize=7)
+        axes.set_yticks(range(len(columns)), labels=columns, fontsize=7)
+        figure.colorbar(image, ax=axes, shrink=0.8)
+        body += _image(figure)
+    return body
+
+def _third_party_report(parquet_path: str, tool: str, title: str) -> str:
+    df = pd.read_parquet(parquet_path)
+    if tool == 'ydata-profiling':
+        from ydata_profiling import ProfileReport
+        return ProfileReport(df, title=title, minimal=len(df) > 100_000).to_html()
+
+    import sweetviz
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'report.html')
+        sweetviz.analyze(df).show_html(output, open_browser=False)
+        with open(output, encoding='utf-8') as f:
+            return f.read()
+
+def _figure(width: float = 6, height: float = 3):
+    # Figure objects instead of pyplot: no global state shared between sections
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(width, height), dpi=90, layout='tight')
+    return figure, figure.add_subplot()
+
+def _image(figure) -> str:
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'<img alt="" src="data:image/png;base64,{encoded}">'
+
+def _table(rows: Dict[str, str]) -> str:
+    cells = ''.join(f"<tr><th>{html.escape(str(k))}</th><td>{v}</td></tr>" for k, v in rows.items())
+    return f"<table>{cells}</table>"
+
+def _document_header(title: str, tool: str) -> str:
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>EDA report: {html.escape(title)}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; margin: 2rem; color: #111827; background: #f9fafb; }}
+.sections {{ display: flex; flex-direction: column; gap: 1rem; }}
+.card {{ background: #fff; border: 1px solid #e5e7eb; border-radius: 8px; padding: 1rem 1.5rem; }}
+table {{ border-collapse: collapse; margin: 0.5rem 0; }}
+th {{ text-align: left; font-weight: 500; color: #6b7280; padding: 2px 16px 2px 0; }}
+img {{ max-width: 100%; }}
+.error {{ color: #b91c1c; }}
+</style></head><body>
+<h1>{html.escape(title)}</h1><p>{html.escape(tool)} report</p>
+<div class="sections">
+"""
+
+def _document_footer() -> str:
+    return "</div></body></html>\n"
+
+report_engine = ReportEngine()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import asyncio
+import importlib.util
+import os
+import tempfile
+import uuid
+import zipfile
+from typing import Dict, List, Optional, Union
+from dtype_optimizer import arrow_compatible
+from lazy_imports import lazy_import
+from worker_pool import worker_pool
+
+pd = lazy_import('pandas')
+
+# auto: calamine (Rust reader) when python-calamine is installed, else openpyxl in read-only mode
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")
+# Rows materialized at a time from openpyxl's row iterator
+ROW_BATCH_SIZE = int(os.getenv("EXCEL_ROW_BATCH_SIZE", 50_000))
+ALL_SHEETS = ('*', 'all')
+
+def engine() -> str:
+    if EXCEL_ENGINE != 'auto':
+        return EXCEL_ENGINE
+    return 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+def is_xlsx(path: str) -> bool:
+    """xlsx/xlsm are zip containers; legacy .xls is not and needs pandas' xlrd engine"""
+    return zipfile.is_zipfile(path)
+
+def sheet_names(path: str) -> List[str]:
+    if not is_xlsx(path):
+        return list(pd.ExcelFile(path).sheet_names)
+    if engine() == 'calamine':
+        from python_calamine import CalamineWorkbook
+        return list(CalamineWorkbook.from_path(path).sheet_names)
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+def resolve_sheets(path: str, selection: Union[None, str, List[str]]) -> List[str]:
+    """Sheet names for a `sheet`/`sheets` config value: None is the first sheet, '*' or 'all' every sheet"""
+    names = sheet_names(path)
+    if not names:
+        raise ValueError("Workbook has no sheets")
+    if selection is None:
+        return names[:1]
+    if isinstance(selection, str):
+        if selection.lower() in ALL_SHEETS:
+            return names
+        selection = [selection]
+    missing = [name for name in selection if name not in names]
+    if missing:
+        raise ValueError(f"Sheets not found: {missing}; workbook has {names}")
+    return list(dict.fromkeys(selection))
+
+def read_sheet(path: str, sheet: Optional[str] = None) -> pd.DataFrame:
+    """One sheet as a frame, without loading the workbook's full object model.
+
+    Columns mixing text and numbers come back as text, so the frame survives the
+    Parquet hand-off from a worker unchanged.
+    """
+    if not is_xlsx(path):
+        return arrow_compatible(pd.read_excel(path, sheet_name=sheet or 0))
+    if engine() == 'calamine':
+        return arrow_compatible(pd.read_excel(path, sheet_name=sheet or 0, engine='calamine'))
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet and sheet not in workbook.sheetnames:
+            raise ValueError(f"Sheet not found: {sheet}; workbook has {workbook.sheetnames}")
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = _column_names(header)
+        batches, batch = [], []
+        blank_rows = 0
+        for row in rows:
+            # Like pandas, blank rows are kept inside the table but not after it, where
+            # read-only sheets often report formatted-but-empty rows
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            if blank_rows:
+                batch.extend([(None,) * len(columns)] * blank_rows)
+                blank_rows = 0
+            batch.append(row[:len(columns)])
+            if len(batch) >= ROW_BATCH_SIZE:
+                batches.append(pd.DataFrame.from_records(batch, columns=columns))
+                batch = []
+        if batch or not batches:
+            batches.append(pd.DataFrame.from_records(batch, columns=columns))
+    finally:
+        workbook.close()
+    frame = batches[0] if len(batches) == 1 else pd.concat(batches, ignore_index=True)
+    return arrow_compatible(frame.infer_objects())
+
+def _column_names(header) -> List[str]:
+    """pandas-style names: blanks become 'Unnamed: i', repeats get '.1', '.2' suffixes"""
+    while header and header[-1] is None:
+        header = header[:-1]
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _sheet_to_parquet(path: str, sheet: str, parquet_path: str) -> int:
+    """Worker: parse one sheet and hand it back as Parquet instead of a pickled frame"""
+    frame = read_sheet(path, sheet)
+    frame.to_parquet(parquet_path, index=False)
+    return len(frame)
+
+class ExcelReader:
+    """Reads workbook sheets with a streaming engine, several sheets in parallel worker processes"""
+
+    def __init__(self, pool=worker_pool):
+        self.pool = pool
+
+    async def read(self, path: str, sheet: Optional[str] = None) -> pd.DataFrame:
+        return await asyncio.to_thread(read_sheet, path, sheet)
+
+    async def read_sheets(self, path: str, sheets: List[str]) -> Dict[str, pd.DataFrame]:
+        if len(sheets) == 1:
+            return {sheets[0]: await self.read(path, sheets[0])}
+
+        work_dir = tempfile.mkdtemp(prefix='phoenix-excel-')
+        parquet_paths = {sheet: os.path.join(work_dir, f"{uuid.uuid4().hex}.parquet") for sheet in sheets}
+        try:
+            await asyncio.gather(*(
+                self.pool.run(_sheet_to_parquet, path, sheet, parquet_paths[sheet]) for sheet in sheets
+            ))
+            frames = await asyncio.gather(*(asyncio.to_thread(pd.read_parquet, parquet_paths[sheet]) for sheet in sheets))
+            return dict(zip(sheets, frames))
+        finally:
+            for parquet_path in parquet_paths.values():
+                if os.path.exists(parquet_path):
+                    os.remove(parquet_path)
+            os.rmdir(work_dir)
+
+excel_reader = ExcelReader()
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from sqlalchemy import create_engine
 from models import Base
+from database import add_missing_columns
 
 # Database configuration
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./phoenix.db")
@@ -24,6 +25,7 @@ def init_db():
     """Initialize the database by creating all tables"""
     print("Initializing database...")
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
     print("Database initialized successfully!")
     print(f"Database file: {SQLALCHEMY_DATABASE_URL}")
 
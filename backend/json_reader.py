@@ -0,0 +1,390 @@
+from __future__ import annotations
+import io
+import os
+import re
+import tempfile
+from collections import Counter
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+import orjson
+from lazy_imports import lazy_import
+from dataset_store import DATASET_STORE_DIR
+from dtype_optimizer import DATETIME_PATTERN, DATETIME_MIN_PARSE_RATIO
+
+try:
+    import ijson
+except ImportError:  # Falls back to loading whole documents
+    ijson = None
+
+pd = lazy_import('pandas')
+
+# Records parsed and converted at a time; bounds memory independently of file size
+JSON_BATCH_ROWS = int(os.getenv("JSON_BATCH_ROWS", 20_000))
+# Leading records the column names and types are inferred from
+SCHEMA_SAMPLE_ROWS = int(os.getenv("JSON_SCHEMA_SAMPLE_ROWS", 1_000))
+FLATTEN_MAX_DEPTH = 5
+FLATTEN_SEPARATOR = '.'
+DETECT_BYTES = 64 * 1024
+HEAD_ROWS = 100
+UTF8_BOM = b'\xef\xbb\xbf'
+TZ_SUFFIX = re.compile(r'(Z|[+-]\d{2}:?\d{2})$')
+
+class SpooledFrame:
+    """A dataset parsed batch by batch straight into a Parquet file.
+
+    Stands in for the DataFrame in connector results: it carries the leading
+    rows, column dtypes, row count and missing-value counts that previews and
+    profiles need, while the rows themselves stay on disk until the dataset
+    store adopts the file.
+    """
+
+    def __init__(self, parquet_path: str, row_count: int, sample: pd.DataFrame, missing_values: Dict[str, int], report: Dict[str, Any]):
+        self.parquet_path = parquet_path
+        self.row_count = row_count
+        self.sample = sample
+        self.missing_values = missing_values
+        self.report = report
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @property
+    def columns(self):
+        return self.sample.columns
+
+    @property
+    def dtypes(self):
+        return self.sample.dtypes
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self.sample.head(n)
+
+    def discard(self):
+        if os.path.exists(self.parquet_path):
+            os.remove(self.parquet_path)
+
+def flatten(record, prefix: str = '', out: Optional[Dict[str, Any]] = None, depth: int = 0) -> Dict[str, Any]:
+    """Nested objects become dotted columns; lists and objects below FLATTEN_MAX_DEPTH stay whole"""
+    if out is None:
+        out = {}
+        if not isinstance(record, dict):
+            # Arrays of scalars (or of arrays) become a single column
+            return {'value': record}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value and depth < FLATTEN_MAX_DEPTH:
+            flatten(value, f"{name}{FLATTEN_SEPARATOR}", out, depth + 1)
+        else:
+            out[name] = value
+    return out
+
+def infer_schema(rows: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Column kinds (bool, int, float, datetime, datetime_utc, string) from flattened rows"""
+    kinds = {}
+    for column in dict.fromkeys(key for row in rows for key in row):
+        values = [row[column] for row in rows if row.get(column) is not None]
+        types = {type(value) for value in values}
+        if not types:
+            kinds[column] = 'string'
+        elif types == {bool}:
+            kinds[column] = 'bool'
+        elif types == {int}:
+            kinds[column] = 'int'
+        elif types <= {int, float}:
+            kinds[column] = 'float'
+        elif types == {str} and _looks_like_datetime(values):
+            kinds[column] = 'datetime_utc' if any(TZ_SUFFIX.search(value) for value in values[:100]) else 'datetime'
+        else:
+            kinds[column] = 'string'
+    return kinds
+
+def _looks_like_datetime(values: List[str]) -> bool:
+    sample = values[:500]
+    if not all(DATETIME_PATTERN.fullmatch(value.strip()) for value in sample[:20]):
+        return False
+    parsed = _parse_datetimes(sample)
+    return parsed.notna().mean() >= DATETIME_MIN_PARSE_RATIO
+
+def _parse_datetimes(values: List[Any], utc: bool = True) -> pd.Series:
+    # Parsed as UTC so mixed offsets never fail; naive columns drop the zone again
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', errors='coerce', utc=True)
+    return parsed if utc else parsed.dt.tz_localize(None)
+
+def _arrow_type(kind: str):
+    import pyarrow as pa
+    return {
+        'bool': pa.bool_(),
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'datetime': pa.timestamp('us'),
+        'datetime_utc': pa.timestamp('us', tz='UTC'),
+    }.get(kind, pa.string())
+
+def schema_kinds(schema) -> Dict[str, str]:
+    """Column kinds of a stored Arrow schema, for parsing more records into it"""
+    import pyarrow as pa
+    kinds = {}
+    for field in schema:
+        arrow_type = field.type
+        if pa.types.is_dictionary(arrow_type):
+            arrow_type = arrow_type.value_type
+        if pa.types.is_boolean(arrow_type):
+            kinds[field.name] = 'bool'
+        elif pa.types.is_integer(arrow_type):
+            kinds[field.name] = 'int'
+        elif pa.types.is_floating(arrow_type):
+            kinds[field.name] = 'float'
+        elif pa.types.is_timestamp(arrow_type):
+            kinds[field.name] = 'datetime_utc' if arrow_type.tz else 'datetime'
+        else:
+            kinds[field.name] = 'string'
+    return kinds
+
+def _to_text(value) -> str:
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode('utf-8')
+    return str(value)
+
+def _coerce(value, kind: str):
+    """A value that does not fit its column's inferred kind, converted or dropped to null"""
+    if kind == 'bool':
+        return value if isinstance(value, bool) else None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if kind == 'int':
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return value if isinstance(value, int) and -2 ** 63 <= value < 2 ** 63 else None
+    return float(value) if isinstance(value, (int, float)) else None
+
+class RecordBatcher:
+    """Turns a stream of JSON records into Arrow record batches of one fixed schema.
+
+    The schema comes from the first SCHEMA_SAMPLE_ROWS flattened records, or
+    from `kinds` when the records extend an existing dataset. Later fields
+    that the schema does not have are counted and dropped, and values that
+    do not fit their column's type are converted when lossless or nulled and
+    counted, so every batch can go into the same Parquet file. The one
+    exception is an inferred integer column meeting a fractional number: it
+    is widened to float, and batches built before carry the narrower schema.
+    """
+
+    def __init__(self, batch_rows: int = JSON_BATCH_ROWS, schema_rows: int = SCHEMA_SAMPLE_ROWS, kinds: Optional[Dict[str, str]] = None):
+        self.batch_rows = batch_rows
+        self.schema_rows = schema_rows
+        self.kinds: Optional[Dict[str, str]] = None
+        self.schema = None
+        # Only inferred kinds may change; given ones belong to a stored dataset
+        self.widen = kinds is None
+        if kinds is not None:
+            self._set_kinds(kinds)
+        self.row_count = 0
+        self.null_counts: Counter = Counter()
+        self.extra_fields: Counter = Counter()
+        self.coerced: Counter = Counter()
+
+    def batches(self, records: Iterable[Any]) -> Iterator:
+        rows = []
+        for record in records:
+            rows.append(flatten(record))
+            if len(rows) >= (self.schema_rows if self.kinds is None else self.batch_rows):
+                yield self._to_batch(rows)
+                rows = []
+        if rows or self.kinds is None:
+            yield self._to_batch(rows)
+
+    def _to_batch(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+        if self.kinds is None:
+            self._set_kinds(infer_schema(rows))
+        known = self.kinds.keys()
+        for row in rows:
+            if not row.keys() <= known:
+                self.extra_fields.update(row.keys() - known)
+        arrays = [self._column(column, kind, [row.get(column) for row in rows]) for column, kind in self.kinds.items()]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        self.row_count += batch.num_rows
+        for column, array in zip(self.kinds, arrays):
+            self.null_counts[column] += array.null_count
+        return batch
+
+    def _set_kinds(self, kinds: Dict[str, str]):
+        import pyarrow as pa
+        self.kinds = dict(kinds)
+        self.schema = pa.schema([(column, _arrow_type(kind)) for column, kind in self.kinds.items()])
+
+    def _column(self, column: str, kind: str, values: List[Any]):
+        import pyarrow as pa
+        arrow_type = _arrow_type(kind)
+        if kind == 'string':
+            return pa.array([value if value is None or isinstance(value, str) else _to_text(value) for value in values], type=arrow_type)
+        if kind in ('datetime', 'datetime_utc'):
+            parsed = _parse_datetimes(values, utc=kind == 'datetime_utc')
+            self.coerced[column] += int(sum(value is not None for value in values) - parsed.notna().sum())
+            return pa.array(parsed, from_pandas=True).cast(arrow_type, safe=False)
+        # Arrow would truncate fractions into an integer column rather than fail
+        if kind == 'int' and any(isinstance(value, float) and not value.is_integer() for value in values):
+            if self.widen:
+                self.kinds[column] = 'float'
+                self._set_kinds(self.kinds)
+                return self._column(column, 'float', values)
+            return self._converted(column, kind, values)
+        try:
+            return pa.array(values, type=arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            return self._converted(column, kind, values)
+
+    def _converted(self, column: str, kind: str, values: List[Any]):
+        import pyarrow as pa
+        converted = [None if value is None else _coerce(value, kind) for value in values]
+        self.coerced[column] += sum(value is not None and new is None for value, new in zip(values, converted))
+        return pa.array(converted, type=_arrow_type(kind))
+
+    def report(self, fmt: str) -> Dict[str, Any]:
+        return {
+            'format': fmt,
+            'rows': self.row_count,
+            'schema_sample_rows': min(self.schema_rows, self.row_count),
+            'fields_outside_schema': dict(self.extra_fields.most_common(20)),
+            'coerced_values': {column: count for column, count in self.coerced.items() if count},
+        }
+
+class JsonReader:
+    """Reads JSON arrays, newline-delimited JSON and wrapped record arrays incrementally.
+
+    The format is detected from the first bytes (or forced with `lines: true`);
+    `records_path` points at a records array inside an object document, e.g.
+    "data.items". Anything else (a column-oriented object) is read whole, as
+    pandas always did.
+    """
+
+    def __init__(self, spool_dir: str = os.path.join(DATASET_STORE_DIR, 'spool')):
+        self.spool_dir = spool_dir
+
+    def read(self, path: str, options: Optional[Dict[str, Any]] = None) -> Union[pd.DataFrame, SpooledFrame]:
+        """Parse a file into a Parquet spool file without ever holding all rows in memory"""
+        import pyarrow.parquet as pq
+        options = options or {}
+        with open(path, 'rb') as f:
+            fmt = self._format(f, options)
+            if fmt == 'document':
+                return self._read_document(f)
+
+            batcher = RecordBatcher()
+            os.makedirs(self.spool_dir, exist_ok=True)
+            fd, parquet_path = tempfile.mkstemp(dir=self.spool_dir, suffix='.parquet')
+            os.close(fd)
+            writer = None
+            try:
+                try:
+                    for batch in batcher.batches(self._records(f, fmt, options.get('records_path'))):
+                        if writer is None:
+                            if not batcher.kinds:
+                                break
+                            writer = pq.ParquetWriter(parquet_path, batcher.schema)
+                        elif batch.schema != writer.schema:
+                            writer, parquet_path = self._rewrite(writer, parquet_path, batch.schema)
+                        writer.write_batch(batch)
+                finally:
+                    if writer is not None:
+                        writer.close()
+            except BaseException:
+                os.remove(parquet_path)
+                raise
+
+        if writer is None:
+            os.remove(parquet_path)
+            return pd.DataFrame()
+        sample = next(pq.ParquetFile(parquet_path).iter_batches(batch_size=HEAD_ROWS)).to_pandas()
+        return SpooledFrame(parquet_path, batcher.row_count, sample, dict(batcher.null_counts), batcher.report(fmt))
+
+    def _rewrite(self, writer, parquet_path: str, schema):
+        """A writer for a new spool file holding the rows written so far cast to a widened schema"""
+        import pyarrow.parquet as pq
+        writer.close()
+        fd, widened_path = tempfile.mkstemp(dir=self.spool_dir, suffix='.parquet')
+        os.close(fd)
+        widened = pq.ParquetWriter(widened_path, schema)
+        try:
+            for batch in pq.ParquetFile(parquet_path).iter_batches():
+                widened.write_batch(batch.cast(schema))
+        except BaseException:
+            widened.close()
+            os.remove(widened_path)
+            raise
+        os.remove(parquet_path)
+        return widened, widened_path
+
+    def read_frame(self, source: BinaryIO, options: Optional[Dict[str, Any]] = None, kinds: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """Parse an in-memory or small source into a DataFrame, still converting batch by batch.
+
+        `kinds` (see schema_kinds) fixes the columns and types instead of inferring them.
+        """
+        import pyarrow as pa
+        options = options or {}
+        fmt = self._format(source, options)
+        if fmt == 'document':
+            return self._read_document(source)
+        batcher = RecordBatcher(kinds=kinds)
+        batches = list(batcher.batches(self._records(source, fmt, options.get('records_path'))))
+        if not batcher.kinds:
+            return pd.DataFrame()
+        return pa.Table.from_batches([batch.cast(batcher.schema) for batch in batches], schema=batcher.schema).to_pandas()
+
+    def _format(self, f: BinaryIO, options: Dict[str, Any]) -> str:
+        """'ndjson', 'array' (records at `records_path` included) or 'document'; leaves f after any BOM"""
+        start = f.tell()
+        head = f.read(DETECT_BYTES)
+        if head.startswith(UTF8_BOM):
+            start += len(UTF8_BOM)
+            head = head[len(UTF8_BOM):]
+        f.seek(start)
+        if options.get('lines'):
+            return 'ndjson'
+        if options.get('records_path'):
+            return 'array'
+        text = head.lstrip()
+        if text[:1] == b'[':
+            return 'array'
+        if text[:1] != b'{':
+            raise ValueError("Content is not a JSON array, object or newline-delimited JSON")
+        first_line, newline, rest = text.partition(b'\n')
+        if newline and rest.lstrip()[:1] == b'{':
+            try:
+                orjson.loads(first_line)
+                return 'ndjson'
+            except orjson.JSONDecodeError:
+                pass
+        return 'document'
+
+    def _records(self, f: BinaryIO, fmt: str, records_path: Optional[str] = None) -> Iterator[Any]:
+        if fmt == 'ndjson':
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield orjson.loads(line)
+                    except orjson.JSONDecodeError as e:
+                        raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+            return
+        if ijson is None:
+            document = orjson.loads(f.read())
+            for part in (records_path.split('.') if records_path else []):
+                document = document.get(part) if isinstance(document, dict) else None
+            yield from document or []
+            return
+        prefix = f"{records_path}.item" if records_path else 'item'
+        yield from ijson.items(f, prefix, use_float=True)
+
+    def _read_document(self, f: BinaryIO) -> pd.DataFrame:
+        document = orjson.loads(f.read())
+        if isinstance(document, dict) and document and all(isinstance(value, (dict, list)) for value in document.values()):
+            # Column-oriented object, as pd.read_json reads it by default
+            return pd.read_json(io.BytesIO(orjson.dumps(document)))
+        # A single record
+        return self.read_frame(io.BytesIO(orjson.dumps([document])))
+
+json_reader = JsonReader()
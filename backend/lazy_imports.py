@@ -0,0 +1,58 @@
+import importlib
+import os
+import threading
+import types
+from typing import Iterable
+
+# Imported in the background at startup when WARMUP_ON_STARTUP is set
+DEFAULT_WARMUP_MODULES = [
+    'numpy',
+    'pandas',
+    'pyarrow',
+    'sklearn.cluster',
+    'sklearn.ensemble',
+]
+
+class LazyModule(types.ModuleType):
+    """Module stand-in that performs the real import on first attribute access.
+
+    Modules using it for annotations need `from __future__ import annotations`,
+    otherwise the signatures themselves trigger the import.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__dict__['_lazy_name'])
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+def warm_up(modules: Iterable[str]):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Warm-up skipped {name}: {e}")
+
+def start_warm_up():
+    """Import heavy modules in a daemon thread if WARMUP_ON_STARTUP is enabled.
+
+    WARMUP_ON_STARTUP may be "1" for the defaults or a comma-separated module list.
+    The worker keeps serving while this runs; a request that needs a module
+    still being imported simply waits on the import lock.
+    """
+    setting = os.getenv("WARMUP_ON_STARTUP", "").strip()
+    if not setting or setting.lower() in ('0', 'false', 'no'):
+        return None
+    if setting.lower() in ('1', 'true', 'yes'):
+        modules = DEFAULT_WARMUP_MODULES
+    else:
+        modules = [name.strip() for name in setting.split(',') if name.strip()]
+    thread = threading.Thread(target=warm_up, args=(modules,), name='module-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+from lazy_imports import lazy_import
+from llm.services import llm_client
+
+pd = lazy_import('pandas')
+
+BATCHING_ENABLED = os.getenv("LLM_BATCHING", "1") != "0"
+# How long the first prompt of a batch waits for companions
+BATCH_WINDOW_SECONDS = float(os.getenv("LLM_BATCH_WINDOW_MS", 25)) / 1000
+MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", 8))
+
+@dataclass
+class _Task:
+    instructions: str
+    context: str
+    future: asyncio.Future
+
+@dataclass
+class _Batch:
+    tasks: List[_Task] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+class LLMBatcher:
+    """Merges concurrent analysis prompts about the same data into one completion.
+
+    Callers submit (group key, instructions, data context). Prompts with the
+    same group key that arrive within BATCH_WINDOW_SECONDS are sent as one
+    JSON-mode request in which each distinct context appears once and every
+    task answers under its own id; the response is split back to the callers.
+    A batch of one, an unparseable response or a missing task id falls back to
+    individual calls, so callers always get the same result shape as
+    `llm_client.analyze_data`.
+    """
+
+    def __init__(self, client=llm_client, window: float = BATCH_WINDOW_SECONDS, max_size: int = MAX_BATCH_SIZE, enabled: bool = BATCHING_ENABLED):
+        self.client = client
+        self.window = window
+        self.max_size = max_size
+        self.enabled = enabled
+        self._batches: Dict[str, _Batch] = {}
+        self.stats = {'submitted': 0, 'batches': 0, 'batched_tasks': 0, 'individual_calls': 0, 'fallbacks': 0}
+
+    async def submit(self, group_key: str, instructions: str, context: str = '') -> Dict[str, Any]:
+        self.stats['submitted'] += 1
+        if not self.enabled:
+            return await self._individual(instructions, context)
+
+        future = asyncio.get_running_loop().create_future()
+        batch = self._batches.get(group_key)
+        if batch is None:
+            batch = self._batches[group_key] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, group_key)
+        batch.tasks.append(_Task(instructions, context, future))
+        if len(batch.tasks) >= self.max_size:
+            batch.timer.cancel()
+            self._flush(group_key)
+        return await future
+
+    def _flush(self, group_key: str):
+        batch = self._batches.pop(group_key, None)
+        if batch is not None:
+            asyncio.ensure_future(self._run(batch.tasks))
+
+    async def _run(self, tasks: List[_Task]):
+        try:
+            if len(tasks) == 1:
+                results = [await self._individual(tasks[0].instructions, tasks[0].context)]
+            else:
+                results = await self._batched(tasks)
+            for task, result in zip(tasks, results):
+                if not task.future.done():
+                    task.future.set_result(result)
+        except BaseException as e:
+            for task in tasks:
+                if not task.future.done():
+                    task.future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+
+    async def _individual(self, instructions: str, context: str) -> Dict[str, Any]:
+        self.stats['individual_calls'] += 1
+        prompt = f"{instructions}\n\nData:\n{context}" if context else instructions
+        return await self.client.analyze_data('auto', prompt)
+
+    async def _batched(self, tasks: List[_Task]) -> List[Dict[str, Any]]:
+        self.stats['batches'] += 1
+        self.stats['batched_tasks'] += len(tasks)
+
+        contexts = list(dict.fromkeys(task.context for task in tasks if task.context))
+        context_ids = {context: f"C{i + 1}" for i, context in enumerate(contexts)}
+        task_blocks = [
+            f'Task "T{i + 1}" (uses data {context_ids[task.context]}):\n{task.instructions}'
+            if task.context else f'Task "T{i + 1}":\n{task.instructions}'
+            for i, task in enumerate(tasks)
+        ]
+        context_blocks = [f"Data {context_ids[context]}:\n{context}" for context in contexts]
+        prompt = "\n\n".join([
+            "You are an expert data analyst. Complete each of the independent tasks below.",
+            *context_blocks,
+            *task_blocks,
+            'Respond with a single JSON object whose keys are the task ids ("T1", "T2", ...). '
+            "Each value is that task's complete answer: a JSON object when the task asks for JSON, otherwise a string.",
+        ])
+
+        response = await self.client.complete(prompt, json_mode=True)
+        answers = _parse_answers(response.get('content')) if 'error' not in response else None
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+        missing = []
+        for i, task in enumerate(tasks):
+            answer = (answers or {}).get(f"T{i + 1}")
+            if answer is None:
+                missing.append(i)
+            else:
+                analysis = answer if isinstance(answer, str) else json.dumps(answer)
+                results[i] = {'analysis': analysis, 'provider': response.get('provider'), 'batched': True}
+
+        if missing:
+            self.stats['fallbacks'] += len(missing)
+            fallback = await asyncio.gather(*(self._individual(tasks[i].instructions, tasks[i].context) for i in missing))
+            for i, result in zip(missing, fallback):
+                results[i] = result
+        return results
+
+def _parse_answers(content: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not content:
+        return None
+    text = content.strip()
+    if text.startswith('```'):
+        # Fenced code block despite JSON mode
+        text = text.strip('`')
+        text = text[text.index('\n') + 1:] if '\n' in text else text
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        start, end = text.find('{'), text.rfind('}')
+        if start < 0 or end <= start:
+            return None
+        try:
+            parsed = json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+    return parsed if isinstance(parsed, dict) else None
+
+def frame_group_key(data) -> str:
+    """Content fingerprint of a frame, so only prompts about identical data share a batch.
+
+    A spooled dataset is keyed by its Parquet file, which is unique per upload.
+    """
+    parquet_path = getattr(data, 'parquet_path', None)
+    if parquet_path:
+        return f"spooled:{parquet_path}"
+    digest = hashlib.sha1(json.dumps([f"{column}:{dtype}" for column, dtype in data.dtypes.items()], default=str).encode('utf-8'))
+    try:
+        hashed = pd.util.hash_pandas_object(data, index=False)
+    except TypeError:
+        # Unhashable cells (lists, dicts from JSON sources)
+        hashed = pd.util.hash_pandas_object(data.astype(str), index=False)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+llm_batcher = LLMBatcher()
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+import httpx
+
+DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "DEEPSEEK_API_KEY_PLACEHOLDER")
+CHATAIAPI_API_KEY = os.environ.get("CHATAIAPI_API_KEY", "CHATAIAPI_API_KEY_PLACEHOLDER")
+
+# Outcomes kept per provider for the rolling latency/error statistics
+STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", 100))
+# Latency assumed for a provider with no successful calls yet, so it still gets tried
+PRIOR_LATENCY_SECONDS = 5.0
+FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+BREAKER_ERROR_RATE = 0.5
+BREAKER_MIN_SAMPLES = 10
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", 30))
+HEDGING_ENABLED = os.getenv("LLM_HEDGING", "1") != "0"
+# Hedge delay when the primary has no p95 yet
+DEFAULT_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 10))
+MIN_HEDGE_AFTER_SECONDS = 0.05
+# At most this fraction of requests may send a hedge, so a slow spell cannot double the load
+HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", 0.1))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+
+class ProviderError(Exception):
+    pass
+
+@dataclass
+class Provider:
+    """An OpenAI-compatible chat completions endpoint"""
+    name: str
+    url: str
+    api_key: str
+    model: str
+    max_concurrency: int = 8
+    json_mode: bool = False  # Supports response_format={"type": "json_object"}
+
+def default_providers() -> List[Provider]:
+    """Providers from LLM_PROVIDERS (a JSON list of Provider fields), else the two built-in ones"""
+    configured = os.getenv("LLM_PROVIDERS")
+    if configured:
+        return [Provider(**entry) for entry in json.loads(configured)]
+    return [
+        Provider('deepseek', "https://api.deepseek.com/v1/chat/completions", DEEPSEEK_API_KEY, 'deepseek-chat', json_mode=True),
+        Provider('chataiapi', "https://www.chataiapi.com/v1/chat/completions", CHATAIAPI_API_KEY, 'gemini-2.5-pro'),
+    ]
+
+class CircuitBreaker:
+    """closed -> open after repeated failures -> half-open probe after a cooldown"""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allows(self) -> bool:
+        """Whether a request could be sent now; does not claim the half-open probe"""
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = 'half_open'
+        return self.state == 'half_open' and not self.probing
+
+    def acquire(self) -> bool:
+        """Claim permission to send one request; while half-open only the first caller gets the probe.
+
+        The check and the claim run without an await in between, so two tasks
+        on the event loop cannot both see the probe as free.
+        """
+        if not self.allows():
+            return False
+        if self.state == 'half_open':
+            self.probing = True
+        return True
+
+    def record(self, ok: bool, error_rate: float, samples: int):
+        self.probing = False
+        if ok:
+            self.consecutive_failures = 0
+            self.state = 'closed'
+            return
+        self.consecutive_failures += 1
+        too_many = self.consecutive_failures >= self.failure_threshold
+        too_often = samples >= BREAKER_MIN_SAMPLES and error_rate >= BREAKER_ERROR_RATE
+        if self.state == 'half_open' or too_many or too_often:
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+@dataclass
+class ProviderState:
+    provider: Provider
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    outcomes: deque = field(default_factory=lambda: deque(maxlen=STATS_WINDOW))  # (latency, ok)
+    in_flight: int = 0
+    calls: int = 0
+    hedges: int = 0
+
+    def __post_init__(self):
+        self.semaphore = asyncio.Semaphore(self.provider.max_concurrency)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self.outcomes if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+    @property
+    def error_rate(self) -> float:
+        return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.provider.max_concurrency
+
+    def score(self) -> float:
+        """Expected latency; lower is better. Errors and a full concurrency cap count against it"""
+        p50 = self.latency_percentile(0.5)
+        expected = PRIOR_LATENCY_SECONDS if p50 is None else p50
+        expected /= max(0.05, 1 - self.error_rate)
+        return expected * (4 if self.saturated else 1)
+
+class LLMRouter:
+    """Sends each completion to the fastest healthy provider.
+
+    Every provider keeps a rolling window of (latency, ok) outcomes, from which
+    p50/p95 and the error rate are derived; a circuit breaker per provider takes
+    it out of rotation after repeated failures, and a semaphore caps its
+    concurrent requests. When hedging is on and the primary request has not
+    answered by its provider's p95, a second request goes to the next-best
+    provider and whichever succeeds first wins; hedges are capped at
+    HEDGE_BUDGET of all requests. Failed requests fail over to the remaining
+    providers.
+    """
+
+    def __init__(self, providers: Optional[List[Provider]] = None, hedging: bool = HEDGING_ENABLED):
+        self.hedging = hedging
+        self.requests = 0
+        self.hedged = 0
+        self.configure(providers or default_providers())
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def configure(self, providers: List[Provider]):
+        self.states: Dict[str, ProviderState] = {p.name: ProviderState(p) for p in providers}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10.0))
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    def candidates(self, preferred: Optional[str] = None) -> List[ProviderState]:
+        """Healthy providers, best first; a preferred provider goes first while healthy"""
+        healthy = [state for state in self.states.values() if state.breaker.allows()]
+        healthy.sort(key=lambda state: (state.provider.name != preferred, state.score()))
+        return healthy
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        provider: Optional[str] = None,
+        json_mode: bool = False
+    ) -> Dict[str, Any]:
+        """{'content', 'provider', 'usage', 'latency'} or {'error'} when every provider failed"""
+        if provider is not None and provider not in self.states:
+            return {"error": "Invalid LLM choice"}
+        candidates = self.candidates(provider)
+        if not candidates:
+            return {"error": "All LLM providers are unavailable (circuit open)"}
+        self.requests += 1
+
+        errors = []
+        pending = list(candidates)
+        while pending:
+            primary = pending.pop(0)
+            hedge = pending[0] if self.hedging and pending else None
+            try:
+                return await self._hedged(primary, hedge, messages, json_mode, pending)
+            except ProviderError as e:
+                errors.append(str(e))
+        return {"error": "; ".join(errors)}
+
+    async def _hedged(self, primary, hedge, messages, json_mode, pending) -> Dict[str, Any]:
+        first = asyncio.ensure_future(self._call(primary, messages, json_mode))
+        if hedge is None:
+            return await first
+
+        delay = primary.latency_percentile(0.95) or DEFAULT_HEDGE_AFTER_SECONDS
+        done, _ = await asyncio.wait({first}, timeout=max(MIN_HEDGE_AFTER_SECONDS, delay))
+        if done or self.hedged >= HEDGE_BUDGET * self.requests:
+            return await first
+
+        pending.remove(hedge)
+        self.hedged += 1
+        hedge.hedges += 1
+        second = asyncio.ensure_future(self._call(hedge, messages, json_mode))
+        racing = {first, second}
+        try:
+            errors = []
+            while racing:
+                done, racing = await asyncio.wait(racing, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except ProviderError as e:
+                        errors.append(str(e))
+            raise ProviderError("; ".join(errors))
+        finally:
+            for task in racing:
+                task.cancel()
+
+    async def _call(self, state: ProviderState, messages, json_mode: bool) -> Dict[str, Any]:
+        provider = state.provider
+        payload = {"model": provider.model, "messages": messages}
+        if json_mode and provider.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        headers = {"Authorization": f"Bearer {provider.api_key}", "Content-Type": "application/json"}
+
+        async with state.semaphore:
+            # candidates() only checked the breaker; it may have opened or given its probe away since
+            if not state.breaker.acquire():
+                raise ProviderError(f"{provider.name}: circuit open")
+            state.in_flight += 1
+            state.calls += 1
+            started = time.monotonic()
+            ok, cancelled = False, False
+            try:
+                response = await self.client.post(provider.url, headers=headers, json=payload)
+                response.raise_for_status()
+                body = response.json()
+                content = body["choices"][0]["message"]["content"]
+                ok = True
+            except asyncio.CancelledError:
+                # Lost a hedge race: neither a success nor a provider failure
+                cancelled = True
+                state.breaker.probing = False
+                raise
+            except httpx.HTTPStatusError as e:
+                raise ProviderError(f"{provider.name}: HTTP error: {e.response.status_code} - {e.response.text[:200]}")
+            except (httpx.HTTPError, ValueError, KeyError, IndexError, TypeError) as e:
+                raise ProviderError(f"{provider.name}: {type(e).__name__}: {e}")
+            finally:
+                state.in_flight -= 1
+                latency = time.monotonic() - started
+                if not cancelled:
+                    state.outcomes.append((latency, ok))
+                    state.breaker.record(ok, state.error_rate, len(state.outcomes))
+
+        return {"content": content, "provider": provider.name, "usage": body.get("usage") or {}, "latency": latency}
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'provider': name,
+                'model': state.provider.model,
+                'breaker': state.breaker.state,
+                'p50_ms': _ms(state.latency_percentile(0.5)),
+                'p95_ms': _ms(state.latency_percentile(0.95)),
+                'error_rate': round(state.error_rate, 3),
+                'samples': len(state.outcomes),
+                'in_flight': state.in_flight,
+                'max_concurrency': state.provider.max_concurrency,
+                'calls': state.calls,
+                'hedges': state.hedges,
+            }
+            for name, state in self.states.items()
+        ]
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+llm_router = LLMRouter()
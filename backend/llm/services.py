@@ -1,25 +1,31 @@
-import httpx
-import os
 import json
-
-DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "DEEPSEEK_API_KEY_PLACEHOLDER")
-CHATAIAPI_API_KEY = os.environ.get("CHATAIAPI_API_KEY", "CHATAIAPI_API_KEY_PLACEHOLDER")
+import time
+from llm.router import llm_router
+from metrics import span, record_llm_call
 
 class LLMClient:
-    def __init__(self):
-        self.deepseek_url = "https://api.deepseek.com/v1/chat/completions"
-        self.chataiapi_url = "https://www.chataiapi.com/v1/chat/completions"
+    def __init__(self, router=llm_router):
+        self.router = router
+
+    async def _call_api(self, llm_choice: str, prompt: str, json_mode: bool = False):
+        """Route one prompt; `llm_choice` 'auto' lets the router pick, a provider name is tried first"""
+        provider = None if llm_choice == "auto" else llm_choice
+        with span('llm') as attributes:
+            started = time.perf_counter()
+            result = await self.router.complete([{"role": "user", "content": prompt}], provider=provider, json_mode=json_mode)
+            record_llm_call(result, time.perf_counter() - started)
+            usage = result.get('usage') or {}
+            attributes.update({
+                'provider': result.get('provider'),
+                'tokens_in': usage.get('prompt_tokens'),
+                'tokens_out': usage.get('completion_tokens'),
+                **({'error': result['error']} if 'error' in result else {})
+            })
+        return result
 
-    async def _call_api(self, url: str, headers: dict, data: dict):
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, headers=headers, json=data, timeout=60.0)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                return {"error": f"HTTP error: {e.response.status_code} - {e.response.text}"}
-            except Exception as e:
-                return {"error": str(e)}
+    async def complete(self, prompt: str, llm_choice: str = "auto", json_mode: bool = False):
+        """Send `prompt` as-is; returns {'content', 'provider', 'usage', 'latency'} or {'error'}"""
+        return await self._call_api(llm_choice, prompt, json_mode=json_mode)
 
     async def analyze_data(self, llm_choice: str, text_data: str):
         prompt = f"""
@@ -35,21 +41,11 @@ class LLMClient:
         ---
         """
         
-        if llm_choice == "deepseek":
-            headers = {"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"}
-            data = {"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}]}
-            response_data = await self._call_api(self.deepseek_url, headers, data)
-        elif llm_choice == "chataiapi":
-            headers = {"Authorization": f"Bearer {CHATAIAPI_API_KEY}", "Content-Type": "application/json"}
-            data = {"model": "gemini-2.5-pro", "messages": [{"role": "user", "content": prompt}]} # Assuming a default model
-            response_data = await self._call_api(self.chataiapi_url, headers, data)
-        else:
-            return {"error": "Invalid LLM choice"}
-
+        response_data = await self._call_api(llm_choice, prompt)
         if "error" in response_data:
             return response_data
         
-        return {"analysis": response_data["choices"][0]["message"]["content"]}
+        return {"analysis": response_data["content"], "provider": response_data["provider"]}
 
     async def transform_data(self, llm_choice: str, text_data: str, transformation_prompt: str):
         prompt = f"""
@@ -64,22 +60,12 @@ class LLMClient:
         ---
         """
 
-        if llm_choice == "deepseek":
-            headers = {"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"}
-            data = {"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
-            response_data = await self._call_api(self.deepseek_url, headers, data)
-        elif llm_choice == "chataiapi":
-            headers = {"Authorization": f"Bearer {CHATAIAPI_API_KEY}", "Content-Type": "application/json"}
-            data = {"model": "default-model", "messages": [{"role": "user", "content": prompt}]} # Assuming a default model
-            response_data = await self._call_api(self.chataiapi_url, headers, data)
-        else:
-            return {"error": "Invalid LLM choice"}
-
+        response_data = await self._call_api(llm_choice, prompt, json_mode=True)
         if "error" in response_data:
             return response_data
             
         try:
-            content = response_data["choices"][0]["message"]["content"]
+            content = response_data["content"]
             # The content might be a stringified JSON, so we parse it.
             return {"transformed_data": json.loads(content)}
         except (json.JSONDecodeError, KeyError) as e:
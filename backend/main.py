@@ -1,16 +1,43 @@
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form, BackgroundTasks, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse, Response, FileResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
+import asyncio
 import json
+import os
+import time
+from datetime import datetime
 
-import models, schemas, auth, database, data_connectors, ai_assistant
-from auth import get_current_active_user
+import models, schemas, auth, database, data_connectors, excel_reader, ai_assistant, rest_reader, pipeline, multi_source, coalescing, row_window, story_export, conversation
+from lazy_imports import start_warm_up
+from dataset_store import dataset_store, hash_file
+from source_refresh import source_refresher
+from approximate import approximate_settings, sample_store
+from data_quality import quality_engine
+from pipeline import pipeline_engine
+from multi_source import multi_source_analyzer
+from coalescing import request_coalescer
+from row_window import row_window_service
+from chart_data import chart_data_service
+from eda_report import report_engine
+from worker_pool import worker_pool
+from story_export import story_exporter
+from conversation import conversation_memory
+from llm.router import llm_router
+from llm.batching import llm_batcher
+from metrics import metrics, span, start_trace, current_trace, server_timing
+from profiling import request_profiler
+from serialization import FastJSONResponse, CompressionMiddleware, analysis_blobs, dumps, splice, raw_array, orm_dict
+from auth import get_current_active_user, get_current_admin_user
 from database import get_db, init_db
 
-app = FastAPI(title="Project Phoenix: Symbiotic Analysis Environment", version="1.0.0")
+app = FastAPI(
+    title="Project Phoenix: Symbiotic Analysis Environment",
+    version="1.0.0",
+    default_response_class=FastJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -21,10 +48,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Request latency histogram; ?timings=1 or `X-Timings: 1` also collects per-stage spans"""
+    traced = request.query_params.get('timings') in ('1', 'true') or request.headers.get('x-timings') == '1'
+    spans = start_trace() if traced else None
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get('route')
+    metrics.observe(
+        'http_request_duration_seconds', elapsed,
+        method=request.method, route=getattr(route, 'path', 'unmatched'), status=response.status_code
+    )
+    if spans is not None:
+        response.headers['Server-Timing'] = server_timing(spans + [{'stage': 'total', 'ms': elapsed * 1000}])
+    return response
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """Admin-requested (X-Profile header or ?profile=) or sampled CPU/memory profile of one request"""
+    flag = request.headers.get('x-profile') or request.query_params.get('profile')
+    if flag:
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not auth.is_admin_email(auth.token_email(token)):
+            flag = None
+    mode = request_profiler.requested_mode(flag)
+    if mode is None:
+        return await call_next(request)
+
+    request_info = {'method': request.method, 'path': request.url.path, 'query': str(request.query_params)}
+    response, run_id = await request_profiler.profile(mode, request_info, lambda: call_next(request))
+    if run_id:
+        response.headers['X-Profile-Id'] = run_id
+    return response
+
+# Outermost, so everything above is compressed on the way out
+app.add_middleware(CompressionMiddleware)
+
 # Initialize database
 @app.on_event("startup")
 def startup_event():
     init_db()
+    start_warm_up()
+
+@app.on_event("startup")
+async def start_source_sync():
+    source_refresher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await source_refresher.stop()
+    await rest_reader.close_client()
+    await llm_router.close()
+    worker_pool.shutdown()
 
 # Authentication endpoints
 @app.post("/token", response_model=schemas.Token)
@@ -87,10 +164,24 @@ def get_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return project
+    # Built straight from the rows; analyses never change, so their JSON is serialized once
+    analyses = [analysis_blob(analysis) for analysis in project.analyses]
+    return FastJSONResponse(splice(orm_dict(project, schemas.Project), {
+        'data_sources': dumps([orm_dict(source, schemas.DataSource) for source in project.data_sources]),
+        'analyses': raw_array(analyses),
+        'stories': dumps([orm_dict(story, schemas.Story) for story in project.stories])
+    }))
+
+def analysis_blob(analysis: models.Analysis) -> bytes:
+    # Analyses only change when their background refinement finishes, which the key includes
+    refinement = (analysis.results or {}).get('refinement')
+    return analysis_blobs.get(
+        (analysis.id, analysis.created_at, dumps(refinement) if refinement else None),
+        lambda: dumps(orm_dict(analysis, schemas.Analysis))
+    )
 
 # Data source endpoints
-@app.post("/projects/{project_id}/data-sources", response_model=schemas.DataSource)
+@app.post("/projects/{project_id}/data-sources", response_model=Union[schemas.DataSource, List[schemas.DataSource]])
 async def create_data_source(
     project_id: int,
     source_type: str = Form(...),
@@ -114,41 +205,104 @@ async def create_data_source(
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid config JSON")
     
-    # Handle file upload if present
-    if file:
-        file_content = await file.read()
-        if source_type in ['csv', 'excel', 'json', 'pdf']:
-            connection_config['file_content'] = file_content
+    # Spool uploads to disk while hashing them; connectors read the spooled file
+    spool_path, content_digest = None, None
+    connector_config = dict(connection_config)
+    if file and source_type in ['csv', 'excel', 'json', 'pdf']:
+        spool_path, content_digest = await dataset_store.spool_upload(file)
+        upload_size = os.path.getsize(spool_path)
+        connector_config['file_path'] = spool_path
     
-    # Connect to data source
-    result = await data_connectors.data_connector.connect(source_type, connection_config)
+    # `sheets` (a list of names, or "*" for all) turns one workbook into one data source per sheet
+    sheets = connection_config.get('sheets') if source_type == 'excel' else None
+    try:
+        if sheets is not None:
+            datasets = await ingest_sheets(db, connector_config, content_digest, sheets)
+        else:
+            datasets = {None: await ingest_source(db, source_type, connector_config, content_digest)}
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
     
-    if not result['success']:
-        raise HTTPException(status_code=400, detail=result['error'])
+    # Create data source records
+    base_name = connection_config.get('name', f'{source_type}_source')
+    db_data_sources = []
+    for sheet, dataset in datasets.items():
+        source_config = connection_config
+        if sheet is not None:
+            source_config = {k: v for k, v in connection_config.items() if k != 'sheets'}
+            source_config['sheet'] = sheet
+        db_data_source = models.DataSource(
+            project_id=project_id,
+            name=base_name if sheet is None else f"{base_name} - {sheet}",
+            type=source_type,
+            connection_config=source_config,
+            dataset_id=dataset.id
+        )
+        db.add(db_data_source)
+        dataset_store.acquire(db, dataset)
+        db_data_sources.append(db_data_source)
+    if content_digest:
+        # Lets the first refresh recognise an upload that only grew at the end
+        db.flush()
+        for db_data_source in db_data_sources:
+            source_refresher.record_state(db, db_data_source, {'content_digest': content_digest, 'size': upload_size})
+    db.commit()
+    for db_data_source in db_data_sources:
+        db.refresh(db_data_source)
+        try:
+            await quality_engine.assess(db, db_data_source)
+        except Exception as e:
+            # The source is usable without its report, which the quality endpoint can rebuild
+            print(f"Error assessing data quality of data source {db_data_source.id}: {e}")
     
-    # Create data source record
-    db_data_source = models.DataSource(
-        project_id=project_id,
-        name=connection_config.get('name', f'{source_type}_source'),
-        type=source_type,
-        connection_config=connection_config,
-        data_preview=result['data_preview'],
-        data_profile=result['data_profile'],
-        raw_data=json.dumps(result['raw_data_sample']) if result['raw_data_sample'] else None
-    )
+    return db_data_sources if sheets is not None else db_data_sources[0]
+
+async def ingest_source(db: Session, source_type: str, connector_config: dict, content_digest: Optional[str]):
+    """Stored dataset for a source, parsing and profiling it only when no identical one exists"""
+    try:
+        return await source_refresher.ingest(db, source_type, connector_config, content_digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def ingest_sheets(db: Session, connector_config: dict, content_digest: Optional[str], sheets):
+    """Stored dataset per selected sheet; sheets not stored yet are parsed in parallel"""
+    if 'file_path' not in connector_config:
+        raise HTTPException(status_code=400, detail="Sheet selection requires an uploaded file or file_path")
+    try:
+        sheets = await asyncio.to_thread(excel_reader.resolve_sheets, connector_config['file_path'], sheets)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    db.add(db_data_source)
-    db.commit()
-    db.refresh(db_data_source)
+    # Each sheet is fingerprinted as if it had been uploaded on its own with `sheet` set
+    base_config = {k: v for k, v in connector_config.items() if k != 'sheets'}
+    content_digest = content_digest or await asyncio.to_thread(hash_file, base_config['file_path'])
+    fingerprints = {
+        sheet: await data_connectors.data_connector.fingerprint('excel', {**base_config, 'sheet': sheet}, content_digest)
+        for sheet in sheets
+    }
+    datasets = {sheet: dataset_store.find(db, fingerprints[sheet]) for sheet in sheets}
     
-    return db_data_source
+    missing = [sheet for sheet in sheets if datasets[sheet] is None]
+    if missing:
+        results = await data_connectors.data_connector.connect_sheets(base_config, missing)
+        failed = {sheet: result['error'] for sheet, result in results.items() if not result['success']}
+        if failed:
+            raise HTTPException(status_code=400, detail=f"Could not load sheets: {failed}")
+        with span('store'):
+            for sheet, result in results.items():
+                datasets[sheet] = dataset_store.find(db, fingerprints[sheet]) or dataset_store.create(db, fingerprints[sheet], result)
+                sample_store.schedule(datasets[sheet])
+    return datasets
 
-@app.get("/projects/{project_id}/data-sources", response_model=List[schemas.DataSource])
+@app.get("/projects/{project_id}/data-sources", response_model=List[Union[schemas.DataSource, schemas.DataSourceSummary]])
 def get_project_data_sources(
     project_id: int,
+    view: str = "full",
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """`view=summary` omits the preview and profile blobs; rows come from the /rows endpoint"""
     # Verify project ownership
     project = db.query(models.Project).filter(
         models.Project.id == project_id,
@@ -158,13 +312,366 @@ def get_project_data_sources(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return project.data_sources
+    if view == "summary":
+        summaries = []
+        for source in project.data_sources:
+            preview = source.data_preview or {}
+            summaries.append(schemas.DataSourceSummary(
+                id=source.id,
+                project_id=source.project_id,
+                dataset_id=source.dataset_id,
+                name=source.name,
+                type=source.type,
+                row_count=preview.get('row_count'),
+                column_count=preview.get('column_count'),
+                columns=[str(column) for column in preview.get('columns', [])],
+                created_at=source.created_at
+            ))
+        return summaries
+    
+    return FastJSONResponse([orm_dict(source, schemas.DataSource) for source in project.data_sources])
+
+@app.delete("/projects/{project_id}/data-sources/{data_source_id}")
+def delete_data_source(
+    project_id: int,
+    data_source_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    
+    dataset = data_source.dataset
+    db.query(models.DataSourceSync).filter(models.DataSourceSync.data_source_id == data_source.id).delete()
+    db.delete(data_source)
+    if dataset:
+        dataset_store.release(db, dataset)
+    else:
+        db.commit()
+    
+    return {"message": "Data source deleted"}
+
+@app.post("/projects/{project_id}/data-sources/{data_source_id}/refresh", response_model=schemas.RefreshResult)
+async def refresh_data_source(
+    project_id: int,
+    data_source_id: int,
+    file: Optional[UploadFile] = File(None),
+    reanalyze: bool = Form(True),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Bring a source up to date: unchanged content is detected cheaply, appended rows are merged
+    without re-reading the old ones, and the source's latest analysis is re-run where inputs changed.
+    Uploaded sources are refreshed by uploading the new version of the file."""
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    
+    spool_path, content_digest = None, None
+    if file:
+        spool_path, content_digest = await dataset_store.spool_upload(file)
+    try:
+        return await source_refresher.refresh(db, data_source, spool_path, content_digest, reanalyze)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+
+@app.get("/projects/{project_id}/data-sources/{data_source_id}/refresh-schedule", response_model=schemas.RefreshSchedule)
+def get_refresh_schedule(
+    project_id: int,
+    data_source_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    return source_refresher.get_sync(db, data_source)
+
+@app.put("/projects/{project_id}/data-sources/{data_source_id}/refresh-schedule", response_model=schemas.RefreshSchedule)
+def update_refresh_schedule(
+    project_id: int,
+    data_source_id: int,
+    schedule: schemas.RefreshScheduleUpdate,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    try:
+        return source_refresher.set_schedule(db, data_source, schedule.interval_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/projects/{project_id}/data-sources/{data_source_id}/quality")
+async def get_data_quality(
+    project_id: int,
+    data_source_id: int,
+    recheck: bool = False,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Rule-based quality findings per column with row positions; `recheck=true` rescans the data
+    and re-runs the referential checks against the project's current sources"""
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    
+    report = data_source.data_quality_issues
+    if report is None or recheck:
+        report = await quality_engine.assess(db, data_source, recheck=recheck)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No stored rows to check")
+    return report
+
+def get_owned_data_source(db: Session, user: models.User, project_id: int, data_source_id: int) -> models.DataSource:
+    data_source = db.query(models.DataSource).join(models.Project).filter(
+        models.DataSource.id == data_source_id,
+        models.DataSource.project_id == project_id,
+        models.Project.owner_id == user.id
+    ).first()
+    
+    if not data_source:
+        raise HTTPException(status_code=404, detail="Data source not found")
+    
+    return data_source
+
+def get_transformation(db: Session, data_source: models.DataSource, transformation_id: int) -> models.DataTransformation:
+    transformation = db.query(models.DataTransformation).filter(
+        models.DataTransformation.id == transformation_id,
+        models.DataTransformation.data_source_id == data_source.id
+    ).first()
+    
+    if not transformation:
+        raise HTTPException(status_code=404, detail="Transformation not found")
+    
+    return transformation
+
+@app.get("/projects/{project_id}/data-sources/{data_source_id}/rows", response_model=schemas.RowWindow)
+def get_data_source_rows(
+    project_id: int,
+    data_source_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0),
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    filter: Optional[str] = None,
+    cursor: Optional[str] = None,
+    format: str = "columns",
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """A window of rows from the stored dataset.
+
+    `columns` is a comma-separated projection, `sort` a column name (prefix `-`
+    for descending), `filter` a JSON list of {column, op, value} conditions and
+    `cursor` the `next_cursor` of the previous page. `format=arrow` returns an
+    Arrow IPC stream instead of column-oriented JSON.
+    """
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    dataset = data_source.dataset
+    if dataset is None or not dataset.storage_path:
+        raise HTTPException(status_code=400, detail="Data source has no stored tabular dataset")
+    
+    try:
+        conditions = json.loads(filter) if filter else []
+        if cursor:
+            offset = row_window.decode_cursor(cursor, dataset.fingerprint, sort, conditions)
+        projection = [column for column in columns.split(',') if column] if columns else None
+        page, total_rows = row_window_service.window(dataset, offset, limit, projection, sort, conditions)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    next_offset = offset + page.num_rows
+    next_cursor = row_window.encode_cursor(dataset.fingerprint, sort, conditions, next_offset) if next_offset < total_rows else None
+    
+    if format == "arrow":
+        headers = {"X-Total-Rows": str(total_rows), "X-Offset": str(offset)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return Response(content=row_window.to_arrow_ipc(page), media_type="application/vnd.apache.arrow.stream", headers=headers)
+    
+    return {
+        "columns": page.column_names,
+        "dtypes": {field.name: str(field.type) for field in page.schema},
+        "data": row_window.to_columnar_json(page),
+        "offset": offset,
+        "row_count": page.num_rows,
+        "total_rows": total_rows,
+        "next_cursor": next_cursor
+    }
+
+@app.post("/projects/{project_id}/data-sources/{data_source_id}/chart-data", response_model=schemas.ChartData)
+def get_chart_data(
+    project_id: int,
+    data_source_id: int,
+    spec: schemas.ChartSpec,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Aggregated or downsampled series for one chart, cached per dataset and spec"""
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    
+    try:
+        result, cached = chart_data_service.chart(data_source.dataset, spec.dict(exclude_none=True))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    data = {k: v for k, v in result.items() if k not in ('kind', 'spec')}
+    return {"kind": result['kind'], "spec": result['spec'], "data": data, "cached": cached}
+
+# Transformation pipeline endpoints
+@app.get("/projects/{project_id}/data-sources/{data_source_id}/transformations", response_model=List[schemas.DataTransformation])
+def get_transformations(
+    project_id: int,
+    data_source_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    return data_source.transformations
+
+@app.post("/projects/{project_id}/data-sources/{data_source_id}/transformations", response_model=schemas.DataTransformation)
+def add_transformation(
+    project_id: int,
+    data_source_id: int,
+    transformation: schemas.TransformationCreate,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    
+    try:
+        pipeline_engine.validate(transformation.transformation_type, transformation.transformation_config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Without an explicit parent the step extends the most recent one
+    parent_id = transformation.parent_id
+    if parent_id is None and data_source.transformations:
+        parent_id = max(step.id for step in data_source.transformations)
+    elif parent_id is not None:
+        get_transformation(db, data_source, parent_id)
+    
+    db_transformation = models.DataTransformation(
+        data_source_id=data_source.id,
+        parent_id=parent_id,
+        transformation_type=transformation.transformation_type,
+        transformation_config=transformation.transformation_config
+    )
+    
+    db.add(db_transformation)
+    db.commit()
+    db.refresh(db_transformation)
+    
+    return db_transformation
+
+@app.put("/projects/{project_id}/data-sources/{data_source_id}/transformations/{transformation_id}", response_model=schemas.DataTransformation)
+def update_transformation(
+    project_id: int,
+    data_source_id: int,
+    transformation_id: int,
+    update: schemas.TransformationUpdate,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    transformation = get_transformation(db, data_source, transformation_id)
+    
+    try:
+        pipeline_engine.validate(transformation.transformation_type, update.transformation_config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Downstream cache keys derive from this config, so later steps recompute on next evaluation
+    transformation.transformation_config = update.transformation_config
+    transformation.materialized_dataset_id = None
+    db.commit()
+    db.refresh(transformation)
+    
+    return transformation
+
+@app.get("/projects/{project_id}/data-sources/{data_source_id}/transformations/{transformation_id}/preview", response_model=schemas.TransformationPreview)
+def preview_transformation(
+    project_id: int,
+    data_source_id: int,
+    transformation_id: int,
+    sample_size: int = pipeline.DEFAULT_SAMPLE_ROWS,
+    rows: int = 50,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    transformation = get_transformation(db, data_source, transformation_id)
+    
+    try:
+        frame, _ = pipeline_engine.evaluate(db, transformation, sample_rows=sample_size)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "columns": [str(column) for column in frame.columns],
+        "rows": data_connectors.data_connector._to_records(frame.head(rows)),
+        "sample_row_count": len(frame)
+    }
+
+@app.post("/projects/{project_id}/data-sources/{data_source_id}/transformations/{transformation_id}/materialize", response_model=schemas.DataSource)
+def materialize_transformation(
+    project_id: int,
+    data_source_id: int,
+    transformation_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    data_source = get_owned_data_source(db, current_user, project_id, data_source_id)
+    transformation = get_transformation(db, data_source, transformation_id)
+    
+    try:
+        frame, key = pipeline_engine.evaluate(db, transformation)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    connector = data_connectors.data_connector
+    dataset = dataset_store.find(db, key) or dataset_store.create(db, key, {
+        'data': frame,
+        'data_preview': connector._generate_preview(frame),
+        'data_profile': {
+            'derived_from': {'data_source_id': data_source.id, 'transformation_id': transformation.id},
+            'quality': quality_engine.scan(frame)
+        },
+        'raw_data_sample': connector._to_records(frame.head(100))
+    })
+    
+    db_data_source = models.DataSource(
+        project_id=project_id,
+        name=f"{data_source.name} (step {transformation.id})",
+        type='transformation',
+        connection_config={'data_source_id': data_source.id, 'transformation_id': transformation.id},
+        dataset_id=dataset.id,
+        data_quality_issues=(dataset.data_profile or {}).get('quality')
+    )
+    transformation.materialized_dataset_id = dataset.id
+    transformation.applied_at = datetime.utcnow()
+    
+    db.add(db_data_source)
+    dataset_store.acquire(db, dataset)
+    db.commit()
+    db.refresh(db_data_source)
+    
+    return db_data_source
+
+def select_data_sources(project: models.Project, data_source_ids: Optional[List[int]]) -> List[models.DataSource]:
+    """The requested sources of a project (all of them when no ids are given)"""
+    if not data_source_ids:
+        return list(project.data_sources)
+    
+    by_id = {source.id: source for source in project.data_sources}
+    missing = [source_id for source_id in data_source_ids if source_id not in by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Data sources not found: {missing}")
+    
+    return [by_id[source_id] for source_id in data_source_ids]
 
 # AI Analysis endpoints
 @app.post("/projects/{project_id}/analyze", response_model=schemas.AnalysisResult)
 async def analyze_project_data(
     project_id: int,
     analysis_config: schemas.AnalysisConfig,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -177,40 +684,157 @@ async def analyze_project_data(
     if not project or not project.data_sources:
         raise HTTPException(status_code=404, detail="Project or data sources not found")
     
-    # Get data from the first data source (simplified)
-    data_source = project.data_sources[0]
+    if analysis_config.combine not in multi_source.COMBINE_MODES:
+        raise HTTPException(status_code=400, detail=f"combine must be one of {sorted(multi_source.COMBINE_MODES)}")
+    
+    # `parameters.approximate` analyzes large sources on stored samples, with confidence intervals
+    try:
+        approximate = approximate_settings(analysis_config.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    data_sources = select_data_sources(project, analysis_config.data_source_ids)
     
-    # Convert data preview back to DataFrame (simplified)
-    # In real implementation, would fetch actual data
-    data_sample = pd.DataFrame(data_source.data_preview['sample_data'])
+    # Identical analyses already running (in any worker) are awaited instead of repeated
+    coalesce_key = coalescing.make_key('analyze', coalescing.data_fingerprint(data_sources), {
+        'data_source_ids': [source.id for source in data_sources],
+        'combine': analysis_config.combine,
+        'analysis_type': analysis_config.analysis_type,
+        'parameters': analysis_config.parameters
+    })
+    
+    async def run_analysis():
+        # Run AI analysis over every selected source concurrently
+        insights, _ = await multi_source_analyzer.analyze(data_sources, analysis_config.combine, approximate)
+        return insights
+    
+    try:
+        insights = await request_coalescer.run(coalesce_key, run_analysis)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Run AI analysis
-    insights = await ai_assistant.analyze_data(data_sample)
+    # Exact results of a sampled analysis are computed after responding and saved as their own analysis
+    refine = approximate is not None and approximate['refine'] and any('approximation' in insight for insight in insights)
+    results = {"insights": insights}
+    if refine:
+        results['refinement'] = {'status': 'scheduled'}
     
     # Save analysis
-    db_analysis = models.Analysis(
-        project_id=project_id,
-        name=analysis_config.name,
-        type=analysis_config.analysis_type,
-        config=analysis_config.dict(),
-        results={"insights": insights},
-        insights=insights
-    )
+    with span('db.save'):
+        db_analysis = models.Analysis(
+            project_id=project_id,
+            name=analysis_config.name,
+            type=analysis_config.analysis_type,
+            config=analysis_config.dict(),
+            results=results,
+            insights=insights
+        )
     
-    db.add(db_analysis)
-    db.commit()
-    db.refresh(db_analysis)
+        db.add(db_analysis)
+        db.commit()
+        db.refresh(db_analysis)
+        analysis_blob(db_analysis)
     
-    return {
+    if refine:
+        background_tasks.add_task(
+            refine_analysis, db_analysis.id, [source.id for source in data_sources], analysis_config.combine
+        )
+    
+    return FastJSONResponse({
         "analysis_id": db_analysis.id,
         "insights": insights,
-        "summary": f"Generated {len(insights)} insights from data analysis"
+        "summary": f"Generated {len(insights)} insights from {len(data_sources)} data source(s)",
+        "refinement": {"status": "scheduled"} if refine else None,
+        "timings": current_trace()
+    })
+
+async def refine_analysis(analysis_id: int, data_source_ids: List[int], combine: str):
+    """Exact version of an approximate analysis, saved as a new analysis that refers back to it.
+
+    The outcome is recorded on the approximate analysis as
+    results['refinement'] = {status, refined_analysis_id, error}.
+    """
+    db = database.SessionLocal()
+    approximate = None
+    try:
+        approximate = db.query(models.Analysis).filter(models.Analysis.id == analysis_id).first()
+        if approximate is None:
+            return
+        by_id = {source.id: source for source in db.query(models.DataSource).filter(models.DataSource.id.in_(data_source_ids))}
+        data_sources = [by_id[source_id] for source_id in data_source_ids if source_id in by_id]
+        if not data_sources:
+            raise ValueError("The analyzed data sources no longer exist")
+        parameters = {k: v for k, v in (approximate.config.get('parameters') or {}).items() if k != 'approximate'}
+        coalesce_key = coalescing.make_key('analyze', coalescing.data_fingerprint(data_sources), {
+            'data_source_ids': data_source_ids,
+            'combine': combine,
+            'analysis_type': approximate.type,
+            'parameters': parameters or None
+        })
+        
+        async def run_analysis():
+            insights, _ = await multi_source_analyzer.analyze(data_sources, combine)
+            return insights
+        
+        insights = await request_coalescer.run(coalesce_key, run_analysis)
+        exact = models.Analysis(
+            project_id=approximate.project_id,
+            name=f"{approximate.name} (exact)",
+            type=approximate.type,
+            config={**approximate.config, 'parameters': parameters or None, 'refines_analysis_id': analysis_id},
+            results={"insights": insights},
+            insights=insights
+        )
+        db.add(exact)
+        db.flush()
+        # Reassigned, not mutated, so the JSON column is written
+        approximate.results = {**approximate.results, 'refinement': {'status': 'done', 'refined_analysis_id': exact.id}}
+        db.commit()
+    except Exception as e:
+        print(f"Error refining analysis {analysis_id}: {e}")
+        if approximate is not None:
+            try:
+                db.rollback()
+                approximate.results = {**approximate.results, 'refinement': {'status': 'failed', 'error': str(e)}}
+                db.commit()
+            except Exception as e:
+                print(f"Error recording failed refinement of analysis {analysis_id}: {e}")
+    finally:
+        db.close()
+
+@app.get("/projects/{project_id}/analyses/{analysis_id}/refinement", response_model=schemas.AnalysisRefinement)
+def get_analysis_refinement(
+    project_id: int,
+    analysis_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Whether the exact version of an approximate analysis is ready, and its id"""
+    analysis = db.query(models.Analysis).join(models.Project).filter(
+        models.Analysis.id == analysis_id,
+        models.Analysis.project_id == project_id,
+        models.Project.owner_id == current_user.id
+    ).first()
+    
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    refinement = (analysis.results or {}).get('refinement')
+    if not refinement:
+        return {"analysis_id": analysis_id, "status": "none"}
+    status = refinement['status']
+    return {
+        "analysis_id": analysis_id,
+        "status": "pending" if status == 'scheduled' else status,
+        "refined_analysis_id": refinement.get('refined_analysis_id'),
+        "error": refinement.get('error')
     }
 
 @app.post("/projects/{project_id}/ask", response_model=schemas.AIResponse)
 async def ask_question(
     project_id: int,
     question: schemas.Question,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -223,34 +847,104 @@ async def ask_question(
     if not project or not project.data_sources:
         raise HTTPException(status_code=404, detail="Project or data sources not found")
     
-    data_source = project.data_sources[0]
-    data_sample = pd.DataFrame(data_source.data_preview['sample_data'])
+    data_sources = select_data_sources(project, question.data_source_ids)
+    data_fingerprint = coalescing.data_fingerprint(data_sources)
+    memory = conversation_memory.load(db, project_id)
+    try:
+        approximate = approximate_settings(question.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    coalesce_key = coalescing.make_key('ask', data_fingerprint, {
+        'question': coalescing.normalize_question(question.question),
+        'data_source_ids': [source.id for source in data_sources],
+        'combine': question.combine,
+        'parameters': question.parameters,
+        'history': conversation_memory.digest(memory)
+    })
     
-    # Answer question
-    answer = await ai_assistant.answer_question(
-        question.question, 
-        data_sample, 
-        {"project_name": project.name, "data_source": data_source.name}
-    )
+    async def run_answer():
+        # Statistical answers about one large source can come from its sample, with an interval
+        sample = None
+        if approximate and len(data_sources) == 1:
+            sample = await sample_store.sample_for(data_sources[0].dataset, approximate)
+        if sample is not None:
+            data = sample.frame
+            schema_key = f"{data_fingerprint}:sample:{len(data)}"
+        else:
+            data = await multi_source_analyzer.question_frame(data_sources, question.combine)
+            schema_key = f"{data_fingerprint}:{question.combine}"
+        
+        # Answer question
+        return await ai_assistant.ai_assistant.answer_question(
+            question.question, 
+            data, 
+            {
+                "project_name": project.name,
+                "data_sources": [source.name for source in data_sources],
+                "schema": await asyncio.to_thread(conversation.schema_context, schema_key, data),
+                "history": conversation_memory.format(memory)
+            },
+            sample=sample
+        )
     
-    # Save conversation
-    db_conversation = models.AIConversation(
-        project_id=project_id,
-        message_type="user_query",
-        content=question.question,
-        metadata=answer
-    )
+    try:
+        answer = await request_coalescer.run(coalesce_key, run_answer)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    db.add(db_conversation)
-    db.commit()
+    # Save the exchange, then fold old turns into the rolling summary off the request path
+    conversation_memory.record(db, project_id, question.question, answer)
+    background_tasks.add_task(conversation_memory.compact, project_id)
     
-    return answer
+    return {**answer, "timings": current_trace()}
+
+@app.get("/llm/providers")
+def get_llm_providers(current_user: models.User = Depends(get_current_active_user)):
+    """Rolling latency, error rate and circuit state per LLM provider"""
+    return {
+        "hedging": llm_router.hedging,
+        "requests": llm_router.requests,
+        "hedged_requests": llm_router.hedged,
+        "providers": llm_router.snapshot(),
+        "batching": {"enabled": llm_batcher.enabled, "window_ms": llm_batcher.window * 1000, **llm_batcher.stats}
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint: request latency, stage spans, LLM calls and tokens"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/profiles")
+def list_profiles(current_user: models.User = Depends(get_current_admin_user)):
+    """Stored request profiles, newest first"""
+    return request_profiler.list_runs()
+
+@app.get("/admin/profiles/{run_id}")
+def get_profile(run_id: str, current_user: models.User = Depends(get_current_admin_user)):
+    """One profile with its top functions and allocation sites"""
+    run = request_profiler.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return run
+
+@app.get("/admin/profiles/{run_id}/files/{name}")
+def download_profile_file(run_id: str, name: str, current_user: models.User = Depends(get_current_admin_user)):
+    """stacks.folded (flamegraph.pl / speedscope) or profile.pstats (snakeviz)"""
+    path = request_profiler.file_path(run_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile file not found")
+    return FileResponse(path, filename=f"{run_id}-{name}")
+
+@app.get("/coalescing/stats")
+def get_coalescing_stats(current_user: models.User = Depends(get_current_active_user)):
+    return request_coalescer.get_stats()
 
 # Storytelling endpoints
 @app.post("/projects/{project_id}/stories", response_model=schemas.Story)
 async def create_story(
     project_id: int,
     story_config: schemas.StoryConfig,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -263,6 +957,11 @@ async def create_story(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    try:
+        story_exporter.validate_formats(story_config.export_formats)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Get analyses and insights
     analyses = project.analyses
     all_insights = []
@@ -272,9 +971,10 @@ async def create_story(
             all_insights.extend(analysis.insights)
     
     # Generate narrative
-    narrative = await ai_assistant.generate_narrative(
+    narrative = await ai_assistant.ai_assistant.generate_narrative(
         all_insights,
-        {"project_name": project.name, "analysis_count": len(analyses)}
+        {"project_name": project.name, "analysis_count": len(analyses)},
+        scope=f"project:{project.id}"
     )
     
     # Create story
@@ -290,8 +990,93 @@ async def create_story(
     db.commit()
     db.refresh(db_story)
     
+    if story_config.export_formats:
+        exports = story_exporter.schedule(db, db_story, story_config.export_formats)
+        background_tasks.add_task(story_exporter.export, db_story.id, [export.id for export in exports])
+    
     return db_story
 
+def get_owned_story(db: Session, user: models.User, project_id: int, story_id: int) -> models.Story:
+    story = db.query(models.Story).join(models.Project).filter(
+        models.Story.id == story_id,
+        models.Story.project_id == project_id,
+        models.Project.owner_id == user.id
+    ).first()
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return story
+
+@app.post("/projects/{project_id}/stories/{story_id}/exports", response_model=List[schemas.StoryExport], status_code=202)
+def export_story(
+    project_id: int,
+    story_id: int,
+    export_request: schemas.StoryExportRequest,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Render the story in the background; poll the export list and download when done"""
+    story = get_owned_story(db, current_user, project_id, story_id)
+    try:
+        exports = story_exporter.schedule(db, story, export_request.formats or story.export_formats or ["html"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    background_tasks.add_task(story_exporter.export, story.id, [export.id for export in exports])
+    return exports
+
+@app.get("/projects/{project_id}/stories/{story_id}/exports", response_model=List[schemas.StoryExport])
+def get_story_exports(
+    project_id: int,
+    story_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    story = get_owned_story(db, current_user, project_id, story_id)
+    return db.query(models.StoryExport).filter(
+        models.StoryExport.story_id == story.id
+    ).order_by(models.StoryExport.created_at.desc()).all()
+
+@app.get("/projects/{project_id}/stories/{story_id}/exports/{export_format}/download")
+def download_story_export(
+    project_id: int,
+    story_id: int,
+    export_format: str,
+    request: Request,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Latest finished export in `export_format`; the ETag is the hash of its rendered inputs"""
+    story = get_owned_story(db, current_user, project_id, story_id)
+    export = db.query(models.StoryExport).filter(
+        models.StoryExport.story_id == story.id,
+        models.StoryExport.format == export_format,
+        models.StoryExport.status == 'done'
+    ).order_by(models.StoryExport.completed_at.desc()).first()
+    
+    if not export or not export.file_path or not os.path.exists(export.file_path):
+        pending = db.query(models.StoryExport).filter(
+            models.StoryExport.story_id == story.id,
+            models.StoryExport.format == export_format,
+            models.StoryExport.status.in_(['pending', 'running'])
+        ).first()
+        if pending:
+            raise HTTPException(status_code=409, detail="Export is still rendering")
+        raise HTTPException(status_code=404, detail="No finished export in this format")
+    
+    etag = f'"{export.content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    filename = f"{story.title or 'story'}.{export_format}"
+    return FileResponse(
+        export.file_path,
+        media_type=story_export.MEDIA_TYPES[export_format],
+        filename=filename,
+        headers=headers
+    )
+
 # Health check endpoint
 @app.get("/")
 def read_root():
@@ -300,8 +1085,32 @@ def read_root():
 # Keep legacy endpoints for backward compatibility
 @app.post("/api/eda/conventional", response_class=HTMLResponse)
 async def conventional_eda(file: UploadFile = File(...), tool: str = Form(...)):
-    # Legacy endpoint implementation
-    pass
+    """HTML profiling report for an uploaded file, streamed as sections finish.
+
+    Reports are cached by file hash and tool, so repeated uploads of the same
+    file are served from disk.
+    """
+    try:
+        report_engine.validate_tool(tool)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    spool_path, file_hash = await dataset_store.spool_upload(file)
+    try:
+        cached = report_engine.cached(file_hash, tool)
+        if cached:
+            return FileResponse(cached, media_type="text/html", headers={"X-Report-Cache": "hit"})
+        parquet_path, columns = await report_engine.prepare(spool_path, file.filename, file_hash)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(spool_path)
+    
+    return StreamingResponse(
+        report_engine.render(parquet_path, columns, file_hash, tool, file.filename or "Uploaded data"),
+        media_type="text/html",
+        headers={"X-Report-Cache": "miss"}
+    )
 
 @app.post("/api/eda/ai/analyze", response_class=JSONResponse)
 async def ai_analyze(file: UploadFile = File(...), llm_choice: str = Form(...)):
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Seconds; spans range from sub-millisecond pandas calls to minute-long LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text exposition format.
+
+    Metrics are created on first use; `describe` only sets the HELP text.
+    """
+
+    def __init__(self, prefix: str = 'phoenix'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = f"{self.prefix}_{name}"
+                lines.extend(self._header(name, full, 'counter'))
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{_format_labels(key)} {_format_value(value)}")
+            for name, series in sorted(self._histograms.items()):
+                full = f"{self.prefix}_{name}"
+                lines.extend(self._header(name, full, 'histogram'))
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else _format_value(bound)
+                        lines.append(f"{full}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{full}_count{_format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, name: str, full: str, kind: str) -> List[str]:
+        header = [f"# TYPE {full} {kind}"]
+        if name in self._help:
+            header.insert(0, f"# HELP {full} {self._help[name]}")
+        return header
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'HTTP request latency by route')
+metrics.describe('stage_duration_seconds', 'Duration of instrumented hot-path stages')
+metrics.describe('stage_errors_total', 'Instrumented stages that raised')
+metrics.describe('llm_request_duration_seconds', 'LLM completion latency by provider')
+metrics.describe('llm_requests_total', 'LLM completions by provider and outcome')
+metrics.describe('llm_tokens_total', 'LLM tokens by provider and direction (prompt/completion)')
+
+# Spans of the current request when a timing breakdown was asked for; None otherwise.
+# Tasks and to_thread() copy the context, so spans from concurrent work land in the same list.
+_request_spans: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar('request_spans', default=None)
+
+def start_trace() -> List[Dict[str, Any]]:
+    spans: List[Dict[str, Any]] = []
+    _request_spans.set(spans)
+    return spans
+
+def current_trace() -> Optional[List[Dict[str, Any]]]:
+    return _request_spans.get()
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Time a stage into `stage_duration_seconds` and, if tracing, the request breakdown.
+
+    Attributes only go into the breakdown, keeping metric label cardinality fixed.
+    """
+    started = time.perf_counter()
+    ok = True
+    try:
+        yield attributes
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe('stage_duration_seconds', elapsed, stage=stage)
+        if not ok:
+            metrics.inc('stage_errors_total', stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append({'stage': stage, 'ms': round(elapsed * 1000, 2), **({} if ok else {'error': True}), **attributes})
+
+def record_llm_call(result: Dict[str, Any], elapsed: float):
+    """Count one routed LLM completion and its token usage"""
+    if 'error' in result:
+        metrics.inc('llm_requests_total', provider='none', outcome='error')
+        return
+    provider = result.get('provider', 'unknown')
+    usage = result.get('usage') or {}
+    metrics.inc('llm_requests_total', provider=provider, outcome='ok')
+    metrics.observe('llm_request_duration_seconds', elapsed, provider=provider)
+    metrics.inc('llm_tokens_total', usage.get('prompt_tokens', 0), provider=provider, direction='prompt')
+    metrics.inc('llm_tokens_total', usage.get('completion_tokens', 0), provider=provider, direction='completion')
+
+def server_timing(spans: List[Dict[str, Any]]) -> str:
+    """Server-Timing header value, one entry per stage with durations summed"""
+    totals: Dict[str, float] = {}
+    for entry in spans:
+        totals[entry['stage']] = totals.get(entry['stage'], 0.0) + entry['ms']
+    return ', '.join(f"{stage.replace(' ', '_')};dur={ms:.1f}" for stage, ms in totals.items())
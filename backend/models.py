@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,33 +32,91 @@ class Project(Base):
     analyses = relationship("Analysis", back_populates="project")
     stories = relationship("Story", back_populates="project")
 
+class Dataset(Base):
+    __tablename__ = "datasets"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String, unique=True, index=True)  # sha256 of source type, parse options and content
+    storage_path = Column(String)  # Parquet file in the dataset store (None for text sources)
+    row_count = Column(Integer)
+    raw_data = Column(Text)  # First 100 rows as JSON
+    data_preview = Column(JSON)
+    data_profile = Column(JSON)
+    ref_count = Column(Integer, default=0)  # Number of DataSource rows sharing this dataset
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    data_sources = relationship("DataSource", back_populates="dataset")
+
 class DataSource(Base):
     __tablename__ = "data_sources"
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
+    dataset_id = Column(Integer, ForeignKey("datasets.id"), nullable=True, index=True)
     name = Column(String)
     type = Column(String)  # csv, postgres, mysql, bigquery, s3, api, pdf, etc.
     connection_config = Column(JSON)  # Connection details
-    raw_data = Column(Text)  # For small files, store directly
-    data_preview = Column(JSON)  # First 100 rows for quick preview
-    data_profile = Column(JSON)  # Initial AI analysis results
+    # Legacy per-row copies; rows backed by a shared Dataset leave these empty
+    _raw_data = Column("raw_data", Text)
+    _data_preview = Column("data_preview", JSON)
+    _data_profile = Column("data_profile", JSON)
     data_quality_issues = Column(JSON)  # Detected issues
     created_at = Column(DateTime, default=datetime.utcnow)
     
     project = relationship("Project", back_populates="data_sources")
+    dataset = relationship("Dataset", back_populates="data_sources")
     transformations = relationship("DataTransformation", back_populates="data_source")
+    
+    @property
+    def raw_data(self):
+        return self.dataset.raw_data if self.dataset else self._raw_data
+    
+    @raw_data.setter
+    def raw_data(self, value):
+        self._raw_data = value
+    
+    @property
+    def data_preview(self):
+        return self.dataset.data_preview if self.dataset else self._data_preview
+    
+    @data_preview.setter
+    def data_preview(self, value):
+        self._data_preview = value
+    
+    @property
+    def data_profile(self):
+        return self.dataset.data_profile if self.dataset else self._data_profile
+    
+    @data_profile.setter
+    def data_profile(self, value):
+        self._data_profile = value
+
+class DataSourceSync(Base):
+    __tablename__ = "data_source_syncs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    data_source_id = Column(Integer, ForeignKey("data_sources.id"), unique=True, index=True)
+    state = Column(JSON)  # Change detection: content digest and size, S3 ETag or SQL watermark
+    interval_seconds = Column(Integer, nullable=True)  # Scheduled re-sync period; None = manual refresh only
+    next_run_at = Column(DateTime, nullable=True, index=True)
+    last_checked_at = Column(DateTime)
+    last_changed_at = Column(DateTime)
+    last_status = Column(String)  # unchanged, appended, replaced, failed
+    last_error = Column(Text)
 
 class DataTransformation(Base):
     __tablename__ = "data_transformations"
     
     id = Column(Integer, primary_key=True, index=True)
     data_source_id = Column(Integer, ForeignKey("data_sources.id"))
-    transformation_type = Column(String)  # clean, join, filter, aggregate, etc.
+    parent_id = Column(Integer, ForeignKey("data_transformations.id"), nullable=True)  # None = reads the source dataset
+    transformation_type = Column(String)  # clean, join, filter, select, aggregate, sort
     transformation_config = Column(JSON)  # Configuration for the transformation
     applied_at = Column(DateTime, default=datetime.utcnow)
+    materialized_dataset_id = Column(Integer, ForeignKey("datasets.id"), nullable=True)
     
     data_source = relationship("DataSource", back_populates="transformations")
+    parent = relationship("DataTransformation", remote_side=[id])
 
 class Analysis(Base):
     __tablename__ = "analyses"
@@ -86,15 +144,45 @@ class Story(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     project = relationship("Project", back_populates="stories")
+    exports = relationship("StoryExport", back_populates="story", cascade="all, delete-orphan")
+
+class StoryExport(Base):
+    __tablename__ = "story_exports"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    story_id = Column(Integer, ForeignKey("stories.id"), index=True)
+    format = Column(String)  # html, pdf
+    status = Column(String)  # pending, running, done, failed
+    content_hash = Column(String)  # Hash of the rendered inputs; served as the ETag
+    file_path = Column(String)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+    
+    story = relationship("Story", back_populates="exports")
 
 class AIConversation(Base):
     __tablename__ = "ai_conversations"
+    # Recent-history lookups filter by project and type, newest first
+    __table_args__ = (
+        Index("ix_ai_conversations_project_type_created", "project_id", "message_type", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
-    message_type = Column(String)  # user_query, ai_response, insight, suggestion
+    message_type = Column(String)  # user_query, ai_response, summary, insight, suggestion
     content = Column(Text)
     conversation_metadata = Column(JSON)  # Additional context
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    project = relationship("Project")
\ No newline at end of file
+    project = relationship("Project")
+
+class CoalescedRequest(Base):
+    __tablename__ = "coalesced_requests"
+    
+    key = Column(String, primary_key=True)  # sha256 of data fingerprint + request config
+    status = Column(String)  # pending, done, failed
+    result = Column(JSON)
+    owner = Column(String)  # host:pid of the worker computing it
+    hits = Column(Integer, default=0)  # Requests from other workers served by this computation
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+import models
+from ai_assistant import ai_assistant
+from approximate import sample_store
+from dataset_store import dataset_store
+from lazy_imports import lazy_import
+from metrics import span
+
+pd = lazy_import('pandas')
+
+COMBINE_MODES = {'separate', 'join', 'union'}
+MIN_KEY_UNIQUENESS = 0.9
+
+class MultiSourceAnalyzer:
+    """Loads several data sources concurrently and analyzes them separately or combined"""
+
+    async def load(self, data_sources: List[models.DataSource]) -> Dict[int, pd.DataFrame]:
+        """Stored columnar data for each source, read in parallel threads"""
+        with span('load', sources=len(data_sources)):
+            frames = await asyncio.gather(*(asyncio.to_thread(self._load_one, source) for source in data_sources))
+        return {source.id: frame for source, frame in zip(data_sources, frames)}
+
+    def _load_one(self, data_source: models.DataSource) -> pd.DataFrame:
+        frame = dataset_store.load_frame(data_source.dataset) if data_source.dataset else None
+        if frame is None:
+            # Sources created before shared storage only carry their preview rows
+            preview = data_source.data_preview or {}
+            frame = pd.DataFrame(preview.get('sample_data', []))
+        return frame
+
+    def combine(self, data_sources: List[models.DataSource], frames: Dict[int, pd.DataFrame], how: str) -> pd.DataFrame:
+        if how == 'union':
+            return pd.concat(
+                [frames[source.id].assign(_data_source=source.name) for source in data_sources],
+                ignore_index=True
+            )
+
+        combined, combined_source = frames[data_sources[0].id], data_sources[0]
+        for source in data_sources[1:]:
+            right = frames[source.id]
+            keys = self.infer_join_keys(combined_source, source, combined, right)
+            if not keys:
+                raise ValueError(f"No join key found between '{combined_source.name}' and '{source.name}'")
+            # pandas merge builds a hash table on the join keys
+            combined = combined.merge(right, how='inner', on=keys, suffixes=('', f'_{source.id}'))
+            combined_source = source
+        return combined
+
+    def infer_join_keys(self, left_source, right_source, left: pd.DataFrame, right: pd.DataFrame) -> List[str]:
+        """Pick the shared column that looks most like a key, using the stored profiles first"""
+        left_dtypes = (left_source.data_preview or {}).get('dtypes') or left.dtypes.astype(str).to_dict()
+        right_dtypes = (right_source.data_preview or {}).get('dtypes') or right.dtypes.astype(str).to_dict()
+        candidates = []
+        for column in set(left.columns) & set(right.columns):
+            if _dtype_family(left_dtypes.get(column)) != _dtype_family(right_dtypes.get(column)):
+                continue
+            name = str(column).lower()
+            name_score = 2 if name == 'id' or name.endswith('_id') else (1 if 'key' in name or 'code' in name else 0)
+            uniqueness = max(_uniqueness(left[column]), _uniqueness(right[column]))
+            if uniqueness < MIN_KEY_UNIQUENESS and name_score == 0:
+                continue
+            candidates.append((name_score, uniqueness, column))
+        if not candidates:
+            return []
+        candidates.sort(reverse=True)
+        return [candidates[0][2]]
+
+    async def analyze(
+        self,
+        data_sources: List[models.DataSource],
+        how: str = 'separate',
+        approximate: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[int, pd.DataFrame]]:
+        """Run the insight generators per source in parallel, or once over the combined frame.
+
+        With `approximate` settings, separately analyzed sources run on their
+        smallest stored sample meeting the targets and their insights carry
+        confidence intervals. Combined frames are always exact, since joins
+        of samples do not estimate the join of the data.
+        """
+        separate = how == 'separate' or len(data_sources) == 1
+        samples = {}
+        if approximate and separate:
+            found = await asyncio.gather(*(sample_store.sample_for(source.dataset, approximate) for source in data_sources))
+            samples = {source.id: sample for source, sample in zip(data_sources, found) if sample is not None}
+        frames = await self.load([source for source in data_sources if source.id not in samples])
+        frames.update({source_id: sample.frame for source_id, sample in samples.items()})
+
+        if separate:
+            results = await asyncio.gather(*(
+                ai_assistant.analyze_sample(samples[source.id]) if source.id in samples
+                else ai_assistant.analyze_data(frames[source.id])
+                for source in data_sources
+            ))
+            insights = []
+            for source, source_insights in zip(data_sources, results):
+                for insight in source_insights:
+                    insight['data_source_id'] = source.id
+                    insight['data_source'] = source.name
+                insights.extend(source_insights)
+            insights.sort(key=lambda x: (x['confidence'], x['actionable']), reverse=True)
+            return insights, frames
+
+        with span('combine', how=how):
+            combined = await asyncio.to_thread(self.combine, data_sources, frames, how)
+        return await ai_assistant.analyze_data(combined), frames
+
+    async def question_frame(self, data_sources: List[models.DataSource], how: Optional[str] = None) -> pd.DataFrame:
+        """Single frame to answer a question over: one source, or a join (falling back to a union)"""
+        frames = await self.load(data_sources)
+        if len(data_sources) == 1:
+            return frames[data_sources[0].id]
+        if how in (None, 'join'):
+            try:
+                return await asyncio.to_thread(self.combine, data_sources, frames, 'join')
+            except ValueError:
+                if how == 'join':
+                    raise
+        return await asyncio.to_thread(self.combine, data_sources, frames, 'union')
+
+def _dtype_family(dtype: Optional[str]) -> str:
+    dtype = (dtype or '').lower()
+    if 'int' in dtype or 'float' in dtype:
+        return 'numeric'
+    if 'datetime' in dtype:
+        return 'datetime'
+    return 'text'
+
+def _uniqueness(series: pd.Series) -> float:
+    non_null = series.dropna()
+    return non_null.nunique() / len(non_null) if len(non_null) else 0.0
+
+multi_source_analyzer = MultiSourceAnalyzer()
@@ -0,0 +1,376 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session
+import models
+from dataset_store import dataset_store
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+TRANSFORMATION_TYPES = {'filter', 'select', 'clean', 'join', 'aggregate', 'sort'}
+FILTER_OPERATORS = {'==', '!=', '>', '>=', '<', '<=', 'in', 'not in', 'isnull', 'notnull', 'contains'}
+# Operators pyarrow can evaluate while reading Parquet
+PUSHDOWN_OPERATORS = {'==', '!=', '>', '>=', '<', '<=', 'in', 'not in'}
+FUSABLE_TYPES = {'filter', 'select'}
+DEFAULT_SAMPLE_ROWS = 1000
+# Step results on disk; least recently used ones are dropped beyond this
+PIPELINE_CACHE_BYTES = int(os.getenv("PIPELINE_CACHE_MB", 1024)) * 1024 * 1024
+
+class PipelineEngine:
+    """Lazy evaluation of a data source's transformation DAG.
+
+    Each DataTransformation points at its parent step (or at the source dataset),
+    so a step's lineage is the chain back to the root. Evaluating a step:
+
+      1. keys every step by hash(parent key, type, config); the root key is the
+         dataset fingerprint, so editing step N changes the keys of N and below
+      2. restarts from the deepest step whose result is already cached
+      3. fuses runs of filter/select steps into a single mask + projection, and
+         pushes leading filters and the needed columns into the Parquet read
+      4. caches each group's output under its key, evicting the least recently
+         used results once the cache outgrows PIPELINE_CACHE_BYTES
+    """
+
+    def __init__(self, store=dataset_store):
+        self.store = store
+
+    @property
+    def cache_dir(self) -> str:
+        return os.path.join(self.store.root, 'pipeline_cache')
+
+    def validate(self, transformation_type: str, config: Dict[str, Any]):
+        if transformation_type not in TRANSFORMATION_TYPES:
+            raise ValueError(f"Unsupported transformation type: {transformation_type}")
+        if transformation_type == 'filter':
+            validate_conditions(config.get('conditions', []))
+        elif transformation_type == 'select' and not config.get('columns'):
+            raise ValueError("select requires columns")
+        elif transformation_type == 'join' and not config.get('right_data_source_id'):
+            raise ValueError("join requires right_data_source_id")
+        elif transformation_type == 'aggregate' and not config.get('aggregations'):
+            raise ValueError("aggregate requires aggregations")
+        elif transformation_type == 'sort' and not config.get('by'):
+            raise ValueError("sort requires by")
+
+    def lineage(self, step: models.DataTransformation) -> List[models.DataTransformation]:
+        """Steps from the root down to (and including) `step`"""
+        chain, seen = [], set()
+        while step is not None:
+            if step.id in seen:
+                raise ValueError("Transformation graph contains a cycle")
+            seen.add(step.id)
+            chain.append(step)
+            step = step.parent
+        return list(reversed(chain))
+
+    def step_keys(self, db: Session, root_fingerprint: str, steps: List[models.DataTransformation]) -> List[str]:
+        keys, key = [], root_fingerprint
+        for step in steps:
+            material = {'parent': key, 'type': step.transformation_type, 'config': step.transformation_config}
+            if step.transformation_type == 'join':
+                material['right'] = self._right_dataset(db, step).fingerprint
+            key = hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+            keys.append(key)
+        return keys
+
+    def evaluate(self, db: Session, step: models.DataTransformation, sample_rows: Optional[int] = None) -> Tuple[pd.DataFrame, str]:
+        """Result of `step` (on the first `sample_rows` source rows if given) and its cache key"""
+        dataset = step.data_source.dataset
+        if dataset is None or not dataset.storage_path:
+            raise ValueError("Data source has no stored tabular dataset")
+
+        steps = self.lineage(step)
+        keys = self.step_keys(db, dataset.fingerprint, steps)
+
+        start, frame = 0, None
+        if sample_rows is None:
+            for index in range(len(steps) - 1, -1, -1):
+                cached = self._cache_path(keys[index])
+                try:
+                    frame, start = pd.read_parquet(cached), index + 1
+                    # Recently read results are the last to be evicted
+                    os.utime(cached)
+                except FileNotFoundError:
+                    continue
+                break
+
+        groups = self._fuse(list(zip(steps[start:], keys[start:])))
+        if frame is None:
+            frame, groups = self._read_root(dataset, steps, groups, sample_rows)
+
+        for group in groups:
+            frame = self._apply_group(db, group, frame, sample_rows)
+            if sample_rows is None:
+                self.store.write_parquet(self._cache_path(group['key']), frame)
+        if groups and sample_rows is None:
+            self.evict()
+
+        return frame, keys[-1]
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.parquet")
+
+    def evict(self, max_bytes: Optional[int] = None):
+        """Drop least recently used step results until the cache fits `max_bytes`"""
+        max_bytes = PIPELINE_CACHE_BYTES if max_bytes is None else max_bytes
+        entries = []
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                # Skips temp files of writes still in progress
+                if not name.endswith('.parquet'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _fuse(self, keyed_steps) -> List[Dict[str, Any]]:
+        """Collapse consecutive filter/select steps into one scan group.
+
+        A scan filters before it projects, so a filter only joins a group whose
+        selected columns include every column it tests. Consecutive selects
+        keep the columns both of them select.
+        """
+        groups = []
+        for step, key in keyed_steps:
+            config = step.transformation_config or {}
+            kind = step.transformation_type
+            if kind not in FUSABLE_TYPES:
+                groups.append({'type': kind, 'config': config, 'step': step, 'key': key})
+                continue
+
+            group = groups[-1] if groups and groups[-1]['type'] == 'scan' else None
+            if group is not None and kind == 'filter' and group['columns'] is not None:
+                tested = {condition['column'] for condition in config.get('conditions', [])}
+                if not tested <= set(group['columns']):
+                    group = None
+            if group is None:
+                group = {'type': 'scan', 'conditions': [], 'columns': None}
+                groups.append(group)
+
+            if kind == 'filter':
+                group['conditions'].extend(config.get('conditions', []))
+            elif group['columns'] is None:
+                group['columns'] = list(config['columns'])
+            else:
+                group['columns'] = [column for column in config['columns'] if column in group['columns']]
+            group['key'] = key
+        return groups
+
+    def _read_root(self, dataset, steps, groups, sample_rows):
+        """Read the source dataset, pushing leading filters and needed columns into Parquet"""
+        import pyarrow.parquet as pq
+
+        available = pq.read_schema(dataset.storage_path).names
+        needed = self._required_columns(steps)
+        columns = [c for c in available if c in needed] if needed is not None else None
+
+        if sample_rows is not None:
+            batches = pq.ParquetFile(dataset.storage_path).iter_batches(batch_size=sample_rows, columns=columns)
+            first = next(batches, None)
+            frame = first.to_pandas() if first is not None else pd.DataFrame(columns=columns or available)
+            return frame, groups
+
+        pushed = []
+        if groups and groups[0]['type'] == 'scan':
+            pushed = [c for c in groups[0]['conditions'] if c['op'] in PUSHDOWN_OPERATORS and c['column'] in available]
+        filters = _pushdown_expression(pushed) if pushed else None
+        try:
+            frame = pd.read_parquet(dataset.storage_path, columns=columns, filters=filters)
+        except (TypeError, ValueError, NotImplementedError):
+            # Literal not comparable in Arrow (e.g. a date string against a timestamp); filter in pandas
+            frame, pushed = pd.read_parquet(dataset.storage_path, columns=columns), []
+
+        if pushed:
+            first = dict(groups[0])
+            first['conditions'] = [c for c in groups[0]['conditions'] if c not in pushed]
+            groups = [first] + groups[1:]
+        return frame, groups
+
+    def _required_columns(self, steps) -> Optional[set]:
+        """Columns the pipeline reads from the root, or None when it needs all of them"""
+        needed = None
+        for step in reversed(steps):
+            config = step.transformation_config or {}
+            kind = step.transformation_type
+            if kind == 'select':
+                needed = set(config['columns'])
+            elif kind == 'aggregate':
+                aggregations = config['aggregations']
+                # Functions given without columns (e.g. ['sum']) apply to every column
+                needed = set(_as_list(config.get('group_by', []))) | set(aggregations) if isinstance(aggregations, dict) else None
+            elif needed is None:
+                continue
+            elif kind == 'filter':
+                needed |= {c['column'] for c in config.get('conditions', [])}
+            elif kind == 'sort':
+                needed |= set(_as_list(config['by']))
+            elif kind == 'join':
+                needed |= set(_as_list(config.get('left_on') or config.get('on') or []))
+            elif kind == 'clean':
+                # Renames and whole-row dedup/dropna depend on every column
+                if config.get('rename') or config.get('drop_duplicates') is True or config.get('drop_na') is True:
+                    needed = None
+                    continue
+                needed |= set(_as_list(config.get('drop_duplicates') or []))
+                needed |= set(_as_list(config.get('drop_na') or []))
+                needed |= set(config.get('fill_na') or {}) | set(config.get('cast') or {})
+        return needed
+
+    def _apply_group(self, db: Session, group: Dict[str, Any], frame: pd.DataFrame, sample_rows: Optional[int]) -> pd.DataFrame:
+        kind = group['type']
+        if kind == 'scan':
+            if group['conditions']:
+                frame = frame[filter_mask(frame, group['conditions'])]
+            if group['columns'] is not None:
+                frame = frame[group['columns']]
+            return frame.reset_index(drop=True)
+
+        config = group['config']
+        if kind == 'clean':
+            return _apply_clean(frame, config)
+        if kind == 'sort':
+            return frame.sort_values(config['by'], ascending=config.get('ascending', True)).reset_index(drop=True)
+        if kind == 'aggregate':
+            group_by = _as_list(config.get('group_by', []))
+            if not group_by:
+                return _flatten_columns(_aggregate_all(frame, config['aggregations']))
+            return _flatten_columns(frame.groupby(group_by, dropna=False, observed=True).agg(config['aggregations']).reset_index())
+        if kind == 'join':
+            right = self._load_right(db, group['step'], sample_rows)
+            join_keys = {'on': config['on']} if config.get('on') else {'left_on': config['left_on'], 'right_on': config['right_on']}
+            return frame.merge(right, how=config.get('how', 'inner'), suffixes=('', '_right'), **join_keys)
+        raise ValueError(f"Unsupported transformation type: {kind}")
+
+    def _right_dataset(self, db: Session, step: models.DataTransformation) -> models.Dataset:
+        right = db.query(models.DataSource).filter(
+            models.DataSource.id == step.transformation_config['right_data_source_id'],
+            models.DataSource.project_id == step.data_source.project_id
+        ).first()
+        if right is None or right.dataset is None or not right.dataset.storage_path:
+            raise ValueError("Join target must be a tabular data source in the same project")
+        return right.dataset
+
+    def _load_right(self, db: Session, step: models.DataTransformation, sample_rows: Optional[int]) -> pd.DataFrame:
+        frame = self.store.load_frame(self._right_dataset(db, step))
+        return frame.head(sample_rows) if sample_rows is not None else frame
+
+def _as_list(value) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def _pushdown_expression(conditions: List[Dict[str, Any]]):
+    """Arrow expression for filter conditions, keeping rows the pandas mask keeps"""
+    import pyarrow.compute as pc
+
+    expression = None
+    for condition in conditions:
+        field, op, value = pc.field(condition['column']), condition['op'], condition.get('value')
+        if op == '==':
+            term = field == value
+        elif op == '!=':
+            # Nulls compare as null in Arrow but as "not equal" in pandas
+            term = (field != value) | field.is_null()
+        elif op == '>':
+            term = field > value
+        elif op == '>=':
+            term = field >= value
+        elif op == '<':
+            term = field < value
+        elif op == '<=':
+            term = field <= value
+        elif op == 'in':
+            term = field.isin(value)
+        else:
+            term = ~field.isin(value) | field.is_null()
+        expression = term if expression is None else expression & term
+    return expression
+
+def _aggregate_all(frame: pd.DataFrame, aggregations) -> pd.DataFrame:
+    """Aggregations over the whole frame as one row, with the columns a grouped aggregation would have"""
+    result = frame.agg(aggregations)
+    if isinstance(result, pd.Series):
+        return result.to_frame().T
+    # Lists of functions give a function x column table
+    if isinstance(aggregations, dict):
+        requested = {column: [getattr(f, '__name__', f) for f in _as_list(functions)] for column, functions in aggregations.items()}
+    else:
+        requested = {column: list(result.index) for column in result.columns}
+    pairs = [(column, function) for column, functions in requested.items() for function in functions]
+    return pd.DataFrame([[result.at[function, column] for column, function in pairs]], columns=pd.MultiIndex.from_tuples(pairs))
+
+def _flatten_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """('amount', 'sum') columns from list aggregations become 'amount_sum'"""
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = ['_'.join(str(part) for part in column if part != '') for column in frame.columns]
+    return frame
+
+def validate_conditions(conditions) -> List[Dict[str, Any]]:
+    """Filter conditions, each a {column, op, value} dict with a supported op; raises ValueError otherwise"""
+    if not isinstance(conditions, list):
+        raise ValueError("Filter conditions must be a list")
+    for condition in conditions:
+        if not isinstance(condition, dict) or condition.get('op') not in FILTER_OPERATORS or 'column' not in condition:
+            raise ValueError(f"Invalid filter condition: {condition}")
+    return conditions
+
+def filter_mask(frame: pd.DataFrame, conditions: List[Dict[str, Any]]):
+    """One boolean mask for all conditions, evaluated column-wise"""
+    mask = pd.Series(True, index=frame.index)
+    for condition in conditions:
+        column, op, value = frame[condition['column']], condition['op'], condition.get('value')
+        if op == '==':
+            mask &= column == value
+        elif op == '!=':
+            mask &= column != value
+        elif op == '>':
+            mask &= column > value
+        elif op == '>=':
+            mask &= column >= value
+        elif op == '<':
+            mask &= column < value
+        elif op == '<=':
+            mask &= column <= value
+        elif op == 'in':
+            mask &= column.isin(value)
+        elif op == 'not in':
+            mask &= ~column.isin(value)
+        elif op == 'isnull':
+            mask &= column.isna()
+        elif op == 'notnull':
+            mask &= column.notna()
+        elif op == 'contains':
+            mask &= column.astype(str).str.contains(str(value), regex=False, na=False)
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return mask.fillna(False).astype(bool)
+
+def _apply_clean(frame: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFrame:
+    if config.get('rename'):
+        frame = frame.rename(columns=config['rename'])
+    if config.get('fill_na'):
+        frame = frame.fillna(config['fill_na'])
+    if config.get('drop_na'):
+        subset = None if config['drop_na'] is True else _as_list(config['drop_na'])
+        frame = frame.dropna(subset=subset)
+    if config.get('drop_duplicates'):
+        subset = None if config['drop_duplicates'] is True else _as_list(config['drop_duplicates'])
+        frame = frame.drop_duplicates(subset=subset)
+    if config.get('cast'):
+        frame = frame.astype(config['cast'])
+    return frame.reset_index(drop=True)
+
+pipeline_engine = PipelineEngine()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import math
+import os
+from typing import Any, Dict
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+SKETCH_BATCH_ROWS = int(os.getenv("SKETCH_BATCH_ROWS", 100_000))
+
+def frame_sketches(frame: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Per-column count/null/min/max/sum summaries that merge exactly across row batches.
+
+    Numeric columns also keep the mean and M2 (sum of squared deviations from
+    the mean) of their finite values, which merge without the cancellation of
+    a sum of squares.
+    """
+    sketches = {}
+    for column in frame.columns:
+        series = frame[column]
+        nulls = int(series.isna().sum())
+        sketch: Dict[str, Any] = {'count': len(series) - nulls, 'nulls': nulls}
+        if pd.api.types.is_bool_dtype(series):
+            sketch['true'] = int(series.fillna(False).astype(bool).sum())
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.dropna().to_numpy(dtype='float64')
+            values = values[np.isfinite(values)]
+            if len(values):
+                mean = values.mean()
+                sketch.update({
+                    'min': float(values.min()),
+                    'max': float(values.max()),
+                    'sum': float(values.sum()),
+                    'finite': len(values),
+                    'mean': float(mean),
+                    'm2': float(np.square(values - mean).sum()),
+                })
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dropna()
+            if len(values):
+                sketch.update({'min': values.min().isoformat(), 'max': values.max().isoformat()})
+        sketches[str(column)] = _with_moments(sketch)
+    return sketches
+
+def merge_sketches(left: Dict[str, Dict[str, Any]], right: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    merged = {}
+    for column in list(left) + [column for column in right if column not in left]:
+        a, b = left.get(column), right.get(column)
+        if a is None or b is None:
+            merged[column] = dict(a or b)
+            continue
+        sketch = {'count': a['count'] + b['count'], 'nulls': a['nulls'] + b['nulls']}
+        for key in ('true', 'sum'):
+            if key in a or key in b:
+                sketch[key] = a.get(key, 0) + b.get(key, 0)
+        if 'm2' in a or 'm2' in b:
+            sketch.update(_merge_moments(a, b))
+        for key, pick in (('min', min), ('max', max)):
+            values = [value for value in (a.get(key), b.get(key)) if value is not None]
+            if values:
+                # Mixed kinds (a column that changed type) keep the newer value
+                sketch[key] = pick(values) if len({type(value) for value in values}) == 1 else values[-1]
+        merged[column] = _with_moments(sketch)
+    return merged
+
+def file_sketches(path: str, skip_rows: int = 0, batch_rows: int = SKETCH_BATCH_ROWS) -> Dict[str, Dict[str, Any]]:
+    """Sketches of a stored Parquet file past its first `skip_rows` rows, read one batch at a time"""
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    sketches: Dict[str, Dict[str, Any]] = {}
+    seen = 0
+    for index in range(parquet.num_row_groups):
+        rows = parquet.metadata.row_group(index).num_rows
+        if seen + rows <= skip_rows:
+            # Whole row groups before the offset are not even decoded
+            seen += rows
+            continue
+        for batch in parquet.iter_batches(batch_size=batch_rows, row_groups=[index]):
+            if seen + batch.num_rows > skip_rows:
+                batch = batch.slice(max(0, skip_rows - seen))
+                sketches = merge_sketches(sketches, frame_sketches(batch.to_pandas()))
+            seen += batch.num_rows
+    return sketches
+
+def _merge_moments(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Count, mean and M2 of two batches combined (Chan et al.'s parallel update)"""
+    if 'm2' not in a or 'm2' not in b:
+        return {key: (a if 'm2' in a else b)[key] for key in ('finite', 'mean', 'm2')}
+    count = a['finite'] + b['finite']
+    delta = b['mean'] - a['mean']
+    return {
+        'finite': count,
+        'mean': a['mean'] + delta * b['finite'] / count,
+        'm2': a['m2'] + b['m2'] + delta * delta * a['finite'] * b['finite'] / count,
+    }
+
+def _with_moments(sketch: Dict[str, Any]) -> Dict[str, Any]:
+    sketch.pop('std', None)
+    if 'm2' in sketch:
+        count = sketch['finite']
+        sketch['std'] = math.sqrt(sketch['m2'] / (count - 1)) if count > 1 else 0.0
+    return sketch
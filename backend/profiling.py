@@ -0,0 +1,241 @@
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+# Profile every Nth request automatically; 0 leaves only explicitly flagged requests
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", 0))
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5)) / 1000
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", 10))
+PROFILE_MAX_RUNS = int(os.getenv("PROFILE_MAX_RUNS", 50))
+PROFILE_MODES = {'sampling', 'cprofile'}
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 25
+# Leaf frames of threads that are parked rather than working (event loop select, idle pool workers)
+IDLE_FRAMES = {
+    ('selectors.py', 'select'), ('threading.py', 'wait'), ('queue.py', 'get'),
+    ('thread.py', '_worker'), ('connection.py', 'wait'), ('socket.py', 'accept'),
+}
+
+class StackSampler(threading.Thread):
+    """Samples every thread's stack at a fixed interval into collapsed ("folded") stacks.
+
+    Unlike cProfile this sees work handed to `asyncio.to_thread` and executors,
+    which is where pandas and sklearn run, at a cost paid only while sampling.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f'thread-{thread_id}'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+        """Leaf functions by share of samples"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{'function': name, 'samples': count, 'share': round(count / total, 4)} for name, count in leaves.most_common(limit)]
+
+class RequestProfiler:
+    """Opt-in CPU and memory profiles of single requests.
+
+    A request is profiled when an admin asks for it (`X-Profile: 1` header or
+    `?profile=1`; `cprofile` instead of `1` selects the deterministic profiler)
+    or when it is the Nth request under PROFILE_SAMPLE_EVERY. Both profilers
+    and tracemalloc are process-wide, so only one request is profiled at a
+    time and others arriving meanwhile run normally. Concurrent requests that
+    overlap a profiled one show up in its samples.
+
+    Each run directory under PROFILE_DIR holds:
+      run.json          request, timing, peak memory, top functions and allocation sites
+      stacks.folded     collapsed stacks for flamegraph.pl / speedscope (sampling mode)
+      profile.pstats    cProfile stats for snakeviz / pstats (cprofile mode)
+
+    When nothing asks for a profile the cost is a header lookup and a counter.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR, sample_every: int = PROFILE_SAMPLE_EVERY, max_runs: int = PROFILE_MAX_RUNS):
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        self.max_runs = max_runs
+        self._requests = 0
+        self._busy = threading.Lock()
+
+    def requested_mode(self, flag: Optional[str]) -> Optional[str]:
+        """Mode for an explicit flag value, or for the sampling schedule when there is none"""
+        if flag:
+            flag = flag.lower()
+            if flag in ('1', 'true'):
+                return 'sampling'
+            return flag if flag in PROFILE_MODES else None
+        if self.sample_every > 0:
+            self._requests += 1
+            if self._requests % self.sample_every == 0:
+                return 'sampling'
+        return None
+
+    async def profile(self, mode: str, request_info: Dict[str, Any], call_next):
+        """Run `call_next()` under the profilers; returns (response, run_id or None when busy)"""
+        if not self._busy.acquire(blocking=False):
+            return await call_next(), None
+        try:
+            run_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            tracing_memory = not tracemalloc.is_tracing()
+            if tracing_memory:
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            tracemalloc.reset_peak()
+            sampler, profiler = None, None
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                sampler = StackSampler()
+                sampler.start()
+
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await call_next()
+                status = response.status_code
+            finally:
+                elapsed = time.perf_counter() - started
+                if profiler is not None:
+                    profiler.disable()
+                if sampler is not None:
+                    sampler.stop()
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if tracing_memory:
+                    tracemalloc.stop()
+                await asyncio.to_thread(self._save, run_id, mode, {**request_info, 'status': status}, elapsed, peak, snapshot, sampler, profiler)
+            return response, run_id
+        finally:
+            self._busy.release()
+
+    def _save(self, run_id, mode, request_info, elapsed, peak, snapshot, sampler, profiler):
+        directory = os.path.join(self.output_dir, run_id)
+        os.makedirs(directory, exist_ok=True)
+
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+        allocations = [
+            {
+                'site': f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}",
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count,
+                'traceback': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            }
+            for stat in snapshot.statistics('traceback')[:TOP_ALLOCATIONS]
+        ]
+
+        files = []
+        if sampler is not None:
+            with open(os.path.join(directory, 'stacks.folded'), 'w') as f:
+                f.write(sampler.folded())
+            files.append('stacks.folded')
+            functions = sampler.top_functions()
+        else:
+            profiler.dump_stats(os.path.join(directory, 'profile.pstats'))
+            files.append('profile.pstats')
+            functions = _pstats_top(profiler)
+
+        run = {
+            'id': run_id,
+            'mode': mode,
+            'created_at': datetime.utcnow().isoformat(),
+            **request_info,
+            'duration_ms': round(elapsed * 1000, 2),
+            'peak_traced_memory_mb': round(peak / 1024 ** 2, 2),
+            'samples': sampler.samples if sampler is not None else None,
+            'files': files,
+            'top_functions': functions,
+            'top_allocations': allocations,
+        }
+        with open(os.path.join(directory, 'run.json'), 'w') as f:
+            json.dump(run, f, indent=2, default=str)
+        self._prune()
+
+    def _prune(self):
+        runs = sorted(os.listdir(self.output_dir))
+        for name in runs[:max(0, len(runs) - self.max_runs)]:
+            shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        """Newest first, without the bulky per-run detail"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        runs = []
+        for name in sorted(os.listdir(self.output_dir), reverse=True):
+            run = self.get_run(name)
+            if run:
+                runs.append({k: v for k, v in run.items() if k not in ('top_functions', 'top_allocations')})
+        return runs
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        path = self.file_path(run_id, 'run.json')
+        if path is None:
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def file_path(self, run_id: str, name: str) -> Optional[str]:
+        """Path of a stored file of a run; None for unknown runs/files (and anything outside PROFILE_DIR)"""
+        if os.path.basename(run_id) != run_id or name not in ('run.json', 'stacks.folded', 'profile.pstats'):
+            return None
+        path = os.path.join(self.output_dir, run_id, name)
+        return path if os.path.isfile(path) else None
+
+def _pstats_top(profiler: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'total_time_ms': round(total * 1000, 2),
+            'cumulative_time_ms': round(cumulative * 1000, 2),
+        }
+        for (filename, line, name), (_, calls, total, cumulative, _) in entries
+    ]
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,291 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+from typing import Dict, Any, List, Optional
+import httpx
+from lazy_imports import lazy_import
+
+try:
+    import ijson
+except ImportError:  # Falls back to buffering each page
+    ijson = None
+
+pd = lazy_import('pandas')
+
+MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", 20))
+DEFAULT_CONCURRENCY = 4
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGES = 1000
+DEFAULT_MAX_RETRIES = 3
+FRAME_BATCH_ROWS = 10_000
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """Shared connection-pooled client for all outbound API reads"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            follow_redirects=True
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+class RateLimiter:
+    """Spaces requests evenly so at most `rate` start per second"""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class PageResult:
+    def __init__(self, frames: List[pd.DataFrame], row_count: int, cursor=None, next_url: Optional[str] = None):
+        self.frames = frames
+        self.row_count = row_count
+        self.cursor = cursor
+        self.next_url = next_url
+
+class FrameBuilder:
+    """Accumulates streamed records into DataFrame batches of bounded size"""
+
+    def __init__(self):
+        self.frames = []
+        self.row_count = 0
+        self._batch = []
+
+    def add(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= FRAME_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            self.frames.append(pd.DataFrame(self._batch))
+            self.row_count += len(self._batch)
+            self._batch = []
+
+class RestReader:
+    """Reads a REST endpoint into a DataFrame with pluggable pagination.
+
+    Supported `pagination.type` values:
+      - cursor: follows `cursor_path` in the body, sent back as `cursor_param`
+      - offset: `offset_param`/`limit_param`, fetched in concurrent windows
+      - page: `page_param`/`size_param`, fetched in concurrent windows
+      - link: follows the RFC 5988 `Link: <...>; rel="next"` header
+    """
+
+    async def read(self, config: Dict[str, Any]):
+        client = get_client()
+        limiter = RateLimiter(config.get('rate_limit'))
+        pagination = config.get('pagination') or {}
+        pagination_type = pagination.get('type', 'none')
+
+        if config.get('format') != 'json':
+            response = await self._request(client, limiter, config, config['url'], config.get('params'))
+            return response.text
+
+        if pagination_type in ('offset', 'page'):
+            frames = await self._read_windowed(client, limiter, config, pagination)
+        elif pagination_type in ('cursor', 'link'):
+            frames = await self._read_sequential(client, limiter, config, pagination)
+        elif pagination_type == 'none':
+            page = await self._fetch_page(client, limiter, config, config['url'], config.get('params'))
+            frames = page.frames
+        else:
+            raise ValueError(f"Unsupported pagination type: {pagination_type}")
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    async def _read_windowed(self, client, limiter, config, pagination) -> List[pd.DataFrame]:
+        """Fetch numbered pages `concurrency` at a time until a short page is seen"""
+        concurrency = max(1, int(config.get('concurrency', DEFAULT_CONCURRENCY)))
+        page_size = int(pagination.get('page_size', DEFAULT_PAGE_SIZE))
+        max_pages = int(pagination.get('max_pages', DEFAULT_MAX_PAGES))
+        frames = []
+
+        for window_start in range(0, max_pages, concurrency):
+            window = range(window_start, min(window_start + concurrency, max_pages))
+            pages = await asyncio.gather(*(
+                self._fetch_page(client, limiter, config, config['url'], self._page_params(config, pagination, index, page_size))
+                for index in window
+            ))
+            for page in pages:
+                frames.extend(page.frames)
+                if page.row_count < page_size:
+                    return frames
+        return frames
+
+    def _page_params(self, config, pagination, index: int, page_size: int) -> Dict[str, Any]:
+        params = dict(config.get('params') or {})
+        if pagination['type'] == 'offset':
+            params[pagination.get('offset_param', 'offset')] = index * page_size
+            params[pagination.get('limit_param', 'limit')] = page_size
+        else:
+            params[pagination.get('page_param', 'page')] = int(pagination.get('start_page', 1)) + index
+            params[pagination.get('size_param', 'per_page')] = page_size
+        return params
+
+    async def _read_sequential(self, client, limiter, config, pagination) -> List[pd.DataFrame]:
+        """Follow cursors or Link headers; each page depends on the previous one"""
+        max_pages = int(pagination.get('max_pages', DEFAULT_MAX_PAGES))
+        url = config['url']
+        params = dict(config.get('params') or {})
+        frames = []
+
+        for _ in range(max_pages):
+            page = await self._fetch_page(client, limiter, config, url, params, cursor_path=pagination.get('cursor_path'))
+            frames.extend(page.frames)
+            if page.row_count == 0:
+                break
+            if pagination['type'] == 'cursor':
+                if page.cursor in (None, ''):
+                    break
+                params[pagination.get('cursor_param', 'cursor')] = page.cursor
+            else:
+                if not page.next_url:
+                    break
+                # The next link already carries its own query string
+                url, params = page.next_url, None
+        return frames
+
+    async def _request(self, client, limiter, config, url, params) -> httpx.Response:
+        """Buffered GET with rate limiting and retry"""
+        async with self._stream(client, limiter, config, url, params) as response:
+            await response.aread()
+            return response
+
+    def _stream(self, client, limiter, config, url, params):
+        return _RetryingStream(client, limiter, config, url, params)
+
+    async def _fetch_page(self, client, limiter, config, url, params, cursor_path: Optional[str] = None) -> PageResult:
+        records_path = config.get('records_path')
+        async with self._stream(client, limiter, config, url, params) as response:
+            next_url = response.links.get('next', {}).get('url')
+            if ijson is None:
+                body = json.loads(await response.aread())
+                return self._page_from_document(body, records_path, cursor_path, next_url)
+
+            chunks = response.aiter_bytes()
+            first = b''
+            async for chunk in chunks:
+                first += chunk
+                if first.strip():
+                    break
+            if records_path is None and first.lstrip()[:1] != b'[':
+                # Non-array documents keep the old pd.DataFrame(response.json()) behaviour
+                async for chunk in chunks:
+                    first += chunk
+                return self._page_from_document(json.loads(first or b'null'), None, cursor_path, next_url)
+
+            builder = FrameBuilder()
+            cursor_values = []
+            records_prefix = f"{records_path}.item" if records_path else 'item'
+            parsers = [ijson.items_coro(_Sink(builder.add), records_prefix, use_float=True)]
+            if cursor_path:
+                parsers.append(ijson.items_coro(_Sink(cursor_values.append), cursor_path, use_float=True))
+
+            for parser in parsers:
+                parser.send(first)
+            async for chunk in chunks:
+                for parser in parsers:
+                    parser.send(chunk)
+            for parser in parsers:
+                parser.close()
+            builder.flush()
+
+        return PageResult(builder.frames, builder.row_count, cursor_values[0] if cursor_values else None, next_url)
+
+    def _page_from_document(self, body, records_path, cursor_path, next_url) -> PageResult:
+        records = _resolve_path(body, records_path) if records_path else body
+        cursor = _resolve_path(body, cursor_path) if cursor_path else None
+        if records is None:
+            return PageResult([], 0, cursor, next_url)
+        frame = pd.DataFrame(records)
+        return PageResult([frame], len(frame), cursor, next_url)
+
+class _Sink:
+    """ijson push target that forwards each parsed item to a callback"""
+
+    def __init__(self, callback):
+        self.send = callback
+
+class _RetryingStream:
+    """Async context manager for a streamed GET that retries transient failures"""
+
+    def __init__(self, client, limiter, config, url, params):
+        self.client = client
+        self.limiter = limiter
+        self.config = config
+        self.url = url
+        self.params = params
+        self._context = None
+
+    async def __aenter__(self) -> httpx.Response:
+        max_retries = int(self.config.get('max_retries', DEFAULT_MAX_RETRIES))
+        for attempt in range(max_retries + 1):
+            await self.limiter.acquire()
+            context = self.client.stream('GET', self.url, params=self.params, headers=self.config.get('headers', {}))
+            try:
+                response = await context.__aenter__()
+            except httpx.TransportError:
+                if attempt == max_retries:
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                delay = _retry_after(response) or _backoff(attempt)
+                await context.__aexit__(None, None, None)
+                await asyncio.sleep(delay)
+                continue
+
+            if response.is_error:
+                await response.aread()
+                await context.__aexit__(None, None, None)
+                response.raise_for_status()
+
+            self._context = context
+            return response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._context.__aexit__(exc_type, exc, tb)
+
+def _backoff(attempt: int) -> float:
+    return min(0.5 * 2 ** attempt, 30.0)
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def _resolve_path(document, path: str):
+    for part in path.split('.'):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+rest_reader = RestReader()
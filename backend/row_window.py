@@ -0,0 +1,164 @@
+from __future__ import annotations
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import models
+from dataset_store import dataset_store
+from lazy_imports import lazy_import
+from pipeline import filter_mask, validate_conditions
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+MAX_PAGE_ROWS = 10_000
+TABLE_CACHE_SIZE = int(os.getenv("ROW_WINDOW_TABLE_CACHE_SIZE", 4))
+ORDER_CACHE_SIZE = int(os.getenv("ROW_WINDOW_ORDER_CACHE_SIZE", 32))
+
+class RowWindowService:
+    """Row windows over stored datasets for the data grid.
+
+    Datasets are immutable Parquet files, so the service keeps a few
+    memory-mapped Arrow tables open and persists one sort index (a row
+    permutation) per column and direction next to them. A page is then a
+    slice of the permutation followed by `take`, independent of dataset size.
+    Filtered orderings are cached in memory so paging through them is cheap.
+    """
+
+    def __init__(self, store=dataset_store):
+        self.store = store
+        self._tables = OrderedDict()
+        self._orders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def table(self, dataset: models.Dataset):
+        import pyarrow.parquet as pq
+
+        with self._lock:
+            if dataset.fingerprint in self._tables:
+                self._tables.move_to_end(dataset.fingerprint)
+                return self._tables[dataset.fingerprint]
+        table = pq.read_table(dataset.storage_path, memory_map=True)
+        with self._lock:
+            self._tables[dataset.fingerprint] = table
+            while len(self._tables) > TABLE_CACHE_SIZE:
+                self._tables.popitem(last=False)
+        return table
+
+    def sort_index(self, dataset: models.Dataset, column: str, descending: bool = False) -> np.ndarray:
+        """Row permutation sorting `column` (nulls last), built once and kept on disk"""
+        import pyarrow.compute as pc
+
+        column_hash = hashlib.sha1(column.encode('utf-8')).hexdigest()
+        direction = 'desc' if descending else 'asc'
+        path = os.path.join(self.store.root, 'sort_indexes', dataset.fingerprint, f"{column_hash}.{direction}.npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode='r')
+
+        table = self.table(dataset)
+        order = pc.sort_indices(
+            table.select([column]),
+            sort_keys=[(column, 'descending' if descending else 'ascending')],
+            null_placement='at_end'
+        ).to_numpy()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        np.save(temp_path, order)
+        os.replace(temp_path, path)
+        return order
+
+    def ordering(self, dataset: models.Dataset, sort: Optional[str], conditions: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Row ids in display order after filtering, or None for the natural order"""
+        if not sort and not conditions:
+            return None
+
+        cache_key = (dataset.fingerprint, sort, json.dumps(conditions, sort_keys=True, default=str))
+        with self._lock:
+            if cache_key in self._orders:
+                self._orders.move_to_end(cache_key)
+                return self._orders[cache_key]
+
+        order = None
+        if sort:
+            order = self.sort_index(dataset, sort.lstrip('-'), descending=sort.startswith('-'))
+        if conditions:
+            filter_columns = sorted({condition['column'] for condition in conditions})
+            frame = self.table(dataset).select(filter_columns).to_pandas()
+            mask = filter_mask(frame, conditions).to_numpy()
+            order = np.flatnonzero(mask) if order is None else order[mask[order]]
+
+        with self._lock:
+            self._orders[cache_key] = order
+            while len(self._orders) > ORDER_CACHE_SIZE:
+                self._orders.popitem(last=False)
+        return order
+
+    def window(
+        self,
+        dataset: models.Dataset,
+        offset: int,
+        limit: int,
+        columns: Optional[List[str]] = None,
+        sort: Optional[str] = None,
+        conditions: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[Any, int]:
+        """(Arrow table holding the requested rows and columns, total matching rows)"""
+        import pyarrow as pa
+
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        conditions = validate_conditions(conditions or [])
+        table = self.table(dataset)
+        referenced = list(columns or []) + [c['column'] for c in conditions] + ([sort.lstrip('-')] if sort else [])
+        unknown = [column for column in referenced if column not in table.column_names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {unknown}")
+
+        limit = max(0, min(limit, MAX_PAGE_ROWS))
+        projected = table.select(columns) if columns else table
+        order = self.ordering(dataset, sort, conditions)
+        if order is None:
+            return projected.slice(offset, limit), table.num_rows
+        return projected.take(pa.array(order[offset:offset + limit])), len(order)
+
+def encode_cursor(fingerprint: str, sort: Optional[str], conditions, position: int) -> str:
+    """Opaque cursor for the page starting at `position`.
+
+    It is an offset, not a keyset: datasets are immutable, so a position in a
+    given ordering always names the same row.
+    """
+    state = {'fp': fingerprint, 'sort': sort, 'filter': conditions, 'pos': position}
+    return base64.urlsafe_b64encode(json.dumps(state, default=str).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, fingerprint: str, sort: Optional[str], conditions) -> int:
+    """Position encoded in a cursor; the cursor is bound to the dataset and ordering"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    if state.get('fp') != fingerprint or state.get('sort') != sort or state.get('filter') != conditions:
+        raise ValueError("Cursor does not match this dataset, sort or filter")
+    position = state.get('pos')
+    if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+        raise ValueError("Invalid cursor")
+    return position
+
+def to_columnar_json(page) -> Dict[str, List[Any]]:
+    """Column-oriented JSON-safe values for one page"""
+    frame = page.to_pandas()
+    return {str(column): json.loads(frame[column].to_json(orient='values', date_format='iso')) for column in frame.columns}
+
+def to_arrow_ipc(page) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, page.schema) as writer:
+        writer.write_table(page)
+    return sink.getvalue().to_pybytes()
+
+row_window_service = RowWindowService()
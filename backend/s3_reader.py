@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", "./s3_cache")
+RANGED_GET_THRESHOLD = int(os.getenv("S3_RANGED_GET_THRESHOLD", 64 * 1024 * 1024))
+RANGE_PART_SIZE = int(os.getenv("S3_RANGE_PART_SIZE", 16 * 1024 * 1024))
+MAX_RANGE_WORKERS = int(os.getenv("S3_MAX_RANGE_WORKERS", 8))
+MAX_CONCURRENT_KEYS = int(os.getenv("S3_MAX_CONCURRENT_KEYS", 8))
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+class S3ObjectCache:
+    """On-disk cache of S3 objects, validated against the object's ETag"""
+
+    def __init__(self, cache_dir: str = S3_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _base_path(self, bucket: str, key: str) -> str:
+        digest = hashlib.sha256(f"{bucket}/{key}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def data_path(self, bucket: str, key: str) -> str:
+        return self._base_path(bucket, key) + '.data'
+
+    def lookup(self, bucket: str, key: str, etag: str) -> Optional[str]:
+        """Return the cached file for this object if its ETag still matches"""
+        base = self._base_path(bucket, key)
+        try:
+            with open(base + '.meta.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('etag') != etag or not os.path.exists(base + '.data'):
+            return None
+        return base + '.data'
+
+    def content_hash(self, bucket: str, key: str, path: str, hash_file) -> str:
+        """sha256 of a cached object, computed once per ETag and kept in its metadata"""
+        meta_path = self._base_path(bucket, key) + '.meta.json'
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if not meta.get('sha256'):
+            meta['sha256'] = hash_file(path)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + '.tmp', meta_path)
+        return meta['sha256']
+
+    def temp_path(self, bucket: str, key: str) -> str:
+        base = self._base_path(bucket, key)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        return f"{base}.{os.getpid()}.{threading.get_ident()}.part"
+
+    def commit(self, bucket: str, key: str, etag: str, size: int, temp_path: str) -> str:
+        """Atomically move a finished download into place and record its ETag"""
+        base = self._base_path(bucket, key)
+        os.replace(temp_path, base + '.data')
+        with open(base + '.meta.json.tmp', 'w') as f:
+            json.dump({'bucket': bucket, 'key': key, 'etag': etag, 'size': size}, f)
+        os.replace(base + '.meta.json.tmp', base + '.meta.json')
+        return base + '.data'
+
+class S3Reader:
+    """Fetches S3 objects through a shared client pool and a local ETag-validated cache.
+
+    Small objects are streamed to disk in chunks; objects above
+    RANGED_GET_THRESHOLD are fetched with parallel ranged GETs. All calls are
+    blocking and meant to be run via asyncio.to_thread.
+    """
+
+    def __init__(self, cache: Optional[S3ObjectCache] = None):
+        self.cache = cache or S3ObjectCache()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, config: Dict[str, Any]):
+        """Return a pooled boto3 client for these credentials (clients are thread-safe)"""
+        client_key = (
+            config.get('access_key'),
+            config.get('secret_key'),
+            config.get('region'),
+            config.get('endpoint_url'),
+        )
+        with self._lock:
+            if client_key not in self._clients:
+                import boto3
+                from botocore.config import Config
+                
+                self._clients[client_key] = boto3.client(
+                    's3',
+                    aws_access_key_id=config.get('access_key'),
+                    aws_secret_access_key=config.get('secret_key'),
+                    region_name=config.get('region'),
+                    endpoint_url=config.get('endpoint_url'),
+                    config=Config(max_pool_connections=max(MAX_RANGE_WORKERS, MAX_CONCURRENT_KEYS) * 2)
+                )
+            return self._clients[client_key]
+
+    def head(self, config: Dict[str, Any], bucket: str, key: str) -> Tuple[str, int]:
+        head = self.client(config).head_object(Bucket=bucket, Key=key)
+        return head['ETag'].strip('"'), head['ContentLength']
+
+    def fetch(self, config: Dict[str, Any], bucket: str, key: str) -> str:
+        """Return a local path holding the current contents of s3://bucket/key.
+
+        An unchanged object costs a single HEAD request.
+        """
+        etag, size = self.head(config, bucket, key)
+        cached = self.cache.lookup(bucket, key, etag)
+        if cached:
+            return cached
+
+        client = self.client(config)
+        temp_path = self.cache.temp_path(bucket, key)
+        try:
+            if size >= RANGED_GET_THRESHOLD:
+                self._ranged_download(client, bucket, key, etag, size, temp_path)
+            else:
+                self._streamed_download(client, bucket, key, etag, temp_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return self.cache.commit(bucket, key, etag, size, temp_path)
+
+    def _streamed_download(self, client, bucket: str, key: str, etag: str, temp_path: str):
+        obj = client.get_object(Bucket=bucket, Key=key, IfMatch=etag)
+        with open(temp_path, 'wb') as f:
+            for chunk in obj['Body'].iter_chunks(STREAM_CHUNK_SIZE):
+                f.write(chunk)
+
+    def _ranged_download(self, client, bucket: str, key: str, etag: str, size: int, temp_path: str):
+        with open(temp_path, 'wb') as f:
+            f.truncate(size)
+
+        def fetch_range(start: int):
+            end = min(start + RANGE_PART_SIZE, size) - 1
+            # IfMatch guarantees every part comes from the same object version
+            obj = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag)
+            with open(temp_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in obj['Body'].iter_chunks(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+
+        with ThreadPoolExecutor(max_workers=MAX_RANGE_WORKERS) as executor:
+            list(executor.map(fetch_range, range(0, size, RANGE_PART_SIZE)))
+
+    def list_keys(self, config: Dict[str, Any], bucket: str, prefix: str) -> List[str]:
+        paginator = self.client(config).get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            keys.extend(item['Key'] for item in page.get('Contents', []) if not item['Key'].endswith('/'))
+        return keys
+
+    async def fetch_many(self, config: Dict[str, Any], bucket: str, keys: List[str], load) -> List[Any]:
+        """Fetch keys concurrently and apply the blocking `load(path, key)` to each"""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_KEYS)
+
+        async def fetch_one(key: str):
+            async with semaphore:
+                path = await asyncio.to_thread(self.fetch, config, bucket, key)
+                return await asyncio.to_thread(load, path, key)
+
+        return await asyncio.gather(*(fetch_one(key) for key in keys))
+
+s3_reader = S3Reader()
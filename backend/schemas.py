@@ -56,6 +56,7 @@ class DataSourceCreate(DataSourceBase):
 class DataSource(DataSourceBase):
     id: int
     project_id: int
+    dataset_id: Optional[int] = None
     data_preview: Optional[Dict[str, Any]] = None
     data_profile: Optional[Dict[str, Any]] = None
     data_quality_issues: Optional[Dict[str, Any]] = None
@@ -64,16 +65,117 @@ class DataSource(DataSourceBase):
     class Config:
         from_attributes = True
 
+class DataSourceSummary(BaseModel):
+    id: int
+    project_id: int
+    dataset_id: Optional[int] = None
+    name: str
+    type: str
+    row_count: Optional[int] = None
+    column_count: Optional[int] = None
+    columns: List[str] = []
+    created_at: datetime
+
+# Refresh schemas
+class RefreshResult(BaseModel):
+    data_source_id: int
+    dataset_id: Optional[int] = None
+    status: str  # unchanged, appended, replaced
+    detection: str  # content_hash, etag, watermark, frame_hash
+    rows_added: Optional[int] = None
+    row_count: Optional[int] = None
+    analysis_id: Optional[int] = None  # Re-run of the source's latest analysis, if any
+    rerun_generators: List[str] = []
+    reused_generators: List[str] = []
+
+class RefreshScheduleUpdate(BaseModel):
+    interval_seconds: Optional[int] = None  # None turns scheduled re-sync off
+
+class RefreshSchedule(BaseModel):
+    data_source_id: int
+    interval_seconds: Optional[int] = None
+    next_run_at: Optional[datetime] = None
+    last_checked_at: Optional[datetime] = None
+    last_changed_at: Optional[datetime] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class RowWindow(BaseModel):
+    columns: List[str]
+    dtypes: Dict[str, str]
+    data: Dict[str, List[Any]]  # Column-oriented values
+    offset: int
+    row_count: int
+    total_rows: int
+    next_cursor: Optional[str] = None
+
+class ChartSpec(BaseModel):
+    kind: str  # histogram, heatmap, aggregate, timeseries
+    x: str
+    y: Optional[str] = None
+    agg: Optional[str] = None  # count, sum, mean, median, min, max
+    group_by: Optional[List[str]] = None
+    bins: Optional[int] = None
+    y_bins: Optional[int] = None
+    max_points: Optional[int] = None
+    limit: Optional[int] = None
+    filters: Optional[List[Dict[str, Any]]] = None
+
+class ChartData(BaseModel):
+    kind: str
+    spec: Dict[str, Any]
+    data: Dict[str, Any]
+    cached: bool
+
+# Transformation schemas
+class TransformationCreate(BaseModel):
+    transformation_type: str
+    transformation_config: Dict[str, Any]
+    parent_id: Optional[int] = None
+
+class TransformationUpdate(BaseModel):
+    transformation_config: Dict[str, Any]
+
+class DataTransformation(BaseModel):
+    id: int
+    data_source_id: int
+    parent_id: Optional[int] = None
+    transformation_type: str
+    transformation_config: Dict[str, Any]
+    applied_at: datetime
+    materialized_dataset_id: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
+class TransformationPreview(BaseModel):
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    sample_row_count: int
+
 # Analysis schemas
 class AnalysisConfig(BaseModel):
     name: str
     analysis_type: str = "eda"
-    parameters: Optional[Dict[str, Any]] = None
+    parameters: Optional[Dict[str, Any]] = None  # `approximate`: true or {max_error, max_latency_ms, confidence, refine}
+    data_source_ids: Optional[List[int]] = None  # Defaults to every source in the project
+    combine: str = "separate"  # separate, join or union
 
 class AnalysisResult(BaseModel):
     analysis_id: int
     insights: List[Dict[str, Any]]
     summary: str
+    refinement: Optional[Dict[str, Any]] = None  # Set when exact results of an approximate analysis follow in the background
+    timings: Optional[List[Dict[str, Any]]] = None  # Per-stage breakdown when requested with ?timings=1
+
+class AnalysisRefinement(BaseModel):
+    analysis_id: int
+    status: str  # none (exact already), pending, done, failed
+    refined_analysis_id: Optional[int] = None
+    error: Optional[str] = None  # Why the refinement failed
 
 class Analysis(BaseModel):
     id: int
@@ -91,12 +193,16 @@ class Analysis(BaseModel):
 # AI conversation schemas
 class Question(BaseModel):
     question: str
+    data_source_ids: Optional[List[int]] = None
+    combine: Optional[str] = None  # join (falls back to union when unset) or union
+    parameters: Optional[Dict[str, Any]] = None  # `approximate`, as for analyses
 
 class AIResponse(BaseModel):
     answer: str
     source: str
     confidence: float
     metadata: Optional[Dict[str, Any]] = None
+    timings: Optional[List[Dict[str, Any]]] = None
 
 # Storytelling schemas
 class StoryConfig(BaseModel):
@@ -109,12 +215,28 @@ class Story(BaseModel):
     project_id: int
     title: str
     narrative: str
-    components: Dict[str, Any]
+    components: List[Dict[str, Any]]
     export_formats: List[str]
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class StoryExportRequest(BaseModel):
+    formats: Optional[List[str]] = None  # Defaults to the story's export_formats
+
+class StoryExport(BaseModel):
+    id: int
+    story_id: int
+    format: str
+    status: str
+    content_hash: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Update forward references
 ProjectWithDetails.update_forward_refs()
\ No newline at end of file
@@ -0,0 +1,252 @@
+import base64
+import decimal
+import gzip
+import math
+import os
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+# Total size of cached analysis blobs kept in memory
+BLOB_CACHE_BYTES = int(os.getenv("RESPONSE_BLOB_CACHE_MB", 64)) * 1024 * 1024
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+# Level 4 output is within ~3% of level 6 on JSON payloads and cheaper to produce
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 4))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+# Already-compressed or binary payloads are passed through
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/vnd.apache.arrow', 'image/svg+xml')
+
+def _default(obj):
+    """Types orjson does not serialize natively: NumPy/pandas scalars and containers, Decimal, sets, bytes"""
+    numpy = sys.modules.get('numpy')
+    if numpy is not None:
+        if isinstance(obj, numpy.generic):
+            value = obj.item()
+            return None if isinstance(value, float) and not math.isfinite(value) else value
+        if isinstance(obj, numpy.ndarray):
+            return obj.tolist()
+    pandas = sys.modules.get('pandas')
+    if pandas is not None:
+        if obj is pandas.NaT or obj is pandas.NA:
+            return None
+        if isinstance(obj, pandas.Timestamp):
+            return obj.isoformat()
+        if isinstance(obj, pandas.Timedelta):
+            return str(obj)
+        if isinstance(obj, pandas.Period):
+            return str(obj)
+        if isinstance(obj, (pandas.Series, pandas.Index)):
+            return obj.tolist()
+        if isinstance(obj, pandas.DataFrame):
+            return obj.to_dict(orient='records')
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode('ascii')
+    if hasattr(obj, 'dict') and hasattr(obj, '__fields__'):
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj: Any) -> bytes:
+    """JSON bytes; NaN/inf become null"""
+    return orjson.dumps(obj, default=_default, option=DUMPS_OPTIONS)
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode('utf-8')
+
+def splice(head: Dict[str, Any], raw: Dict[str, bytes]) -> bytes:
+    """Serialize `head` and add already-serialized JSON values under the keys of `raw`"""
+    body = dumps(head)
+    extra = b','.join(dumps(key) + b':' + value for key, value in raw.items())
+    if not extra:
+        return body
+    return body[:-1] + (b',' if len(body) > 2 else b'') + extra + b'}'
+
+def raw_array(items: Iterable[bytes]) -> bytes:
+    return b'[' + b','.join(items) + b']'
+
+def orm_dict(obj, schema) -> Dict[str, Any]:
+    """The attributes of an ORM row that `schema` exposes, without validating them"""
+    fields = getattr(schema, 'model_fields', None) or schema.__fields__
+    return {name: getattr(obj, name) for name in fields}
+
+class FastJSONResponse(JSONResponse):
+    """orjson-rendered JSON; `content` may also be pre-serialized bytes"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+class BlobCache:
+    """Serialized JSON of immutable rows (analyses), LRU-bounded by total size"""
+
+    def __init__(self, max_bytes: int = BLOB_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._blobs: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build) -> bytes:
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is not None:
+                self._blobs.move_to_end(key)
+                self.hits += 1
+                return blob
+            self.misses += 1
+        blob = build()
+        self.put(key, blob)
+        return blob
+
+    def put(self, key, blob: bytes):
+        with self._lock:
+            previous = self._blobs.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            if len(blob) > self.max_bytes:
+                return
+            self._blobs[key] = blob
+            self._size += len(blob)
+            while self._size > self.max_bytes:
+                _, evicted = self._blobs.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': len(self._blobs), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """'br' when the client accepts it and brotli is installed, else 'gzip', else None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flush every chunk so streamed sections still reach the client as they are produced
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated from Accept-Encoding.
+
+    Small, binary (PDF, images, Parquet) and already-encoded responses pass
+    through untouched; streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message['type'] == 'http.response.start':
+                start_message = message
+                headers = Headers(raw=message['headers'])
+                content_type = headers.get('content-type', '')
+                passthrough = 'content-encoding' in headers or not content_type.startswith(COMPRESSIBLE_TYPES)
+                if passthrough:
+                    await send(message)
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if compressor is None and start_message is not None:
+                headers = MutableHeaders(raw=start_message['headers'])
+                if not more_body:
+                    # Whole body in one message
+                    if len(body) < self.minimum_size:
+                        await send(start_message)
+                        await send(message)
+                        start_message = None
+                        return
+                    body = compress(body, encoding)
+                    headers['Content-Encoding'] = encoding
+                    headers['Content-Length'] = str(len(body))
+                    headers.add_vary_header('Accept-Encoding')
+                    await send(start_message)
+                    await send({'type': 'http.response.body', 'body': body})
+                    start_message = None
+                    return
+                compressor = _StreamCompressor(encoding)
+                headers['Content-Encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                if 'content-length' in headers:
+                    del headers['Content-Length']
+                await send(start_message)
+                start_message = None
+
+            if compressor is None:
+                await send(message)
+                return
+            data = compressor.chunk(body)
+            if not more_body:
+                data += compressor.finish()
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+analysis_blobs = BlobCache()
@@ -0,0 +1,496 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session
+import models
+from ai_assistant import ai_assistant
+from approximate import sample_store
+from data_quality import quality_engine
+from data_connectors import data_connector
+from database import SessionLocal
+from dataset_store import dataset_store, hash_file, make_fingerprint, HASH_CHUNK_SIZE
+from dtype_optimizer import optimize_dtypes
+from json_reader import json_reader, schema_kinds, SpooledFrame
+from lazy_imports import lazy_import
+from metrics import span
+from profile_sketches import file_sketches, merge_sketches
+from s3_reader import s3_reader
+
+pd = lazy_import('pandas')
+
+SOURCE_SYNC_ENABLED = os.getenv("SOURCE_SYNC_ENABLED", "1") != "0"
+SOURCE_SYNC_POLL_SECONDS = int(os.getenv("SOURCE_SYNC_POLL_SECONDS", 30))
+MIN_SYNC_INTERVAL_SECONDS = int(os.getenv("MIN_SYNC_INTERVAL_SECONDS", 60))
+FILE_SOURCE_TYPES = ('csv', 'excel', 'json', 'pdf')
+SQL_SOURCE_TYPES = ('postgres', 'mysql')
+LIVE_SOURCE_TYPES = ('s3', 'api') + SQL_SOURCE_TYPES
+# How far back to look for the latest analysis that covered a source
+RECENT_ANALYSES = 50
+
+class Change:
+    """What a refresh found: `unchanged`, `appended` (with the new rows) or `replaced`"""
+
+    def __init__(self, status: str, detection: str, state: Dict[str, Any], dataset=None, delta=None, fingerprint=None):
+        self.status = status
+        self.detection = detection
+        self.state = state
+        self.dataset = dataset
+        self.delta = delta
+        self.fingerprint = fingerprint
+
+class SourceRefresher:
+    """Brings a data source up to date with its origin without redoing unchanged work.
+
+    Change detection, per source:
+      - files and uploads: sha256 and size of the content (`content_hash`)
+      - S3 objects: the ETag first, then the content hash (`etag`)
+      - SQL `query` with `incremental_column`: rows past the stored maximum (`watermark`)
+      - APIs, S3 prefixes and other queries: a hash of the fetched rows (`frame_hash`);
+        a SQL `table` without a query stores only its first rows, so it is
+        compared this way even with an `incremental_column`
+
+    When new content only extends the old (CSV and NDJSON files that grew at
+    the end, SQL rows past the watermark) just the appended rows are parsed,
+    merged into a new version of the dataset, and folded into the profile's
+    column sketches; the LLM first-contact profile is kept. Any other change
+    is ingested in full. The source's latest analysis is then re-run, reusing
+    every insight whose generator input is unchanged.
+
+    Sources with a fetchable location can also be re-synced on a schedule;
+    workers share the schedule through `data_source_syncs.next_run_at`.
+    """
+
+    def __init__(self):
+        self._locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._task: Optional[asyncio.Task] = None
+
+    async def ingest(self, db: Session, source_type: str, config: Dict[str, Any], content_digest: Optional[str] = None) -> models.Dataset:
+        """Stored dataset for a source, parsing and profiling it only when no identical one exists"""
+        # Identical content already parsed and profiled is shared, not re-ingested
+        fingerprint = await data_connector.fingerprint(source_type, config, content_digest)
+        dataset = dataset_store.find(db, fingerprint)
+        if dataset:
+            return dataset
+
+        result = await data_connector.connect(source_type, config)
+        if not result['success']:
+            raise ValueError(result['error'])
+
+        fingerprint = fingerprint or data_connector.frame_fingerprint(source_type, config, result['data'])
+        return self._store(db, fingerprint, result)
+
+    def _store(self, db: Session, fingerprint: Optional[str], result: Dict[str, Any]) -> models.Dataset:
+        with span('store'):
+            dataset = dataset_store.find(db, fingerprint)
+            if dataset is None:
+                dataset = dataset_store.create(db, fingerprint, result)
+                sample_store.schedule(dataset)
+                return dataset
+        # Another request stored the same content meanwhile
+        if isinstance(result['data'], SpooledFrame):
+            result['data'].discard()
+        return dataset
+
+    def get_sync(self, db: Session, data_source: models.DataSource) -> models.DataSourceSync:
+        sync = db.query(models.DataSourceSync).filter(models.DataSourceSync.data_source_id == data_source.id).first()
+        if sync is None:
+            sync = models.DataSourceSync(data_source_id=data_source.id, state={})
+            db.add(sync)
+        return sync
+
+    def record_state(self, db: Session, data_source: models.DataSource, state: Dict[str, Any]):
+        """Detection state of freshly ingested content, so the first refresh can already spot appends (committed by the caller)"""
+        sync = self.get_sync(db, data_source)
+        sync.state = state
+        sync.last_checked_at = datetime.utcnow()
+
+    def can_fetch(self, data_source: models.DataSource) -> bool:
+        """Whether the source can be re-read without the user uploading anything"""
+        if data_source.type in FILE_SOURCE_TYPES:
+            return 'file_path' in (data_source.connection_config or {})
+        return data_source.type in LIVE_SOURCE_TYPES
+
+    def set_schedule(self, db: Session, data_source: models.DataSource, interval_seconds: Optional[int]) -> models.DataSourceSync:
+        if interval_seconds is not None:
+            if interval_seconds < MIN_SYNC_INTERVAL_SECONDS:
+                raise ValueError(f"interval_seconds must be at least {MIN_SYNC_INTERVAL_SECONDS}")
+            if not self.can_fetch(data_source):
+                raise ValueError("Only sources with a file path, S3, SQL or API location can be refreshed on a schedule")
+        sync = self.get_sync(db, data_source)
+        sync.interval_seconds = interval_seconds
+        sync.next_run_at = datetime.utcnow() + timedelta(seconds=interval_seconds) if interval_seconds else None
+        db.commit()
+        db.refresh(sync)
+        return sync
+
+    async def refresh(
+        self,
+        db: Session,
+        data_source: models.DataSource,
+        upload_path: Optional[str] = None,
+        upload_digest: Optional[str] = None,
+        reanalyze: bool = True
+    ) -> Dict[str, Any]:
+        """Detect changes, fetch and merge them, and re-run the source's latest analysis where inputs changed"""
+        async with self._locks[data_source.id]:
+            sync = self.get_sync(db, data_source)
+            now = datetime.utcnow()
+            try:
+                with span('refresh', source_type=data_source.type):
+                    change = await self._detect(db, data_source, sync.state or {}, upload_path, upload_digest)
+                if change.status == 'appended':
+                    with span('merge', rows=len(change.delta)):
+                        change.dataset = await self._merge(db, data_source.dataset, change.delta, change.fingerprint)
+            except Exception as e:
+                sync.last_checked_at = now
+                sync.last_status = 'failed'
+                sync.last_error = str(e)
+                db.commit()
+                raise
+
+            sync.state = change.state
+            sync.last_checked_at = now
+            sync.last_status = change.status
+            sync.last_error = None
+            if change.status != 'unchanged':
+                sync.last_changed_at = now
+                self._switch_dataset(db, data_source, change.dataset)
+            db.commit()
+            if change.status != 'unchanged':
+                try:
+                    await quality_engine.assess(db, data_source)
+                except Exception as e:
+                    # The refreshed data stays; the quality endpoint can rebuild the report
+                    db.rollback()
+                    print(f"Error assessing data quality of data source {data_source.id}: {e}")
+
+            dataset = data_source.dataset
+            result = {
+                'data_source_id': data_source.id,
+                'dataset_id': dataset.id if dataset else None,
+                'status': change.status,
+                'detection': change.detection,
+                'rows_added': len(change.delta) if change.delta is not None else None,
+                'row_count': dataset.row_count if dataset else None,
+                'analysis_id': None,
+                'rerun_generators': [],
+                'reused_generators': [],
+            }
+            if change.status != 'unchanged' and reanalyze:
+                analysis = await self._reanalyze(db, data_source)
+                if analysis is not None:
+                    reused = [insight['type'] for insight in analysis.insights if insight.get('reused')]
+                    result['analysis_id'] = analysis.id
+                    result['reused_generators'] = reused
+                    result['rerun_generators'] = [name for name in ai_assistant.insight_generators if name not in reused]
+            return result
+
+    async def _detect(self, db, data_source, state, upload_path, upload_digest) -> Change:
+        config = data_source.connection_config or {}
+        if upload_path:
+            if data_source.type not in FILE_SOURCE_TYPES:
+                raise ValueError(f"{data_source.type} sources are refreshed from their origin, not from an upload")
+            return await self._file_change(db, data_source, state, upload_path, upload_digest)
+        if data_source.type in FILE_SOURCE_TYPES:
+            if 'file_path' not in config:
+                raise ValueError("This source was uploaded; upload the new version of the file to refresh it")
+            return await self._file_change(db, data_source, state, config['file_path'])
+        if data_source.type == 's3' and config.get('key'):
+            return await self._s3_change(db, data_source, state)
+        if data_source.type in SQL_SOURCE_TYPES and config.get('incremental_column') and config.get('query'):
+            return await self._watermark_change(data_source, state)
+        if data_source.type in LIVE_SOURCE_TYPES:
+            return await self._frame_change(db, data_source, state)
+        raise ValueError(f"{data_source.type} sources cannot be refreshed")
+
+    async def _file_change(self, db, data_source, state, path, digest=None, extra_state=None, detection='content_hash') -> Change:
+        digest = digest or await asyncio.to_thread(hash_file, path)
+        new_state = {**(extra_state or {}), 'content_digest': digest, 'size': os.path.getsize(path)}
+        config = data_source.connection_config or {}
+        fingerprint = make_fingerprint(data_source.type, config, digest)
+        dataset = data_source.dataset
+        if digest == state.get('content_digest') or (dataset is not None and fingerprint == dataset.fingerprint):
+            return Change('unchanged', detection, new_state)
+
+        kind = self._append_kind(data_source)
+        old_size = state.get('size')
+        if (
+            kind and dataset is not None and dataset.storage_path and old_size and new_state['size'] > old_size
+            and await asyncio.to_thread(_extends, path, old_size, state.get('content_digest'))
+        ):
+            delta = await asyncio.to_thread(self._read_appended, kind, path, old_size, dataset)
+            return Change('appended', detection, new_state, delta=delta, fingerprint=fingerprint)
+
+        connector_config = {**config, 'file_path': path} if data_source.type in FILE_SOURCE_TYPES else config
+        dataset = await self.ingest(db, data_source.type, connector_config, digest)
+        return Change('replaced', detection, new_state, dataset=dataset)
+
+    async def _s3_change(self, db, data_source, state) -> Change:
+        config = data_source.connection_config
+        bucket, key = config['bucket'], config['key']
+        etag, _ = await asyncio.to_thread(s3_reader.head, config, bucket, key)
+        if etag == state.get('etag'):
+            return Change('unchanged', 'etag', state)
+        path = await asyncio.to_thread(s3_reader.fetch, config, bucket, key)
+        digest = await asyncio.to_thread(s3_reader.cache.content_hash, bucket, key, path, hash_file)
+        return await self._file_change(db, data_source, state, path, digest, {'etag': etag}, 'etag')
+
+    async def _watermark_change(self, data_source, state) -> Change:
+        config = data_source.connection_config
+        column = config['incremental_column']
+        dataset = data_source.dataset
+        if dataset is None or not dataset.storage_path:
+            raise ValueError("The source has no stored rows to refresh from")
+        watermark = state.get('watermark') if state.get('watermark_column') == column else None
+        if watermark is None:
+            watermark = await asyncio.to_thread(_stored_max, dataset.storage_path, column)
+
+        delta = await data_connector.fetch_since(data_source.type, config, column, watermark)
+        if not len(delta):
+            return Change('unchanged', 'watermark', {'watermark_column': column, 'watermark': watermark})
+
+        new_state = {'watermark_column': column, 'watermark': _json_value(delta[column].max())}
+        digest = hashlib.sha256((dataset.fingerprint or '').encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(delta, index=False).to_numpy().tobytes())
+        fingerprint = make_fingerprint(data_source.type, config, digest.hexdigest())
+        return Change('appended', 'watermark', new_state, delta=delta, fingerprint=fingerprint)
+
+    async def _frame_change(self, db, data_source, state) -> Change:
+        config = data_source.connection_config
+        data = await data_connector.fetch(data_source.type, config)
+        fingerprint = None
+        if isinstance(data, pd.DataFrame):
+            # Stored fingerprints were taken after dtype optimization
+            optimized, _ = await asyncio.to_thread(optimize_dtypes, data)
+            fingerprint = data_connector.frame_fingerprint(data_source.type, config, optimized)
+        dataset = data_source.dataset
+        if fingerprint and dataset is not None and fingerprint == dataset.fingerprint:
+            return Change('unchanged', 'frame_hash', state)
+
+        dataset = dataset_store.find(db, fingerprint)
+        if dataset is None:
+            result = await data_connector._finish(data, data_source.type)
+            if not result['success']:
+                raise ValueError(result['error'])
+            dataset = self._store(db, fingerprint, result)
+        return Change('replaced', 'frame_hash', state, dataset=dataset)
+
+    def _append_kind(self, data_source) -> Optional[str]:
+        """'csv' or 'ndjson' when bytes appended to the source are whole new rows"""
+        config = data_source.connection_config or {}
+        if data_source.type == 'csv':
+            return 'csv'
+        if data_source.type == 'json':
+            ingestion = (data_source.data_profile or {}).get('ingestion') or {}
+            return 'ndjson' if ingestion.get('format') == 'ndjson' else None
+        if data_source.type == 's3' and config.get('key'):
+            key = config['key'].lower()
+            if key.endswith('.csv'):
+                return 'csv'
+            if key.endswith(('.jsonl', '.ndjson')):
+                return 'ndjson'
+        return None
+
+    def _read_appended(self, kind: str, path: str, offset: int, dataset: models.Dataset) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(dataset.storage_path)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            if kind == 'csv':
+                # The header was in the old part; appended lines follow the stored columns
+                return pd.read_csv(f, header=None, names=schema.names)
+            # Appended records take the stored columns and types, so the delta can be cast onto the stored file
+            return json_reader.read_frame(f, {'lines': True}, kinds=schema_kinds(schema))
+
+    async def _merge(self, db, dataset: models.Dataset, delta: pd.DataFrame, fingerprint: str) -> models.Dataset:
+        existing = dataset_store.find(db, fingerprint)
+        if existing is not None:
+            return existing
+        path = await asyncio.to_thread(dataset_store.append_frame, dataset, delta)
+        try:
+            result = await asyncio.to_thread(self._appended_result, dataset, path, len(delta))
+        except BaseException:
+            os.remove(path)
+            raise
+        return self._store(db, fingerprint, result)
+
+    def _appended_result(self, dataset: models.Dataset, path: str, rows_added: int) -> Dict[str, Any]:
+        """Preview and profile of the merged file, updated from the appended rows alone"""
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        head = next(parquet.iter_batches(batch_size=100)).to_pandas()
+        row_count = parquet.metadata.num_rows
+        previous_rows = dataset.row_count or 0
+
+        profile = dict(dataset.data_profile or {})
+        delta_sketches = file_sketches(path, skip_rows=previous_rows)
+        profile['sketches'] = merge_sketches(profile.get('sketches') or file_sketches(dataset.storage_path), delta_sketches)
+        # Duplicates and outlier fences depend on every row, so quality is rescanned over the merged file
+        profile['quality'] = quality_engine.scan(path)
+        profile['refresh'] = {
+            'mode': 'append',
+            'rows_added': rows_added,
+            'previous_rows': previous_rows,
+            'refreshed_at': datetime.utcnow().isoformat(),
+        }
+
+        preview = dict(dataset.data_preview or {})
+        previous_columns = {str(column) for column in preview.get('columns', [])}
+        missing = {str(column): count for column, count in (preview.get('missing_values') or {}).items()}
+        for column, sketch in delta_sketches.items():
+            # Columns the new rows introduced were missing from every earlier row
+            earlier = missing.get(column, 0) if column in previous_columns else previous_rows
+            missing[column] = earlier + sketch['nulls']
+        preview.update({
+            'row_count': row_count,
+            'column_count': len(head.columns),
+            'columns': list(head.columns),
+            'sample_data': data_connector._to_records(head.head(10)),
+            'dtypes': head.dtypes.astype(str).to_dict(),
+            'missing_values': missing,
+        })
+        return {
+            'data': SpooledFrame(path, row_count, head, missing, profile['refresh']),
+            'data_preview': preview,
+            'data_profile': profile,
+            'raw_data_sample': data_connector._to_records(head),
+        }
+
+    def _switch_dataset(self, db: Session, data_source: models.DataSource, dataset: models.Dataset):
+        previous = data_source.dataset
+        if previous is not None and previous.id == dataset.id:
+            return
+        data_source.dataset_id = dataset.id
+        dataset_store.acquire(db, dataset)
+        db.commit()
+        if previous is not None:
+            dataset_store.release(db, previous)
+        db.refresh(data_source)
+
+    async def _reanalyze(self, db: Session, data_source: models.DataSource) -> Optional[models.Analysis]:
+        """Re-run the source's part of its latest analysis over the refreshed data"""
+        previous = self._latest_analysis(db, data_source)
+        if previous is None or data_source.dataset is None:
+            return None
+        frame = await asyncio.to_thread(dataset_store.load_frame, data_source.dataset)
+        if frame is None:
+            return None
+
+        previous_insights = [insight for insight in previous.insights if insight.get('data_source_id') == data_source.id]
+        insights = await ai_assistant.analyze_data(frame, previous=previous_insights)
+        for insight in insights:
+            insight['data_source_id'] = data_source.id
+            insight['data_source'] = data_source.name
+
+        name = previous.name if previous.name.endswith(' (refreshed)') else f"{previous.name} (refreshed)"
+        analysis = models.Analysis(
+            project_id=data_source.project_id,
+            name=name,
+            type=previous.type,
+            config={**(previous.config or {}), 'data_source_ids': [data_source.id], 'refreshed_from_analysis_id': previous.id},
+            results={"insights": insights},
+            insights=insights
+        )
+        db.add(analysis)
+        db.commit()
+        db.refresh(analysis)
+        return analysis
+
+    def _latest_analysis(self, db: Session, data_source: models.DataSource) -> Optional[models.Analysis]:
+        analyses = db.query(models.Analysis).filter(
+            models.Analysis.project_id == data_source.project_id
+        ).order_by(models.Analysis.created_at.desc(), models.Analysis.id.desc()).limit(RECENT_ANALYSES)
+        for analysis in analyses:
+            if any(isinstance(insight, dict) and insight.get('data_source_id') == data_source.id for insight in analysis.insights or []):
+                return analysis
+        return None
+
+    def start(self):
+        """Start the scheduled re-sync loop (once per worker)"""
+        if SOURCE_SYNC_ENABLED and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run_scheduler())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_scheduler(self):
+        while True:
+            await asyncio.sleep(SOURCE_SYNC_POLL_SECONDS)
+            try:
+                await self.run_due()
+            except Exception as e:
+                print(f"Scheduled refresh failed: {e}")
+
+    async def run_due(self) -> int:
+        """Refresh every source whose schedule is due; returns how many this worker ran"""
+        db = SessionLocal()
+        ran = 0
+        try:
+            now = datetime.utcnow()
+            due = db.query(models.DataSourceSync).filter(
+                models.DataSourceSync.interval_seconds.isnot(None),
+                models.DataSourceSync.next_run_at <= now
+            ).all()
+            for sync in due:
+                # Moving next_run_at is the claim; a worker polling the same row concurrently updates nothing
+                claimed = db.query(models.DataSourceSync).filter(
+                    models.DataSourceSync.id == sync.id,
+                    models.DataSourceSync.next_run_at == sync.next_run_at
+                ).update({models.DataSourceSync.next_run_at: now + timedelta(seconds=sync.interval_seconds)}, synchronize_session=False)
+                db.commit()
+                if not claimed:
+                    continue
+                data_source = db.query(models.DataSource).filter(models.DataSource.id == sync.data_source_id).first()
+                if data_source is None:
+                    continue
+                try:
+                    await self.refresh(db, data_source)
+                    ran += 1
+                except Exception as e:
+                    print(f"Scheduled refresh of data source {data_source.id} failed: {e}")
+        finally:
+            db.close()
+        return ran
+
+def _extends(path: str, size: int, digest: Optional[str]) -> bool:
+    """Whether the file's first `size` bytes are the previously seen content, ending with a line break"""
+    if not digest:
+        return False
+    sha = hashlib.sha256()
+    remaining, last = size, b''
+    with open(path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                return False
+            sha.update(chunk)
+            remaining -= len(chunk)
+            last = chunk
+    return last.endswith(b'\n') and sha.hexdigest() == digest
+
+def _stored_max(path: str, column: str):
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    if column not in pq.read_schema(path).names:
+        raise ValueError(f"Incremental column '{column}' is not in the stored data")
+    return _json_value(pc.max(pq.read_table(path, columns=[column]).column(column)).as_py())
+
+def _json_value(value):
+    """Watermarks are kept in JSON: datetimes as ISO strings, NumPy scalars as Python numbers"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+source_refresher = SourceRefresher()
@@ -0,0 +1,381 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import html
+import json
+import os
+import textwrap
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import models
+import row_window
+from chart_data import chart_data_service
+from database import SessionLocal
+from dataset_store import dataset_store
+from row_window import row_window_service
+from worker_pool import worker_pool
+
+STORY_EXPORT_DIR = os.getenv("STORY_EXPORT_DIR", "./story_exports")
+EXPORT_FORMATS = {'html', 'pdf'}
+# Bump when rendering changes so cached exports and chart images are rebuilt
+EXPORT_VERSION = 1
+DEFAULT_TABLE_ROWS = 20
+MAX_TABLE_ROWS = 200
+MEDIA_TYPES = {'html': 'text/html', 'pdf': 'application/pdf'}
+
+class StoryExporter:
+    """Renders stories to HTML and PDF in the shared process pool.
+
+    Story components are resolved in the API process (chart specs go through
+    the chart-data service, tables through the row-window service), then:
+
+      - each chart image is keyed by dataset fingerprint + chart spec and kept
+        next to the dataset store, so stories sharing a chart reuse one PNG;
+        missing images are drawn in parallel worker processes
+      - each format is rendered in its own worker, and the output is stored
+        under the hash of everything that went into it; that hash is the
+        download ETag and unchanged stories are never re-rendered
+
+    Supported components:
+      {"type": "text", "title", "content"}
+      {"type": "insight", "title", "description"}
+      {"type": "chart", "title", "data_source_id", "spec": <chart spec>}
+      {"type": "table", "title", "data_source_id", "columns", "sort", "limit"}
+    """
+
+    def __init__(self, output_dir: str = STORY_EXPORT_DIR, store=dataset_store, pool=worker_pool):
+        self.output_dir = output_dir
+        self.store = store
+        self.pool = pool
+
+    def validate_formats(self, formats: List[str]):
+        unsupported = [f for f in formats if f not in EXPORT_FORMATS]
+        if unsupported:
+            raise ValueError(f"Unsupported export formats: {unsupported}")
+
+    def schedule(self, db, story: models.Story, formats: List[str]) -> List[models.StoryExport]:
+        """Create pending export rows; the caller runs `export` for them in the background"""
+        self.validate_formats(formats)
+        exports = [models.StoryExport(story_id=story.id, format=f, status='pending') for f in dict.fromkeys(formats)]
+        db.add_all(exports)
+        db.commit()
+        for export in exports:
+            db.refresh(export)
+        return exports
+
+    async def export(self, story_id: int, export_ids: List[int]):
+        db = SessionLocal()
+        try:
+            story = db.query(models.Story).filter(models.Story.id == story_id).first()
+            exports = db.query(models.StoryExport).filter(models.StoryExport.id.in_(export_ids)).all()
+            if story is None or not exports:
+                return
+            for export in exports:
+                export.status = 'running'
+            db.commit()
+
+            try:
+                document = await self.resolve(db, story)
+            except Exception as e:
+                self._finish(db, exports, error=f"Could not resolve story components: {e}")
+                return
+
+            results = await asyncio.gather(
+                *(self._render(document, export.format) for export in exports),
+                return_exceptions=True
+            )
+            for export, result in zip(exports, results):
+                if isinstance(result, BaseException):
+                    self._finish(db, [export], error=str(result))
+                else:
+                    self._finish(db, [export], content_hash=result[0], file_path=result[1])
+        finally:
+            db.close()
+
+    def _finish(self, db, exports, content_hash=None, file_path=None, error=None):
+        for export in exports:
+            export.status = 'failed' if error else 'done'
+            export.content_hash = content_hash
+            export.file_path = file_path
+            export.error = error
+            export.completed_at = datetime.utcnow()
+        db.commit()
+
+    async def resolve(self, db, story: models.Story) -> Dict[str, Any]:
+        """Story as a render-ready document with chart images drawn and table rows loaded"""
+        sections, pending_images = [], {}
+        for component in story.components or []:
+            kind = component.get('type')
+            title = component.get('title') or ''
+            if kind == 'chart':
+                section, chart = await asyncio.to_thread(self._resolve_chart, db, story, component)
+                # Charts shared by several sections are drawn once
+                if not os.path.exists(section['image_path']):
+                    pending_images[section['image_path']] = (chart, section['title'])
+            elif kind == 'table':
+                section = await asyncio.to_thread(self._resolve_table, db, story, component)
+            elif kind in ('text', 'insight'):
+                text = component.get('content') or component.get('description') or ''
+                section = {'type': 'text', 'title': title, 'text': str(text)}
+            else:
+                raise ValueError(f"Unsupported story component type: {kind}")
+            sections.append(section)
+
+        await asyncio.gather(*(
+            self.pool.run(_render_chart_image, chart, title, path)
+            for path, (chart, title) in pending_images.items()
+        ))
+
+        return {
+            'title': story.title,
+            'narrative': story.narrative or '',
+            'created_at': story.created_at.isoformat() if story.created_at else None,
+            'sections': sections,
+        }
+
+    def _source_dataset(self, db, story: models.Story, component: Dict[str, Any]) -> models.Dataset:
+        data_source = db.query(models.DataSource).filter(
+            models.DataSource.id == component.get('data_source_id'),
+            models.DataSource.project_id == story.project_id
+        ).first()
+        if data_source is None or data_source.dataset is None:
+            raise ValueError(f"Data source {component.get('data_source_id')} has no stored dataset in this project")
+        return data_source.dataset
+
+    def _resolve_chart(self, db, story: models.Story, component: Dict[str, Any]):
+        """(section, chart payload to draw the image from)"""
+        dataset = self._source_dataset(db, story, component)
+        chart, _ = chart_data_service.chart(dataset, component.get('spec') or {})
+        title = component.get('title') or ''
+        material = json.dumps({'spec': chart['spec'], 'title': title, 'version': EXPORT_VERSION}, sort_keys=True, default=str)
+        image_hash = hashlib.sha256(f"{dataset.fingerprint}:{material}".encode('utf-8')).hexdigest()
+        section = {
+            'type': 'chart',
+            'title': title,
+            'image_hash': image_hash,
+            'image_path': os.path.join(self.store.root, 'chart_images', dataset.fingerprint, f"{image_hash}.png"),
+        }
+        return section, chart
+
+    def _resolve_table(self, db, story: models.Story, component: Dict[str, Any]) -> Dict[str, Any]:
+        dataset = self._source_dataset(db, story, component)
+        limit = max(1, min(int(component.get('limit') or DEFAULT_TABLE_ROWS), MAX_TABLE_ROWS))
+        page, total_rows = row_window_service.window(
+            dataset, 0, limit, component.get('columns'), component.get('sort'), component.get('filters')
+        )
+        data = row_window.to_columnar_json(page)
+        columns = list(data)
+        return {
+            'type': 'table',
+            'title': component.get('title') or '',
+            'columns': columns,
+            'rows': [[data[column][i] for column in columns] for i in range(page.num_rows)],
+            'total_rows': total_rows,
+        }
+
+    def content_hash(self, document: Dict[str, Any], export_format: str) -> str:
+        # Image paths depend on where the store lives; their hashes identify the content
+        portable = dict(document, sections=[
+            {k: v for k, v in section.items() if k != 'image_path'} for section in document['sections']
+        ])
+        material = json.dumps({'document': portable, 'format': export_format, 'version': EXPORT_VERSION}, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    async def _render(self, document: Dict[str, Any], export_format: str):
+        """(content hash, output path), rendering only when no identical export exists"""
+        content_hash = self.content_hash(document, export_format)
+        path = os.path.join(self.output_dir, content_hash[:2], f"{content_hash}.{export_format}")
+        if not os.path.exists(path):
+            renderer = _render_html if export_format == 'html' else _render_pdf
+            await self.pool.run(renderer, document, path)
+        return content_hash, path
+
+def _atomic_output(path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def _render_chart_image(chart: Dict[str, Any], title: str, path: str):
+    from matplotlib.figure import Figure
+    import numpy as np
+
+    figure = Figure(figsize=(8, 4.5), dpi=110, layout='tight')
+    axes = figure.add_subplot()
+    kind, spec = chart['kind'], chart['spec']
+
+    if kind == 'histogram':
+        if chart.get('edges') and not isinstance(chart['edges'][0], str):
+            axes.stairs(chart['counts'], chart['edges'], fill=True, color='#2563eb')
+        else:
+            axes.bar([str(x) for x in chart['x']], chart['counts'], color='#2563eb')
+            axes.tick_params(axis='x', labelrotation=45)
+        axes.set_xlabel(spec['x'])
+        axes.set_ylabel('Count')
+    elif kind == 'heatmap':
+        image = axes.imshow(np.array(chart['z']), aspect='auto', origin='lower', cmap='viridis')
+        for setter, labels in ((axes.set_xticks, chart['x']), (axes.set_yticks, chart['y'])):
+            step = max(1, len(labels) // 10)
+            setter(range(0, len(labels), step), labels=[_tick(label) for label in labels[::step]])
+        axes.set_xlabel(spec['x'])
+        axes.set_ylabel(spec['y'])
+        figure.colorbar(image, ax=axes)
+    elif kind == 'aggregate':
+        groups = chart.get('groups') or {}
+        labels = [' / '.join(str(v) for v in values) for values in zip(chart['x'], *groups.values())]
+        axes.bar(labels, chart['values'], color='#2563eb')
+        axes.tick_params(axis='x', labelrotation=45)
+        axes.set_ylabel(f"{spec['agg']}({spec.get('y') or ''})")
+    else:
+        x = chart['x']
+        if x and isinstance(x[0], str):
+            x = np.array(x, dtype='datetime64[s]')
+        axes.plot(x, chart['y'], color='#2563eb', linewidth=1)
+        axes.set_xlabel(spec['x'])
+        axes.set_ylabel(spec['y'])
+        figure.autofmt_xdate()
+
+    if title:
+        axes.set_title(title)
+    temp_path = _atomic_output(path)
+    figure.savefig(temp_path, format='png')
+    os.replace(temp_path, path)
+
+def _tick(label) -> str:
+    return f"{label:.3g}" if isinstance(label, float) else str(label)[:16]
+
+def _paragraphs(text: str) -> List[str]:
+    return [block.strip() for block in text.replace('\r\n', '\n').split('\n\n') if block.strip()]
+
+def _render_html(document: Dict[str, Any], path: str):
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f"<title>{html.escape(document['title'])}</title>",
+        '<style>body{font-family:Georgia,serif;max-width:860px;margin:2rem auto;color:#111827;line-height:1.6}'
+        'img{max-width:100%}table{border-collapse:collapse;font-family:system-ui,sans-serif;font-size:13px}'
+        'th,td{border:1px solid #e5e7eb;padding:4px 8px;text-align:left}th{background:#f9fafb}'
+        '.meta{color:#6b7280;font-size:13px}</style></head><body>',
+        f"<h1>{html.escape(document['title'])}</h1>",
+    ]
+    if document.get('created_at'):
+        parts.append(f"<p class=\"meta\">{html.escape(document['created_at'][:10])}</p>")
+    parts.extend(f"<p>{html.escape(p)}</p>" for p in _paragraphs(document['narrative']))
+
+    for section in document['sections']:
+        if section['title']:
+            parts.append(f"<h2>{html.escape(section['title'])}</h2>")
+        if section['type'] == 'text':
+            parts.extend(f"<p>{html.escape(p)}</p>" for p in _paragraphs(section['text']))
+        elif section['type'] == 'chart':
+            with open(section['image_path'], 'rb') as f:
+                encoded = base64.b64encode(f.read()).decode('ascii')
+            parts.append(f'<img alt="{html.escape(section["title"])}" src="data:image/png;base64,{encoded}">')
+        elif section['type'] == 'table':
+            header = ''.join(f"<th>{html.escape(str(c))}</th>" for c in section['columns'])
+            rows = ''.join(
+                '<tr>' + ''.join(f"<td>{html.escape('' if v is None else str(v))}</td>" for v in row) + '</tr>'
+                for row in section['rows']
+            )
+            parts.append(f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>")
+            if section['total_rows'] > len(section['rows']):
+                parts.append(f"<p class=\"meta\">First {len(section['rows'])} of {section['total_rows']:,} rows</p>")
+    parts.append('</body></html>')
+
+    temp_path = _atomic_output(path)
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    os.replace(temp_path, path)
+
+class _PdfLayout:
+    """Top-to-bottom flow of text, images and tables over A4 matplotlib pages"""
+
+    WIDTH, HEIGHT, MARGIN = 8.27, 11.69, 0.8
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.figure = None
+        self.y = 0.0
+
+    def _page(self):
+        from matplotlib.figure import Figure
+        if self.figure is not None:
+            self.pdf.savefig(self.figure)
+        self.figure = Figure(figsize=(self.WIDTH, self.HEIGHT))
+        self.y = self.MARGIN
+
+    def _reserve(self, height: float):
+        if self.figure is None or self.y + height > self.HEIGHT - self.MARGIN:
+            self._page()
+
+    def text(self, text: str, size: float = 10, weight: str = 'normal', gap: float = 0.12):
+        # ~0.55em average glyph width
+        chars = int((self.WIDTH - 2 * self.MARGIN) * 72 / (size * 0.55))
+        line_height = size * 1.45 / 72
+        for line in textwrap.wrap(text, chars) or ['']:
+            self._reserve(line_height)
+            self.figure.text(
+                self.MARGIN / self.WIDTH, 1 - self.y / self.HEIGHT, line,
+                fontsize=size, fontweight=weight, va='top', family='serif'
+            )
+            self.y += line_height
+        self.y += gap
+
+    def image(self, path: str):
+        import matplotlib.image as mpimg
+        pixels = mpimg.imread(path)
+        width = self.WIDTH - 2 * self.MARGIN
+        height = width * pixels.shape[0] / pixels.shape[1]
+        self._reserve(height)
+        axes = self.figure.add_axes([
+            self.MARGIN / self.WIDTH, 1 - (self.y + height) / self.HEIGHT, width / self.WIDTH, height / self.HEIGHT
+        ])
+        axes.imshow(pixels)
+        axes.axis('off')
+        self.y += height + 0.15
+
+    def table(self, columns: List[str], rows: List[List[Any]]):
+        row_height = 0.22
+        for start in range(0, max(len(rows), 1), 40):
+            chunk = rows[start:start + 40]
+            height = row_height * (len(chunk) + 1)
+            self._reserve(height)
+            axes = self.figure.add_axes([
+                self.MARGIN / self.WIDTH, 1 - (self.y + height) / self.HEIGHT,
+                (self.WIDTH - 2 * self.MARGIN) / self.WIDTH, height / self.HEIGHT
+            ])
+            axes.axis('off')
+            cells = [['' if v is None else str(v)[:24] for v in row] for row in chunk] or [[''] * len(columns)]
+            table = axes.table(cellText=cells, colLabels=[str(c)[:24] for c in columns], loc='upper left', cellLoc='left')
+            table.auto_set_font_size(False)
+            table.set_fontsize(7)
+            self.y += height + 0.15
+
+    def close(self):
+        if self.figure is not None:
+            self.pdf.savefig(self.figure)
+
+def _render_pdf(document: Dict[str, Any], path: str):
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    temp_path = _atomic_output(path)
+    with PdfPages(temp_path, metadata={'Title': document['title']}) as pdf:
+        layout = _PdfLayout(pdf)
+        layout.text(document['title'], size=20, weight='bold', gap=0.2)
+        for paragraph in _paragraphs(document['narrative']):
+            layout.text(paragraph)
+        for section in document['sections']:
+            if section['title']:
+                layout.text(section['title'], size=14, weight='bold')
+            if section['type'] == 'text':
+                for paragraph in _paragraphs(section['text']):
+                    layout.text(paragraph)
+            elif section['type'] == 'chart':
+                layout.image(section['image_path'])
+            elif section['type'] == 'table':
+                layout.table(section['columns'], section['rows'])
+                if section['total_rows'] > len(section['rows']):
+                    layout.text(f"First {len(section['rows'])} of {section['total_rows']:,} rows", size=8)
+        layout.close()
+    os.replace(temp_path, path)
+
+story_exporter = StoryExporter()
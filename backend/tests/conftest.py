@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Modules read their storage locations at import time; keep tests off the real database
+_state_dir = tempfile.mkdtemp(prefix='phoenix-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_state_dir, 'test.db')}")
+os.environ.setdefault('DATASET_STORE_DIR', os.path.join(_state_dir, 'datasets'))
+os.environ.setdefault('SOURCE_SYNC_ENABLED', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from llm.batching import frame_group_key
+
+
+def test_same_shape_different_values_do_not_share_a_batch():
+    tenant_a = pd.DataFrame({'name': ['alice', 'bob'], 'salary': [100, 200]})
+    tenant_b = pd.DataFrame({'name': ['carol', 'dave'], 'salary': [300, 400]})
+    assert frame_group_key(tenant_a) != frame_group_key(tenant_b)
+
+
+def test_identical_data_shares_a_batch():
+    frame = pd.DataFrame({'tags': [['a'], ['b']], 'n': [1, 2]})
+    assert frame_group_key(frame) == frame_group_key(frame.copy())
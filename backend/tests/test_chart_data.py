@@ -0,0 +1,12 @@
+import pytest
+
+from chart_data import ChartDataService
+
+
+def test_chart_filters_with_unknown_operators_are_rejected():
+    service = ChartDataService()
+    spec = {'kind': 'histogram', 'x': 'amount', 'filters': [{'column': 'city', 'op': 'like', 'value': 'O'}]}
+    with pytest.raises(ValueError):
+        service.normalize(spec)
+    spec['filters'][0]['op'] = '=='
+    assert service.normalize(spec)['filters'] == spec['filters']
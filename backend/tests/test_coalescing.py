@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import coalescing
+import database
+import models
+from coalescing import RequestCoalescer
+
+
+@pytest.fixture(autouse=True)
+def coalesced_table():
+    database.init_db()
+    yield
+    db = database.SessionLocal()
+    db.query(models.CoalescedRequest).delete()
+    db.commit()
+    db.close()
+
+
+def test_concurrent_requests_share_one_computation():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'answer': 42}
+
+    async def scenario():
+        return await asyncio.gather(*(coalescer.run('k', compute) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == [{'answer': 42}] * 3
+    assert len(calls) == 1
+
+
+def test_finished_result_is_not_reused_by_later_requests():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert asyncio.run(coalescer.run('k', compute)) == 1
+    assert asyncio.run(coalescer.run('k', compute)) == 2
+
+
+def test_result_reuse_is_opt_in(monkeypatch):
+    monkeypatch.setattr(coalescing, 'RESULT_TTL_SECONDS', 60)
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert asyncio.run(coalescer.run('k', compute)) == 1
+    assert asyncio.run(coalescer.run('k', compute)) == 1
+
+
+def test_unpublishable_result_releases_the_row():
+    coalescer = RequestCoalescer()
+
+    async def compute():
+        return object()  # not JSON-serializable
+
+    result = asyncio.run(coalescer.run('k', compute))
+    assert result is not None
+    db = database.SessionLocal()
+    try:
+        assert db.query(models.CoalescedRequest).filter(models.CoalescedRequest.key == 'k').first() is None
+    finally:
+        db.close()
+
+
+def test_follower_in_another_worker_waits_for_the_leader():
+    leader, follower = RequestCoalescer(), RequestCoalescer()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.5)
+        return {'answer': len(calls)}
+
+    async def scenario():
+        first = asyncio.ensure_future(leader.run('k', compute))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, follower.run('k', compute))
+
+    assert asyncio.run(scenario()) == [{'answer': 1}, {'answer': 1}]
+    assert follower.stats['coalesced_remote'] == 1
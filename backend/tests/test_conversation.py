@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+import conversation
+
+
+class FakeClient:
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+
+    async def complete(self, prompt, llm_choice='auto', json_mode=False):
+        self.prompts.append(prompt)
+        return self.response
+
+    async def analyze_data(self, llm_choice, text_data):
+        raise AssertionError('summaries must not go through the analysis prompt')
+
+
+def _rows():
+    return [
+        SimpleNamespace(message_type='user_query', content='What is the average price? Per region please.'),
+        SimpleNamespace(message_type='ai_response', content='The average price is 12.5. West is highest.'),
+    ]
+
+
+def test_summary_prompt_is_sent_as_is(monkeypatch):
+    client = FakeClient({'content': 'User asked for average price; it is 12.5.', 'provider': 'mock'})
+    monkeypatch.setattr(conversation, 'llm_client', client)
+    summary = asyncio.run(conversation.ConversationMemory()._summarize('', _rows()))
+    assert summary == 'User asked for average price; it is 12.5.'
+    assert 'Update the running summary' in client.prompts[0]
+
+
+def test_failed_completion_falls_back_to_extractive_summary(monkeypatch):
+    monkeypatch.setattr(conversation, 'llm_client', FakeClient({'error': 'down'}))
+    summary = asyncio.run(conversation.ConversationMemory()._summarize('', _rows()))
+    assert 'What is the average price?' in summary
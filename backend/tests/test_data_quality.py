@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from data_quality import QualityEngine
+
+def text_findings(name, values):
+    series = pd.Series(values, dtype=object)
+    return QualityEngine()._text_rules(name, series, np.arange(len(series)), len(series))
+
+def test_dates_in_several_formats_are_valid():
+    values = ['2024-01-05', '05/01/2024', '2024-01-05 10:00', 'Jan 5 2024'] * 10
+    assert text_findings('created_at', values) == []
+
+def test_unparseable_dates_are_reported():
+    values = ['2024-01-05', '05/01/2024'] * 20 + ['not a date']
+    findings = text_findings('created_at', values)
+    assert [finding['rule'] for finding in findings] == ['invalid_date']
+    assert findings[0]['rows'] == [40]
+
+def test_nested_values_are_scanned_by_their_text():
+    frame = pd.DataFrame({'id': [1, 2, 3, 4], 'tags': [['a'], ['b', 'c'], [], ['a']], 'meta': [{'k': 1}] * 4})
+    report = QualityEngine().scan(frame)
+    assert report['columns']['tags']['distinct'] == 3
+    assert report['columns']['tags']['issues'] == []
+    assert [issue['rule'] for issue in report['columns']['meta']['issues']] == ['constant']
+
+def test_api_records_with_array_fields_are_ingested(monkeypatch):
+    import asyncio
+    import data_connectors
+
+    async def no_llm(data, source_type, quality=None):
+        return {}
+
+    connector = data_connectors.DataConnector()
+    monkeypatch.setattr(connector, '_analyze_first_contact', no_llm)
+    frame = pd.DataFrame({'id': [1, 2, 3], 'tags': [['a'], ['b', 'c'], []]})
+    result = asyncio.run(connector._finish(frame, 'api'))
+    assert result['success'], result.get('error')
+    assert result['data_profile']['quality']['columns']['tags']['distinct'] == 3
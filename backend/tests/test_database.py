@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import add_missing_columns
+from models import Base
+
+# Tables as the first release created them, before shared datasets and pipelines
+LEGACY_SCHEMA = [
+    "CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR, description TEXT, owner_id INTEGER, created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE data_sources (id INTEGER PRIMARY KEY, project_id INTEGER, name VARCHAR, type VARCHAR, connection_config JSON, "
+    "raw_data TEXT, data_preview JSON, data_profile JSON, data_quality_issues JSON, created_at DATETIME)",
+    "CREATE TABLE data_transformations (id INTEGER PRIMARY KEY, data_source_id INTEGER, transformation_type VARCHAR, "
+    "transformation_config JSON, applied_at DATETIME)",
+    "CREATE TABLE ai_conversations (id INTEGER PRIMARY KEY, project_id INTEGER, message_type VARCHAR, content TEXT, "
+    "conversation_metadata JSON, created_at DATETIME)",
+]
+
+def test_existing_database_gains_new_columns_and_keeps_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'phoenix.db'}")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text(
+            "INSERT INTO data_sources (id, project_id, name, type, raw_data, data_preview) "
+            "VALUES (1, 1, 'legacy', 'csv', 'a\n1', '[{\"a\": 1}]')"
+        ))
+        connection.execute(text("INSERT INTO data_transformations (id, data_source_id, transformation_type) VALUES (1, 1, 'filter')"))
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    add_missing_columns(engine)  # Idempotent on an up-to-date database
+
+    inspector = inspect(engine)
+    assert 'dataset_id' in {column['name'] for column in inspector.get_columns('data_sources')}
+    assert {'parent_id', 'materialized_dataset_id'} <= {column['name'] for column in inspector.get_columns('data_transformations')}
+    assert 'ix_ai_conversations_project_type_created' in {index['name'] for index in inspector.get_indexes('ai_conversations')}
+
+    db = sessionmaker(bind=engine)()
+    try:
+        source = db.query(models.DataSource).one()
+        assert source.dataset is None
+        assert source.data_preview == [{'a': 1}]
+        transformation = db.query(models.DataTransformation).one()
+        assert transformation.parent_id is None and transformation.materialized_dataset_id is None
+    finally:
+        db.close()
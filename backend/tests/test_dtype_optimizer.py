@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from dtype_optimizer import optimize_dtypes
+
+
+@pytest.mark.parametrize('values', [
+    ['2024.01', '2023.12', '1999.5', '2010.25'],
+    ['3.14', '2.71', '1.41', '10.5'],
+    ['5.29.192', '4.5.6', '1.2.3', '10.4.1'],
+])
+def test_decimal_and_version_strings_stay_text(values):
+    optimized, _ = optimize_dtypes(pd.DataFrame({'v': values * 5}))
+    assert not pd.api.types.is_datetime64_any_dtype(optimized['v'])
+
+
+@pytest.mark.parametrize('values', [
+    ['2024-01-05', '2024-02-10', '2023-12-31', '2024-03-01'],
+    ['2024/01/05', '2024/02/10', '2023/12/31', '2024/03/01'],
+    ['2024-01-05 10:30:00', '2024-01-06T11:00', '2024-01-07 09:15:30', '2024-01-08 23:59'],
+])
+def test_date_strings_are_parsed(values):
+    optimized, report = optimize_dtypes(pd.DataFrame({'d': values * 5}))
+    assert pd.api.types.is_datetime64_any_dtype(optimized['d'])
+    assert 'd' in report['converted_columns']
+
+
+def test_day_first_column_is_read_day_first_throughout():
+    optimized, _ = optimize_dtypes(pd.DataFrame({'d': ['05/01/2024', '10/02/2024', '31/12/2023', '01/03/2024'] * 5}))
+    assert optimized['d'].head(4).dt.strftime('%Y-%m-%d').tolist() == ['2024-01-05', '2024-02-10', '2023-12-31', '2024-03-01']
+
+
+@pytest.mark.parametrize('values', [
+    # Day and month order cannot be told apart
+    ['05/01/2024', '10/02/2024', '01/03/2024', '12/11/2024'],
+    # Two formats in one column
+    ['2024-01-05', '05/01/2024', '2024-02-10', '31/12/2023'],
+    # Times without a date
+    ['10:30', '11:45:10', '09:00', '23:59'],
+])
+def test_ambiguous_mixed_or_time_only_strings_stay_text(values):
+    optimized, report = optimize_dtypes(pd.DataFrame({'d': values * 5}))
+    assert not pd.api.types.is_datetime64_any_dtype(optimized['d'])
+    assert 'datetime' not in report['converted_columns'].get('d', '')
@@ -0,0 +1,37 @@
+import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from dtype_optimizer import optimize_dtypes
+from excel_reader import _sheet_to_parquet, read_sheet
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = 'data'
+    sheet.append(['flag', 'at', 'mixed', 'name'])
+    sheet.append([True, datetime.time(1, 2), 1, 'x'])
+    sheet.append([None, datetime.time(3, 4), 'a', 'y'])
+    sheet.append([False, None, 2.5, 'z'])
+    path = tmp_path / 'book.xlsx'
+    book.save(path)
+    return str(path)
+
+
+def test_worker_hand_off_keeps_the_single_sheet_frame(workbook, tmp_path):
+    single, _ = optimize_dtypes(read_sheet(workbook, 'data'))
+    parquet_path = str(tmp_path / 'sheet.parquet')
+    assert _sheet_to_parquet(workbook, 'data', parquet_path) == 3
+    handed_off, _ = optimize_dtypes(pd.read_parquet(parquet_path))
+    pd.testing.assert_frame_equal(single, handed_off)
+
+
+def test_only_columns_arrow_rejects_become_text(workbook):
+    frame = read_sheet(workbook, 'data')
+    assert frame['flag'].tolist() == [True, None, False]
+    assert frame['at'].tolist() == [datetime.time(1, 2), datetime.time(3, 4), None]
+    assert frame['mixed'].tolist() == ['1', 'a', '2.5']
@@ -0,0 +1,41 @@
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from json_reader import JsonReader, RecordBatcher
+
+
+def _prices(count):
+    # Whole numbers for longer than the schema sample, then fractions
+    return [{'id': i, 'price': i + 1} for i in range(count)] + [{'id': count, 'price': 10.5}, {'id': count + 1, 'price': 7}]
+
+
+@pytest.mark.parametrize('lines', [False, True])
+def test_spooled_integer_column_widens_to_float(tmp_path, lines):
+    records = _prices(1500)
+    path = tmp_path / 'prices.json'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records) if lines else json.dumps(records))
+
+    spooled = JsonReader(spool_dir=str(tmp_path / 'spool')).read(str(path))
+    table = pq.read_table(spooled.parquet_path)
+    assert table.schema.field('price').type == pa.float64()
+    assert table.schema.field('id').type == pa.int64()
+    assert table.column('price').to_pylist() == [float(record['price']) for record in records]
+    assert spooled.report['coerced_values'] == {}
+    assert len(list((tmp_path / 'spool').iterdir())) == 1
+
+
+def test_in_memory_integer_column_widens_to_float():
+    records = _prices(1500)
+    frame = JsonReader().read_frame(io.BytesIO(json.dumps(records).encode('utf-8')))
+    assert frame['price'].tolist() == [float(record['price']) for record in records]
+
+
+def test_given_integer_kind_is_kept():
+    batcher = RecordBatcher(kinds={'price': 'int'})
+    batch = next(batcher.batches([{'price': 1}, {'price': 10.5}]))
+    assert batch.column(0).to_pylist() == [1, None]
+    assert batcher.coerced['price'] == 1
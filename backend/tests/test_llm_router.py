@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import httpx
+
+from llm.router import CircuitBreaker, LLMRouter, Provider
+
+def make_router(handler, names=('fast', 'slow')):
+    providers = [Provider(name, f"http://{name}.test/v1/chat/completions", 'key', 'model') for name in names]
+    router = LLMRouter(providers, hedging=False)
+    router._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return router
+
+def reply(request, content='ok'):
+    return httpx.Response(200, json={'choices': [{'message': {'content': content}}], 'usage': {}})
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.record(False, error_rate=0.0, samples=0)
+    assert breaker.state == 'closed'
+    breaker.record(False, error_rate=0.0, samples=0)
+    assert breaker.state == 'open'
+    assert not breaker.allows()
+
+def test_breaker_opens_on_high_error_rate():
+    breaker = CircuitBreaker(failure_threshold=100, cooldown=60)
+    breaker.record(False, error_rate=0.6, samples=20)
+    assert breaker.state == 'open'
+
+def test_half_open_probe_closes_or_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record(False, error_rate=0.0, samples=0)
+    assert breaker.acquire()
+    assert breaker.state == 'half_open'
+    breaker.record(False, error_rate=0.0, samples=0)
+    assert breaker.state == 'open'
+
+    assert breaker.acquire()
+    breaker.record(True, error_rate=0.0, samples=0)
+    assert breaker.state == 'closed'
+    assert breaker.acquire() and breaker.acquire()
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record(False, error_rate=0.0, samples=0)
+    assert breaker.acquire()
+    assert not breaker.allows()
+    assert not breaker.acquire()
+
+def test_concurrent_requests_send_one_probe_to_a_half_open_provider():
+    calls = {'fast': 0, 'slow': 0}
+
+    async def handler(request):
+        name = request.url.host.split('.')[0]
+        calls[name] += 1
+        await asyncio.sleep(0.05)
+        return reply(request)
+
+    router = make_router(handler)
+    fast = router.states['fast']
+    fast.breaker.cooldown = 0
+    fast.breaker.state, fast.breaker.opened_at = 'open', 0.0
+
+    async def scenario():
+        return await asyncio.gather(*(router.complete([{'role': 'user', 'content': 'hi'}], provider='fast') for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert all('error' not in result for result in results)
+    assert calls['fast'] == 1
+    assert calls['slow'] == 4
+    assert fast.breaker.state == 'closed'
+
+def test_failed_provider_fails_over_and_opens_its_breaker():
+    async def handler(request):
+        if request.url.host.startswith('fast'):
+            return httpx.Response(500, text='boom')
+        return reply(request, json.loads(request.content)['messages'][0]['content'])
+
+    router = make_router(handler)
+    router.states['fast'].breaker.failure_threshold = 2
+
+    async def scenario():
+        return [await router.complete([{'role': 'user', 'content': f"q{i}"}], provider='fast') for i in range(3)]
+
+    results = asyncio.run(scenario())
+    assert [result['provider'] for result in results] == ['slow'] * 3
+    assert [result['content'] for result in results] == ['q0', 'q1', 'q2']
+    assert router.states['fast'].calls == 2
+    assert router.states['fast'].breaker.state == 'open'
+
+def test_all_providers_failing_returns_an_error():
+    router = make_router(lambda request: httpx.Response(503, text='down'))
+    result = asyncio.run(router.complete([{'role': 'user', 'content': 'hi'}]))
+    assert 'fast: HTTP error: 503' in result['error']
+    assert 'slow: HTTP error: 503' in result['error']
+
+def test_unknown_provider_is_rejected():
+    router = make_router(reply)
+    assert asyncio.run(router.complete([], provider='missing')) == {'error': 'Invalid LLM choice'}
@@ -0,0 +1,99 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from pipeline import PipelineEngine, _pushdown_expression, filter_mask
+
+
+def _step(kind, **config):
+    return SimpleNamespace(transformation_type=kind, transformation_config=config)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return PipelineEngine(store=SimpleNamespace(root=str(tmp_path)))
+
+
+@pytest.mark.parametrize('condition', [
+    {'column': 'city', 'op': '!=', 'value': 'Oslo'},
+    {'column': 'city', 'op': 'not in', 'value': ['Oslo', 'Rome']},
+    {'column': 'score', 'op': '!=', 'value': 2.0},
+])
+def test_pushdown_keeps_the_rows_the_pandas_mask_keeps(tmp_path, condition):
+    frame = pd.DataFrame({'city': ['Oslo', None, 'Lima', 'Rome'], 'score': [1.0, np.nan, 2.0, 3.0]})
+    path = str(tmp_path / 'data.parquet')
+    frame.to_parquet(path, index=False)
+    pushed = pq.read_table(path, filters=_pushdown_expression([condition])).to_pandas()
+    expected = frame[filter_mask(frame, [condition])].reset_index(drop=True)
+    pd.testing.assert_frame_equal(pushed, expected)
+
+
+
+def test_unknown_filter_operator_raises():
+    frame = pd.DataFrame({'city': ['Oslo', 'Lima']})
+    with pytest.raises(ValueError):
+        filter_mask(frame, [{'column': 'city', 'op': 'like', 'value': 'O'}])
+
+def test_consecutive_selects_keep_the_common_columns(engine):
+    groups = engine._fuse([(_step('select', columns=['a', 'b', 'c']), 'k1'), (_step('select', columns=['c', 'a']), 'k2')])
+    assert len(groups) == 1
+    assert groups[0]['columns'] == ['c', 'a']
+
+
+def test_filter_on_a_projected_away_column_is_not_fused(engine):
+    select = _step('select', columns=['a'])
+    on_kept = _step('filter', conditions=[{'column': 'a', 'op': '>', 'value': 1}])
+    on_dropped = _step('filter', conditions=[{'column': 'b', 'op': '>', 'value': 1}])
+    assert len(engine._fuse([(select, 'k1'), (on_kept, 'k2')])) == 1
+    groups = engine._fuse([(select, 'k1'), (on_dropped, 'k2')])
+    assert len(groups) == 2
+    with pytest.raises(KeyError):
+        frame = pd.DataFrame({'a': [1, 2], 'b': [3, 4]})
+        for group in groups:
+            frame = engine._apply_group(None, group, frame, None)
+
+
+def test_ungrouped_list_aggregations_give_one_row(engine):
+    frame = pd.DataFrame({'amount': [1.0, 2.0, 3.0], 'qty': [1, 1, 4]})
+    group = {'type': 'aggregate', 'config': {'aggregations': {'amount': ['sum', 'mean'], 'qty': 'max'}}}
+    result = engine._apply_group(None, group, frame, None)
+    assert list(result.columns) == ['amount_sum', 'amount_mean', 'qty_max']
+    assert result.iloc[0].tolist() == [6.0, 2.0, 4]
+
+
+@pytest.mark.parametrize('aggregate', [
+    {'group_by': ['city'], 'aggregations': ['sum']},
+    {'aggregations': ['sum', 'max']},
+    {'group_by': 'city', 'aggregations': {'amount': 'sum'}},
+])
+def test_pushed_down_read_matches_step_by_step_evaluation(engine, tmp_path, aggregate):
+    frame = pd.DataFrame({'city': ['Oslo', 'Lima', 'Oslo', 'Rome'], 'amount': [1.0, 2.0, 3.0, 4.0], 'qty': [1, 2, 3, 4]})
+    path = str(tmp_path / 'data.parquet')
+    frame.to_parquet(path, index=False)
+    steps = [_step('filter', conditions=[{'column': 'qty', 'op': '>', 'value': 1}]), _step('aggregate', **aggregate)]
+
+    keyed = [(step, f"k{i}") for i, step in enumerate(steps)]
+    pushed, groups = engine._read_root(SimpleNamespace(storage_path=path), steps, engine._fuse(keyed), None)
+    for group in groups:
+        pushed = engine._apply_group(None, group, pushed, None)
+    expected = frame
+    for group in engine._fuse(keyed):
+        expected = engine._apply_group(None, group, expected, None)
+    pd.testing.assert_frame_equal(pushed.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_evict_drops_least_recently_used_results(engine):
+    paths = []
+    for i, key in enumerate(['aa1', 'bb2', 'cc3']):
+        path = engine._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+        paths.append(path)
+    engine.evict(max_bytes=250)
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
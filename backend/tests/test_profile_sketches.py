@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from profile_sketches import file_sketches, frame_sketches, merge_sketches
+
+
+@pytest.mark.parametrize('values', [
+    1.7e9 + np.arange(1000) * 0.001,
+    np.r_[np.random.default_rng(0).normal(50, 3, 999), np.inf],
+])
+def test_merged_moments_match_pandas(values):
+    frame = pd.DataFrame({'x': values})
+    merged = {}
+    for start in range(0, len(frame), 300):
+        merged = merge_sketches(merged, frame_sketches(frame.iloc[start:start + 300]))
+    finite = frame['x'][np.isfinite(frame['x'])]
+    assert merged['x']['finite'] == len(finite)
+    assert merged['x']['mean'] == pytest.approx(finite.mean(), rel=1e-12)
+    assert merged['x']['std'] == pytest.approx(finite.std(), rel=1e-6)
+
+
+def test_file_sketches_merge_row_batches(tmp_path):
+    frame = pd.DataFrame({'x': 1.7e9 + np.arange(1000) * 0.001, 'flag': [True, False] * 500})
+    path = str(tmp_path / 'data.parquet')
+    frame.to_parquet(path, index=False, row_group_size=250)
+    sketches = file_sketches(path, batch_rows=100)
+    assert sketches['x']['std'] == pytest.approx(frame['x'].std(), rel=1e-6)
+    assert sketches['flag']['true'] == 500
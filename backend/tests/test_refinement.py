@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+
+import pytest
+
+import database
+import main
+import models
+
+
+@pytest.fixture
+def db():
+    database.init_db()
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+def approximate_analysis(db):
+    user = models.User(email=f"refine-{uuid.uuid4().hex}@example.com", hashed_password='x', full_name='x')
+    db.add(user)
+    db.flush()
+    project = models.Project(name='p', owner_id=user.id)
+    db.add(project)
+    db.flush()
+    analysis = models.Analysis(
+        project_id=project.id, name='sales', type='auto',
+        config={'name': 'sales', 'parameters': {'approximate': True}},
+        results={'insights': [], 'refinement': {'status': 'scheduled'}}, insights=[]
+    )
+    db.add(analysis)
+    db.commit()
+    return user, project, analysis
+
+
+def test_failed_refinement_is_reported(db):
+    user, project, analysis = approximate_analysis(db)
+    status = main.get_analysis_refinement(project.id, analysis.id, current_user=user, db=db)
+    assert status['status'] == 'pending'
+
+    # The analyzed source is gone, so the exact run cannot happen
+    asyncio.run(main.refine_analysis(analysis.id, [-1], 'separate'))
+
+    db.expire_all()
+    status = main.get_analysis_refinement(project.id, analysis.id, current_user=user, db=db)
+    assert status['status'] == 'failed'
+    assert status['error'] == "The analyzed data sources no longer exist"
+    assert status['refined_analysis_id'] is None
+    # The failure is recorded on the approximate analysis, not as an analysis of its own
+    assert db.query(models.Analysis).filter(models.Analysis.project_id == project.id).count() == 1
+
+
+def test_cached_analysis_follows_its_refinement(db):
+    _, _, analysis = approximate_analysis(db)
+    assert b'"scheduled"' in main.analysis_blob(analysis)
+    asyncio.run(main.refine_analysis(analysis.id, [-1], 'separate'))
+    db.expire_all()
+    assert b'"failed"' in main.analysis_blob(analysis)
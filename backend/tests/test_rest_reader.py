@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import rest_reader as rest_module
+from rest_reader import RestReader
+
+RECORDS = [{'id': i, 'name': f'row {i}'} for i in range(250)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rest_module, '_backoff', lambda attempt: 0)
+
+
+@pytest.fixture
+def read(monkeypatch):
+    """Runs RestReader.read against a MockTransport handler"""
+    def run(handler, config):
+        async def main():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(rest_module, 'get_client', lambda: client)
+                return await RestReader().read({'url': 'https://api.test/items', 'format': 'json', **config})
+        return asyncio.run(main())
+    return run
+
+
+def test_offset_pagination_reads_windows_until_a_short_page(read):
+    seen = []
+
+    def handler(request):
+        offset, limit = int(request.url.params['offset']), int(request.url.params['limit'])
+        seen.append(offset)
+        return httpx.Response(200, json=RECORDS[offset:offset + limit])
+
+    frame = read(handler, {'pagination': {'type': 'offset', 'page_size': 100}, 'concurrency': 2})
+    assert frame['id'].tolist() == list(range(250))
+    assert sorted(seen) == [0, 100, 200, 300]
+
+
+def test_page_pagination_starts_at_start_page(read):
+    def handler(request):
+        page, size = int(request.url.params['page']), int(request.url.params['per_page'])
+        return httpx.Response(200, json=RECORDS[(page - 1) * size:page * size])
+
+    frame = read(handler, {'pagination': {'type': 'page', 'page_size': 100}})
+    assert frame['id'].tolist() == list(range(250))
+
+
+def test_cursor_pagination_follows_the_body_cursor(read):
+    def handler(request):
+        start = int(request.url.params.get('after', 0))
+        body = {'data': RECORDS[start:start + 100], 'meta': {'next': str(start + 100) if start + 100 < 250 else None}}
+        return httpx.Response(200, json=body)
+
+    frame = read(handler, {
+        'records_path': 'data',
+        'pagination': {'type': 'cursor', 'cursor_path': 'meta.next', 'cursor_param': 'after'},
+    })
+    assert frame['id'].tolist() == list(range(250))
+
+
+def test_link_pagination_follows_the_next_header(read):
+    def handler(request):
+        start = int(request.url.params.get('start', 0))
+        headers = {'Link': f'<https://api.test/items?start={start + 100}>; rel="next"'} if start + 100 < 250 else {}
+        return httpx.Response(200, json=RECORDS[start:start + 100], headers=headers)
+
+    frame = read(handler, {'pagination': {'type': 'link'}})
+    assert frame['id'].tolist() == list(range(250))
+
+
+def test_429_is_retried_after_the_server_delay(read):
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        if len(attempts) < 3:
+            return httpx.Response(429, headers={'Retry-After': '0'})
+        return httpx.Response(200, json=RECORDS[:5])
+
+    frame = read(handler, {})
+    assert len(frame) == 5
+    assert len(attempts) == 3
+
+
+def test_server_errors_give_up_after_max_retries(read):
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        return httpx.Response(503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        read(handler, {'max_retries': 2})
+    assert len(attempts) == 3
+
+
+def test_transport_errors_are_retried(read):
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise httpx.ConnectError('connection reset', request=request)
+        return httpx.Response(200, content=json.dumps(RECORDS[:3]).encode('utf-8'))
+
+    assert len(read(handler, {})) == 3
+
+
+def test_client_errors_are_not_retried(read):
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        return httpx.Response(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        read(handler, {})
+    assert len(attempts) == 1
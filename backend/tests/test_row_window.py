@@ -0,0 +1,54 @@
+import base64
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from row_window import RowWindowService, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / 'data.parquet')
+    pd.DataFrame({'n': range(10)}).to_parquet(path, index=False)
+    return SimpleNamespace(fingerprint='fp', storage_path=path)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('fp', 'n', [], 200)
+    assert decode_cursor(cursor, 'fp', 'n', []) == 200
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'fp', '-n', [])
+
+
+@pytest.mark.parametrize('position', [-5, 'x', None, True])
+def test_cursor_with_bad_position_is_rejected(position):
+    state = {'fp': 'fp', 'sort': None, 'filter': [], 'pos': position}
+    cursor = base64.urlsafe_b64encode(json.dumps(state).encode('utf-8')).decode('ascii')
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'fp', None, [])
+
+
+@pytest.mark.parametrize('sort', [None, '-n'])
+def test_negative_offset_is_rejected(tmp_path, dataset, sort):
+    service = RowWindowService(store=SimpleNamespace(root=str(tmp_path)))
+    with pytest.raises(ValueError):
+        service.window(dataset, -3, 5, sort=sort)
+    page, total = service.window(dataset, 8, 5, sort=sort)
+    assert total == 10
+    assert page.column('n').to_pylist() == ([8, 9] if sort is None else [1, 0])
+
+
+@pytest.mark.parametrize('conditions', [
+    [{'column': 'n', 'op': 'like', 'value': 'a'}],
+    [{'op': '==', 'value': 1}],
+    ['n > 1'],
+    {'column': 'n', 'op': '==', 'value': 1},
+])
+def test_invalid_filter_conditions_are_rejected(tmp_path, dataset, conditions):
+    service = RowWindowService(store=SimpleNamespace(root=str(tmp_path)))
+    with pytest.raises(ValueError):
+        service.window(dataset, 0, 5, conditions=conditions)
+    page, total = service.window(dataset, 0, 5, conditions=[{'column': 'n', 'op': '>=', 'value': 7}])
+    assert total == 3
@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+import data_connectors
+import s3_reader as s3_module
+from csv_reader import CsvReader
+from json_reader import SpooledFrame
+from s3_reader import S3ObjectCache, S3Reader
+
+BUCKET = 'phoenix-test'
+CONFIG = {'bucket': BUCKET, 'region': 'us-east-1', 'access_key': 'test', 'secret_key': 'test'}
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        reader = S3Reader(cache=S3ObjectCache(str(tmp_path / 'cache')))
+        calls = []
+        reader.client(CONFIG).meta.events.register(
+            'before-parameter-build.s3', lambda params, model, **kwargs: calls.append((model.name, params.get('Range')))
+        )
+        monkeypatch.setattr(data_connectors, 's3_reader', reader)
+        monkeypatch.setattr(data_connectors, 'csv_reader', CsvReader(spool_dir=str(tmp_path / 'spool'), chunk_rows=7))
+        yield client, reader, calls
+
+
+def test_unchanged_object_costs_a_single_head(s3):
+    client, reader, calls = s3
+    client.put_object(Bucket=BUCKET, Key='a.csv', Body=b'x,y\n1,2\n')
+    first = reader.fetch(CONFIG, BUCKET, 'a.csv')
+    calls.clear()
+    assert reader.fetch(CONFIG, BUCKET, 'a.csv') == first
+    assert [name for name, _ in calls] == ['HeadObject']
+
+
+def test_changed_object_is_downloaded_again(s3):
+    client, reader, _ = s3
+    client.put_object(Bucket=BUCKET, Key='a.csv', Body=b'x,y\n1,2\n')
+    reader.fetch(CONFIG, BUCKET, 'a.csv')
+    client.put_object(Bucket=BUCKET, Key='a.csv', Body=b'x,y\n3,4\n')
+    with open(reader.fetch(CONFIG, BUCKET, 'a.csv'), 'rb') as f:
+        assert f.read() == b'x,y\n3,4\n'
+
+
+def test_large_object_is_fetched_with_ranged_gets(s3, monkeypatch):
+    client, reader, calls = s3
+    monkeypatch.setattr(s3_module, 'RANGED_GET_THRESHOLD', 1000)
+    monkeypatch.setattr(s3_module, 'RANGE_PART_SIZE', 1000)
+    body = bytes(range(256)) * 20
+    client.put_object(Bucket=BUCKET, Key='big.bin', Body=body)
+    with open(reader.fetch(CONFIG, BUCKET, 'big.bin'), 'rb') as f:
+        assert f.read() == body
+    ranges = sorted(r for name, r in calls if name == 'GetObject')
+    assert ranges == sorted(f"bytes={start}-{min(start + 1000, len(body)) - 1}" for start in range(0, len(body), 1000))
+
+
+def test_csv_object_is_spooled_in_chunks(s3):
+    client, _, _ = s3
+    frame = pd.DataFrame({'id': range(30), 'score': [None] * 10 + list(range(20)), 'code': [str(i) for i in range(25)] + ['x'] * 5})
+    client.put_object(Bucket=BUCKET, Key='data/rows.csv.gz', Body=gzip.compress(frame.to_csv(index=False).encode('utf-8')))
+    data = asyncio.run(data_connectors.data_connector._connect_s3({**CONFIG, 'key': 'data/rows.csv.gz'}))
+    try:
+        assert isinstance(data, SpooledFrame)
+        assert len(data) == 30 and data.report['chunks'] == 5
+        expected = pd.read_csv(pd.io.common.StringIO(frame.to_csv(index=False)))
+        pd.testing.assert_frame_equal(pd.read_parquet(data.parquet_path), expected)
+    finally:
+        data.discard()
+
+
+def test_prefix_loads_every_tabular_key(s3):
+    client, _, _ = s3
+    client.put_object(Bucket=BUCKET, Key='logs/a.csv', Body=b'x\n1\n2\n')
+    client.put_object(Bucket=BUCKET, Key='logs/b.jsonl', Body=b'{"x": 3}\n')
+    client.put_object(Bucket=BUCKET, Key='logs/readme.txt', Body=b'skip me')
+    frame = asyncio.run(data_connectors.data_connector._connect_s3({**CONFIG, 'prefix': 'logs/'}))
+    assert sorted(zip(frame['_s3_key'], frame['x'])) == [('logs/a.csv', 1), ('logs/a.csv', 2), ('logs/b.jsonl', 3)]
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dataset_store import DatasetStore
+from dtype_optimizer import optimize_dtypes
+from source_refresh import SourceRefresher
+
+
+def test_appended_ndjson_takes_the_stored_schema(tmp_path):
+    records = [{'id': i, 'city': ['Oslo', 'Lima'][i % 2], 'score': i / 2} for i in range(20)]
+    stored, _ = optimize_dtypes(pd.DataFrame(records))
+    storage_path = str(tmp_path / 'stored.parquet')
+    stored.to_parquet(storage_path, index=False)
+    dataset = SimpleNamespace(storage_path=storage_path)
+
+    path = tmp_path / 'data.ndjson'
+    old = ''.join(json.dumps(record) + '\n' for record in records)
+    # The appended records miss a column and bring one the dataset never had
+    appended = [{'id': 20, 'city': 'Rome'}, {'id': 21, 'city': 'Oslo', 'score': 3.5, 'note': 'new'}]
+    path.write_text(old + ''.join(json.dumps(record) + '\n' for record in appended))
+
+    delta = SourceRefresher()._read_appended('ndjson', str(path), len(old.encode('utf-8')), dataset)
+    assert list(delta.columns) == ['id', 'city', 'score']
+    assert delta['score'].isna().tolist() == [True, False]
+
+    merged_path = DatasetStore(root=str(tmp_path)).append_frame(dataset, delta)
+    # The delta was cast onto the stored file rather than re-read and re-optimized with it
+    assert pq.read_schema(merged_path) == pq.read_schema(storage_path)
+    assert pq.read_table(merged_path).num_rows == 22
+
+
+def test_table_source_is_not_refreshed_by_watermark():
+    refresher = SourceRefresher()
+    calls = []
+
+    async def watermark_change(data_source, state):
+        calls.append('watermark')
+
+    async def frame_change(db, data_source, state):
+        calls.append('frame')
+
+    refresher._watermark_change = watermark_change
+    refresher._frame_change = frame_change
+    for config in ({'table': 'events', 'incremental_column': 'id'}, {'query': 'SELECT * FROM events', 'incremental_column': 'id'}):
+        source = SimpleNamespace(type='postgres', connection_config=config)
+        asyncio.run(refresher._detect(None, source, {}, None, None))
+    assert calls == ['frame', 'watermark']
+
+
+def test_failed_quality_assessment_does_not_fail_the_refresh(monkeypatch):
+    import source_refresh
+
+    async def failing_assess(db, data_source):
+        raise RuntimeError("scan failed")
+
+    async def detect(db, data_source, state, upload_path, upload_digest):
+        return source_refresh.Change('replaced', 'content_digest', {'content_digest': 'b'}, dataset=dataset)
+
+    dataset = SimpleNamespace(id=7, row_count=3)
+    source = SimpleNamespace(id=1, type='api', dataset=None)
+    sync = SimpleNamespace(state={'content_digest': 'a'})
+    db = SimpleNamespace(commit=lambda: None, rollback=lambda: None)
+    refresher = SourceRefresher()
+    refresher.get_sync = lambda db, data_source: sync
+    refresher._detect = detect
+    refresher._switch_dataset = lambda db, data_source, new: setattr(data_source, 'dataset', new)
+    monkeypatch.setattr(source_refresh.quality_engine, 'assess', failing_assess)
+
+    result = asyncio.run(refresher.refresh(db, source, reanalyze=False))
+    assert result['status'] == 'replaced'
+    assert result['dataset_id'] == 7
+    assert sync.last_status == 'replaced'
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 2))
+
+class WorkerPool:
+    """Process pool shared by CPU-heavy rendering (EDA reports, story exports).
+
+    Created on first use so API workers that never render pay nothing. Worker
+    processes use matplotlib's non-interactive Agg backend.
+    """
+
+    def __init__(self, max_workers: int = WORKER_PROCESSES):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                # spawn: forking a process that already runs an event loop and threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def submit(self, function, *args) -> asyncio.Future:
+        """Schedule `function(*args)` in a worker; returns an awaitable asyncio future"""
+        return asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def run(self, function, *args):
+        return await self.submit(function, *args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+worker_pool = WorkerPool()
@@ -1,7 +1,9 @@
 import React, { useState } from 'react'
 import axios from 'axios'
+import DataTable from './DataTable'
 import { 
   Database, 
+  Table, 
   Plus, 
   FileText, 
   Server, 
@@ -13,6 +15,7 @@ import {
 const DataSourceManager = ({ projectId, dataSources, onUpdate }) => {
   const [isConnecting, setIsConnecting] = useState(false)
   const [selectedType, setSelectedType] = useState('csv')
+  const [browsingSource, setBrowsingSource] = useState(null)
 
   const dataSourceTypes = [
     { id: 'csv', name: 'CSV File', icon: FileText, description: 'Upload a CSV file' },
@@ -191,11 +194,30 @@ const DataSourceManager = ({ projectId, dataSources, onUpdate }) => {
                     </p>
                   </div>
                 )}
+
+                {source.dataset_id && (
+                  <button
+                    onClick={() => setBrowsingSource(browsingSource?.id === source.id ? null : source)}
+                    className="mt-3 flex items-center space-x-1 text-sm text-blue-600 hover:text-blue-800"
+                  >
+                    <Table size={16} />
+                    <span>{browsingSource?.id === source.id ? 'Hide rows' : 'Browse rows'}</span>
+                  </button>
+                )}
               </div>
             ))}
           </div>
         )}
       </div>
+
+      {browsingSource && (
+        <DataTable
+          key={browsingSource.id}
+          projectId={projectId}
+          dataSource={browsingSource}
+          onClose={() => setBrowsingSource(null)}
+        />
+      )}
     </div>
   )
 }
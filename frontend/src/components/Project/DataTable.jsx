@@ -0,0 +1,194 @@
+import React, { useState, useEffect, useRef, useCallback } from 'react'
+import axios from 'axios'
+import { ArrowUp, ArrowDown, X } from 'lucide-react'
+
+const ROW_HEIGHT = 32
+const BLOCK_SIZE = 200
+const OVERSCAN = 10
+const VIEWPORT_HEIGHT = 480
+// Typing in the filter box refetches only once the user pauses
+const FILTER_DEBOUNCE_MS = 300
+
+// Virtualized grid over /rows: only the visible rows are rendered and rows are
+// fetched in fixed-size blocks as the user scrolls, sorted and filtered server-side.
+const DataTable = ({ projectId, dataSource, onClose }) => {
+  const [columns, setColumns] = useState([])
+  const [totalRows, setTotalRows] = useState(0)
+  const [blocks, setBlocks] = useState({})
+  const [scrollTop, setScrollTop] = useState(0)
+  const [sort, setSort] = useState(null)
+  const [filterColumn, setFilterColumn] = useState('')
+  const [filterValue, setFilterValue] = useState('')
+  const [appliedFilterValue, setAppliedFilterValue] = useState('')
+  const [error, setError] = useState(null)
+  const pending = useRef(new Set())
+  const generation = useRef(0)
+
+  useEffect(() => {
+    const timer = setTimeout(() => setAppliedFilterValue(filterValue), FILTER_DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [filterValue])
+
+  const filter = filterColumn && appliedFilterValue
+    ? JSON.stringify([{ column: filterColumn, op: 'contains', value: appliedFilterValue }])
+    : null
+
+  const fetchBlock = useCallback(async (block) => {
+    const requestGeneration = generation.current
+    const key = `${requestGeneration}:${block}`
+    if (pending.current.has(key)) return
+    pending.current.add(key)
+
+    try {
+      const params = { offset: block * BLOCK_SIZE, limit: BLOCK_SIZE }
+      if (sort) params.sort = sort
+      if (filter) params.filter = filter
+      const response = await axios.get(
+        `/projects/${projectId}/data-sources/${dataSource.id}/rows`,
+        { params }
+      )
+      if (requestGeneration !== generation.current) return
+
+      const { columns: names, data, total_rows: total } = response.data
+      const rows = Array.from({ length: response.data.row_count }, (_, i) =>
+        names.map((name) => data[name][i])
+      )
+      setColumns(names)
+      setTotalRows(total)
+      setBlocks((current) => ({ ...current, [block]: rows }))
+      setError(null)
+    } catch (err) {
+      console.error('Error fetching rows:', err)
+      setError(err.response?.data?.detail || 'Failed to load rows')
+    } finally {
+      pending.current.delete(key)
+    }
+  }, [projectId, dataSource.id, sort, filter])
+
+  // A new sort or filter invalidates every loaded block
+  useEffect(() => {
+    generation.current += 1
+    setBlocks({})
+    fetchBlock(0)
+  }, [fetchBlock])
+
+  const firstRow = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN)
+  const lastRow = Math.min(totalRows, Math.ceil((scrollTop + VIEWPORT_HEIGHT) / ROW_HEIGHT) + OVERSCAN)
+
+  useEffect(() => {
+    const firstBlock = Math.floor(firstRow / BLOCK_SIZE)
+    const lastBlock = Math.floor(Math.max(firstRow, lastRow - 1) / BLOCK_SIZE)
+    for (let block = firstBlock; block <= lastBlock; block++) {
+      if (!blocks[block]) fetchBlock(block)
+    }
+  }, [firstRow, lastRow, blocks, fetchBlock])
+
+  const toggleSort = (column) => {
+    if (sort === column) setSort(`-${column}`)
+    else if (sort === `-${column}`) setSort(null)
+    else setSort(column)
+  }
+
+  const formatCell = (value) => {
+    if (value === null || value === undefined) return ''
+    if (typeof value === 'object') return JSON.stringify(value)
+    return String(value)
+  }
+
+  const visibleRows = []
+  for (let index = firstRow; index < lastRow; index++) {
+    const block = blocks[Math.floor(index / BLOCK_SIZE)]
+    visibleRows.push({ index, values: block ? block[index % BLOCK_SIZE] : null })
+  }
+
+  const gridTemplate = `64px repeat(${columns.length}, minmax(140px, 1fr))`
+
+  return (
+    <div className="bg-white rounded-lg shadow-sm border">
+      <div className="flex items-center justify-between p-4 border-b">
+        <div>
+          <h3 className="text-lg font-medium text-gray-900">{dataSource.name}</h3>
+          <p className="text-sm text-gray-500">{totalRows.toLocaleString()} rows</p>
+        </div>
+        <div className="flex items-center space-x-2">
+          <select
+            value={filterColumn}
+            onChange={(e) => setFilterColumn(e.target.value)}
+            className="text-sm border-gray-300 rounded-md"
+          >
+            <option value="">Filter column...</option>
+            {columns.map((column) => (
+              <option key={column} value={column}>{column}</option>
+            ))}
+          </select>
+          <input
+            type="text"
+            value={filterValue}
+            onChange={(e) => setFilterValue(e.target.value)}
+            placeholder="contains..."
+            className="text-sm border-gray-300 rounded-md"
+          />
+          {onClose && (
+            <button onClick={onClose} className="p-1 text-gray-500 hover:text-gray-700">
+              <X size={18} />
+            </button>
+          )}
+        </div>
+      </div>
+
+      {error && (
+        <div className="p-2 text-sm text-red-700 bg-red-50 border-b border-red-200">{error}</div>
+      )}
+
+      <div
+        className="overflow-auto text-sm"
+        style={{ height: VIEWPORT_HEIGHT }}
+        onScroll={(e) => setScrollTop(e.currentTarget.scrollTop)}
+      >
+        <div
+          className="sticky top-0 z-10 grid bg-gray-50 border-b font-medium text-gray-700"
+          style={{ gridTemplateColumns: gridTemplate, height: ROW_HEIGHT }}
+        >
+          <div className="px-2 flex items-center text-gray-400">#</div>
+          {columns.map((column) => (
+            <button
+              key={column}
+              onClick={() => toggleSort(column)}
+              className="px-2 flex items-center space-x-1 truncate hover:bg-gray-100"
+            >
+              <span className="truncate">{column}</span>
+              {sort === column && <ArrowUp size={14} />}
+              {sort === `-${column}` && <ArrowDown size={14} />}
+            </button>
+          ))}
+        </div>
+
+        <div style={{ height: totalRows * ROW_HEIGHT, position: 'relative' }}>
+          {visibleRows.map(({ index, values }) => (
+            <div
+              key={index}
+              className="grid border-b border-gray-100 text-gray-800"
+              style={{
+                gridTemplateColumns: gridTemplate,
+                height: ROW_HEIGHT,
+                position: 'absolute',
+                top: index * ROW_HEIGHT,
+                left: 0,
+                right: 0
+              }}
+            >
+              <div className="px-2 flex items-center text-gray-400">{index + 1}</div>
+              {columns.map((column, i) => (
+                <div key={column} className="px-2 flex items-center truncate">
+                  {values ? formatCell(values[i]) : <span className="h-3 w-16 bg-gray-100 rounded" />}
+                </div>
+              ))}
+            </div>
+          ))}
+        </div>
+      </div>
+    </div>
+  )
+}
+
+export default DataTable